@@ -28,7 +28,7 @@ def find_version(*file_paths):
 setup_requirements = ['pytest-runner'] if {'pytest', 'test', 'ptr'}.intersection(sys.argv) else []
 
 install_requirements = ['guessit>=3.0.0', 'babelfish>=0.5.2', 'enzyme>=0.4.1', 'beautifulsoup4>=4.4.0',
-                        'requests>=2.0', 'click>=4.0', 'dogpile.cache>=0.6.0', 'stevedore>=1.20.0',
+                        'requests>=2.32.2', 'click>=4.0', 'dogpile.cache>=1.1.0', 'stevedore>=1.20.0',
                         'chardet>=2.3.0', 'pysubs2>=1.3.0', 'six>=1.9.0', 'appdirs>=1.3', 'rarfile>=2.7',
                         'pytz>=2012c', 'browser-cookie3>=0.13.0', 'libcurl-ct>=7.81.0a2']
 if sys.version_info < (3, 2):
@@ -51,6 +51,7 @@ setup(name='subliminal',
       author='Antoine Bertin',
       author_email='diaoulael@gmail.com',
       packages=find_packages(),
+      package_data={'subliminal': ['data/*.txt']},
       classifiers=[
           'Development Status :: 5 - Production/Stable',
           'Intended Audience :: Developers',
@@ -100,6 +101,8 @@ setup(name='subliminal',
       install_requires=install_requirements,
       tests_require=test_requirements,
       extras_require={
+          'msgpack': ['msgpack>=1.0'],
+          'zstd': ['zstandard'],
           'test': test_requirements,
           'dev': dev_requirements
       })
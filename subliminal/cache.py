@@ -1,9 +1,41 @@
 # -*- coding: utf-8 -*-
+from collections import OrderedDict
+from contextlib import closing
 import datetime
+import dbm
+import functools
+import glob
+import hashlib
+import json
+import logging
+import marshal
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import zlib
 
 import six
-from dogpile.cache import make_region
+from dogpile.cache import register_backend
+from dogpile.cache.api import NO_VALUE, CacheBackend, CachedValue
+from dogpile.cache.proxy import ProxyBackend
+from dogpile.cache.region import CacheRegion
 from dogpile.cache.util import function_key_generator
+from six.moves import cPickle as pickle
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+logger = logging.getLogger(__name__)
 
 #: Expiration time for show caching
 SHOW_EXPIRATION_TIME = datetime.timedelta(weeks=3).total_seconds()
@@ -14,6 +46,12 @@ EPISODE_EXPIRATION_TIME = datetime.timedelta(days=3).total_seconds()
 #: Expiration time for scraper searches
 REFINER_EXPIRATION_TIME = datetime.timedelta(weeks=1).total_seconds()
 
+#: Expiration time for listed subtitles
+LISTING_EXPIRATION_TIME = datetime.timedelta(hours=1).total_seconds()
+
+#: Expiration time for empty results, e.g. a show that is not found
+NEGATIVE_EXPIRATION_TIME = datetime.timedelta(hours=12).total_seconds()
+
 
 def _to_native_str(value):
     if six.PY2:
@@ -34,4 +72,1135 @@ def to_native_str_key_generator(namespace, fn, to_str=_to_native_str):
     return function_key_generator(namespace, fn, to_str)
 
 
-region = make_region(function_key_generator=to_native_str_key_generator)
+#: Names of the statistics counters
+STATS_COUNTERS = ('hits', 'misses', 'expirations', 'creation_time')
+
+
+def get_key_namespace(key):
+    """Get the namespace of a cache `key`, the cached function for keys generated by
+    :func:`to_native_str_key_generator`.
+
+    :param str key: the key.
+    :return: the namespace.
+    :rtype: str
+
+    """
+    return key.split('|', 1)[0]
+
+
+def is_negative_value(value):
+    """Whether the cached `value` is an empty result.
+
+    :param value: the value.
+    :return: whether the value is ``None`` or empty.
+    :rtype: bool
+
+    """
+    return value is None or (hasattr(value, '__len__') and len(value) == 0)
+
+
+class Serializer(object):
+    """Serializer of cached values, with an optional compression of the large ones.
+
+    Values are serialized with `format` when it supports them and with pickle otherwise, e.g. for instances of custom
+    classes. marshal supports the exact built-in types (`dict`, `list`, `tuple`, `str`, `int`...) and msgpack also
+    supports their subclasses but loads tuples as lists. A two bytes header records the format and the compression of
+    each value so values written with other settings, including plain pickles, can still be loaded.
+
+    :param str format: format of the values, 'pickle', 'marshal' or 'msgpack'.
+    :param str compression: compression of the values, 'zlib' or 'zstd', ``None`` to disable compression.
+    :param int compression_threshold: minimum size in bytes of a serialized value to compress it.
+    :param int compression_level: level of the compression, ``None`` for the default of the compression.
+
+    """
+    #: Header byte per format
+    formats = {'pickle': b'p', 'marshal': b'm', 'msgpack': b'k'}
+
+    #: Header byte per compression
+    compressions = {None: b'-', 'zlib': b'z', 'zstd': b's'}
+
+    def __init__(self, format='pickle', compression=None, compression_threshold=1024, compression_level=None):
+        if format not in self.formats:
+            raise ValueError('Unsupported format %r' % format)
+        if compression not in self.compressions:
+            raise ValueError('Unsupported compression %r' % compression)
+        if format == 'msgpack' and msgpack is None:
+            raise ValueError('The msgpack format requires the msgpack package')
+        if compression == 'zstd' and zstandard is None:
+            raise ValueError('The zstd compression requires the zstandard package')
+
+        #: Format of the values
+        self.format = format
+
+        #: Compression of the values
+        self.compression = compression
+
+        #: Minimum size in bytes of a serialized value to compress it
+        self.compression_threshold = compression_threshold
+
+        #: Level of the compression
+        self.compression_level = compression_level
+
+    def _dumps(self, value, format):
+        if format == 'marshal':
+            return marshal.dumps(value)
+        if format == 'msgpack':
+            return msgpack.packb(value, use_bin_type=True)
+
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _compress(self, data, compression):
+        if compression == 'zlib':
+            return zlib.compress(data, -1 if self.compression_level is None else self.compression_level)
+
+        return zstandard.ZstdCompressor(level=3 if self.compression_level is None else self.compression_level
+                                        ).compress(data)
+
+    def dumps(self, value):
+        """Serialize and compress a `value`.
+
+        :param value: the value.
+        :return: the serialized value.
+        :rtype: bytes
+
+        """
+        format = self.format
+        try:
+            data = self._dumps(value, format)
+        except (TypeError, ValueError):
+            # fall back to pickle for unsupported types
+            format = 'pickle'
+            data = self._dumps(value, format)
+
+        compression = None
+        if self.compression is not None and len(data) >= self.compression_threshold:
+            compressed_data = self._compress(data, self.compression)
+            if len(compressed_data) < len(data):
+                compression = self.compression
+                data = compressed_data
+
+        return self.formats[format] + self.compressions[compression] + data
+
+    def loads(self, data):
+        """Decompress and deserialize a value serialized with :meth:`dumps` or with pickle.
+
+        :param bytes data: the serialized value.
+        :return: the value.
+
+        """
+        data = bytes(data)
+
+        # plain pickles start with the PROTO opcode
+        if data[:1] == b'\x80':
+            return pickle.loads(data)
+
+        format_header, compression_header, data = data[:1], data[1:2], data[2:]
+        if compression_header == self.compressions['zlib']:
+            data = zlib.decompress(data)
+        elif compression_header == self.compressions['zstd']:
+            if zstandard is None:
+                raise ValueError('Loading a zstd compressed value requires the zstandard package')
+            data = zstandard.ZstdDecompressor().decompress(data)
+        elif compression_header != self.compressions[None]:
+            raise ValueError('Unknown compression header %r' % compression_header)
+
+        if format_header == self.formats['marshal']:
+            return marshal.loads(data)
+        if format_header == self.formats['msgpack']:
+            if msgpack is None:
+                raise ValueError('Loading a msgpack value requires the msgpack package')
+            return msgpack.unpackb(data, raw=False, strict_map_key=False)
+        if format_header == self.formats['pickle']:
+            return pickle.loads(data)
+
+        raise ValueError('Unknown format header %r' % format_header)
+
+
+class SubliminalCacheRegion(CacheRegion):
+    """A :class:`~dogpile.cache.region.CacheRegion` with negative caching, recording statistics per key namespace.
+
+    Empty results, as defined by :func:`is_negative_value`, expire after `negative_expiration_time` when it is shorter
+    than the expiration time of the value.
+
+    Hits, misses, expirations and the time spent creating values are counted in :meth:`get_or_create`, which is used
+    by :meth:`~dogpile.cache.region.CacheRegion.cache_on_arguments`. Statistics are persisted with :meth:`flush_stats`
+    when the backend supports it, like :class:`SQLiteBackend`.
+
+    In stale-while-revalidate mode, expired values keep being returned while a background thread, holding the dogpile
+    lock of the key, creates the new value. Only values that are not cached at all are created in the calling thread.
+    Locks that must be released by the thread that acquired them, unlike :class:`SQLiteLock`, are only held by the
+    calling thread, which then refreshes the value itself.
+
+    Cached functions can declare a schema-friendly form of their values with the `dump` and `load` arguments of
+    :meth:`cache_on_arguments`, so a compact :class:`Serializer` format can be used instead of pickle.
+
+    :param negative_expiration_time: expiration time of empty results in seconds, ``None`` to disable negative caching.
+    :type negative_expiration_time: int or :class:`datetime.timedelta`
+    :param bool stale_while_revalidate: whether to enable the stale-while-revalidate mode.
+
+    """
+    def __init__(self, *args, **kwargs):
+        negative_expiration_time = kwargs.pop('negative_expiration_time', NEGATIVE_EXPIRATION_TIME)
+        stale_while_revalidate = kwargs.pop('stale_while_revalidate', False)
+        super(SubliminalCacheRegion, self).__init__(*args, **kwargs)
+        if isinstance(negative_expiration_time, datetime.timedelta):
+            negative_expiration_time = negative_expiration_time.total_seconds()
+        self.negative_expiration_time = negative_expiration_time
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+        self.lookups = threading.local()
+        self.refresh_threads = []
+        self.refresh_threads_lock = threading.Lock()
+        self.stale_while_revalidate = stale_while_revalidate
+
+    @property
+    def stale_while_revalidate(self):
+        """Whether expired values are returned while they are refreshed in a background thread."""
+        return self.async_creation_runner is not None
+
+    @stale_while_revalidate.setter
+    def stale_while_revalidate(self, value):
+        self.async_creation_runner = self._refresh_in_background if value else None
+
+    def _refresh_in_background(self, cache, key, creator, mutex):
+        def refresh():
+            try:
+                cache.set(key, creator())
+            except Exception:
+                logger.exception('Unable to refresh the cached value of %r', key)
+            finally:
+                mutex.release()
+
+        refreshes = getattr(self.lookups, 'refreshes', None)
+        if refreshes is not None:
+            refreshes.append(key)
+
+        # the lock would stay held if released by another thread than the one that acquired it
+        if not getattr(mutex, 'release_from_any_thread', False):
+            logger.debug('Refreshing the cached value of %r', key)
+            refresh()
+            return
+
+        logger.debug('Refreshing the cached value of %r in background', key)
+        thread = threading.Thread(target=refresh, name='refresh %s' % get_key_namespace(key))
+        with self.refresh_threads_lock:
+            self.refresh_threads = [t for t in self.refresh_threads if t.is_alive()] + [thread]
+        thread.start()
+
+    def wait_for_refreshes(self, timeout=None):
+        """Wait for the background refreshes of the stale-while-revalidate mode to finish.
+
+        :param float timeout: maximum time to wait for each refresh, in seconds.
+
+        """
+        with self.refresh_threads_lock:
+            threads, self.refresh_threads = self.refresh_threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    @property
+    def actual_backend(self):
+        """The backend of the region, without its proxies."""
+        backend = self.backend
+        while isinstance(backend, ProxyBackend):
+            backend = backend.proxied
+
+        return backend
+
+    def cache_on_arguments(self, *args, **kwargs):
+        """Like :meth:`~dogpile.cache.region.CacheRegion.cache_on_arguments` with an optional cached form of the values.
+
+        The value returned by the decorated function is converted with `dump` before being cached and the cached value
+        is converted back with `load` when returned, e.g. from instances of custom classes to tuples.
+
+        :param dump: function converting the value to its cached form.
+        :param load: function converting the cached form to the value.
+
+        """
+        dump = kwargs.pop('dump', None)
+        load = kwargs.pop('load', None)
+        if dump is None and load is None:
+            return super(SubliminalCacheRegion, self).cache_on_arguments(*args, **kwargs)
+        if dump is None or load is None:
+            raise ValueError('Both dump and load are required')
+        function_key_generator = kwargs.pop('function_key_generator', None) or self.function_key_generator
+        super_cache_on_arguments = super(SubliminalCacheRegion, self).cache_on_arguments
+
+        def cache_decorator(fn):
+            def dumped_fn(*fn_args, **fn_kwargs):
+                return dump(fn(*fn_args, **fn_kwargs))
+
+            # generate the keys from the arguments of the decorated function
+            def key_generator(namespace, _, *key_generator_args):
+                return function_key_generator(namespace, fn, *key_generator_args)
+
+            cached_fn = super_cache_on_arguments(*args, function_key_generator=key_generator, **kwargs)(dumped_fn)
+
+            @functools.wraps(fn)
+            def decorated_fn(*fn_args, **fn_kwargs):
+                return load(cached_fn(*fn_args, **fn_kwargs))
+
+            def get(*fn_args, **fn_kwargs):
+                value = dumped_fn.get(*fn_args, **fn_kwargs)
+                return value if value is NO_VALUE else load(value)
+
+            decorated_fn.set = lambda value, *fn_args, **fn_kwargs: dumped_fn.set(dump(value), *fn_args, **fn_kwargs)
+            decorated_fn.get = get
+            decorated_fn.invalidate = dumped_fn.invalidate
+            decorated_fn.refresh = lambda *fn_args, **fn_kwargs: load(dumped_fn.refresh(*fn_args, **fn_kwargs))
+            decorated_fn.original = fn
+
+            return decorated_fn
+
+        return cache_decorator
+
+    def _is_cache_miss(self, value, orig_key):
+        # record whether the value read by get_or_create is cached at all, expired or not
+        lookups = getattr(self.lookups, 'current', None)
+        if lookups is not None:
+            lookups.append(value is not NO_VALUE)
+
+        return super(SubliminalCacheRegion, self)._is_cache_miss(value, orig_key)
+
+    def _record_stats(self, key, counter, creation_time=0):
+        with self.stats_lock:
+            stats = self.stats.setdefault(get_key_namespace(key), dict.fromkeys(STATS_COUNTERS, 0))
+            stats[counter] += 1
+            stats['creation_time'] += creation_time
+
+    def get_or_create(self, key, creator, expiration_time=None, *args, **kwargs):
+        creations = []
+        lookups = []
+        refreshes = []
+
+        # also called by the background refreshes, after get_or_create returned
+        def timed_creator(*creator_args, **creator_kwargs):
+            expired = bool(lookups) and lookups[-1]
+            start = time.time()
+            value = creator(*creator_args, **creator_kwargs)
+            creations.append(expired)
+            self._record_stats(key, 'expirations' if expired else 'misses', time.time() - start)
+
+            return value
+
+        # the creator may call get_or_create for other keys in the same thread
+        previous_lookups = getattr(self.lookups, 'current', None)
+        previous_refreshes = getattr(self.lookups, 'refreshes', None)
+        self.lookups.current = lookups
+        self.lookups.refreshes = refreshes
+        try:
+            value = super(SubliminalCacheRegion, self).get_or_create(key, timed_creator, expiration_time, *args,
+                                                                     **kwargs)
+
+            # get the cached empty result again with the shorter negative expiration time
+            if not creations and self.negative_expiration_time is not None and is_negative_value(value):
+                expiration_time = expiration_time or self.expiration_time
+                if expiration_time is None or expiration_time < 0 or self.negative_expiration_time < expiration_time:
+                    value = super(SubliminalCacheRegion, self).get_or_create(key, timed_creator,
+                                                                             self.negative_expiration_time, *args,
+                                                                             **kwargs)
+        finally:
+            self.lookups.current = previous_lookups
+            self.lookups.refreshes = previous_refreshes
+
+        # a stale value being refreshed is counted as an expiration once refreshed
+        if not creations and not refreshes:
+            self._record_stats(key, 'hits')
+
+        return value
+
+    def close(self):
+        """Close the backend, if it supports it."""
+        if hasattr(self.actual_backend, 'close'):
+            self.actual_backend.close()
+
+    def flush_stats(self):
+        """Persist the statistics recorded since the last flush, if the backend supports it."""
+        if not hasattr(self.actual_backend, 'add_stats'):
+            return
+
+        with self.stats_lock:
+            stats, self.stats = self.stats, {}
+        if stats:
+            self.actual_backend.add_stats(stats)
+
+    def get_stats(self):
+        """Get the statistics per key namespace, including the persisted ones.
+
+        Each namespace has its counters of :data:`STATS_COUNTERS`, the estimated time saved by hits in seconds in
+        ``saved_time`` and the size of its values in bytes in ``size``, when the backend supports it.
+
+        :return: the statistics per key namespace.
+        :rtype: dict
+
+        """
+        self.flush_stats()
+        backend = self.actual_backend
+        stats = backend.get_stats() if hasattr(backend, 'get_stats') else {}
+        with self.stats_lock:
+            for namespace, namespace_stats in self.stats.items():
+                stats[namespace] = {k: stats.get(namespace, {}).get(k, 0) + v for k, v in namespace_stats.items()}
+        sizes = backend.get_sizes() if hasattr(backend, 'get_sizes') else {}
+
+        for namespace in set(stats) | set(sizes):
+            namespace_stats = stats.setdefault(namespace, dict.fromkeys(STATS_COUNTERS, 0))
+            creations = namespace_stats['misses'] + namespace_stats['expirations']
+            namespace_stats['saved_time'] = (namespace_stats['hits'] * namespace_stats['creation_time'] / creations
+                                             if creations else 0)
+            namespace_stats['size'] = sizes.get(namespace)
+
+        return stats
+
+
+region = SubliminalCacheRegion(function_key_generator=to_native_str_key_generator)
+
+
+class SQLiteLock(object):
+    """Process-safe lock of a key of a :class:`SQLiteBackend`, stored in its ``locks`` table.
+
+    :param backend: the backend.
+    :type backend: :class:`SQLiteBackend`
+    :param str key: the key to lock.
+
+    """
+    #: Whether the lock can be released by another thread than the one that acquired it
+    release_from_any_thread = True
+
+    def __init__(self, backend, key):
+        self.backend = backend
+        self.key = key
+        self.token = None
+
+    def acquire(self, wait=True):
+        token = uuid.uuid4().hex
+        while True:
+            if self.backend.acquire_lock(self.key, token):
+                self.token = token
+                return True
+
+            if not wait:
+                return False
+
+            time.sleep(self.backend.lock_sleep)
+
+    def release(self):
+        self.backend.release_lock(self.key, self.token)
+        self.token = None
+
+    def locked(self):
+        return self.backend.is_locked(self.key)
+
+
+class SQLiteBackend(CacheBackend):
+    """A dogpile.cache backend storing serialized values in a SQLite database in WAL mode.
+
+    The database can be shared by several threads and processes: each thread uses its own connection, readers do not
+    block each other and locks of the keys are stored in the database. Rows expire after `expiration_time` and are
+    purged when the backend is created. When `max_size` is set, the least recently used rows are evicted to keep the
+    size of the values under `max_size`. Values are serialized by a :class:`Serializer`.
+
+    Arguments:
+
+    * ``filename``: path to the database.
+    * ``expiration_time``: seconds after which rows expire, default is no expiration.
+    * ``timeout``: seconds to wait for the database to be unlocked, default is 30.
+    * ``lock_timeout``: seconds after which a lock is considered stale, default is 60.
+    * ``lock_sleep``: seconds to sleep between attempts to acquire a lock, default is 0.1.
+    * ``max_size``: maximum size of the values in bytes, default is no maximum.
+    * ``access_resolution``: seconds between two updates of the access time of a row, default is 3600.
+    * ``serializer``: format of the values, 'pickle', 'marshal' or 'msgpack', default is 'pickle'.
+    * ``compression``: compression of the large values, 'zlib' or 'zstd', default is no compression.
+    * ``compression_threshold``: minimum size in bytes of a value to compress it, default is 1024.
+
+    """
+    def __init__(self, arguments):
+        self.filename = os.path.abspath(os.path.normpath(arguments['filename']))
+        self.expiration_time = arguments.get('expiration_time')
+        if isinstance(self.expiration_time, datetime.timedelta):
+            self.expiration_time = self.expiration_time.total_seconds()
+        self.timeout = arguments.get('timeout', 30)
+        self.lock_timeout = arguments.get('lock_timeout', 60)
+        self.lock_sleep = arguments.get('lock_sleep', 0.1)
+        self.max_size = arguments.get('max_size')
+        self.access_resolution = arguments.get('access_resolution', 3600)
+        self.value_serializer = Serializer(arguments.get('serializer', 'pickle'), arguments.get('compression'),
+                                           arguments.get('compression_threshold', 1024))
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._sets = 0
+
+        # create the tables
+        connection = self._get_connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                           'size INTEGER NOT NULL, expires REAL, accessed REAL NOT NULL)')
+        connection.execute('CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)')
+        connection.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+        connection.execute('CREATE TABLE IF NOT EXISTS locks (key TEXT PRIMARY KEY, token TEXT NOT NULL, '
+                           'acquired REAL NOT NULL)')
+        connection.execute('CREATE TABLE IF NOT EXISTS stats (namespace TEXT PRIMARY KEY, hits INTEGER NOT NULL, '
+                           'misses INTEGER NOT NULL, expirations INTEGER NOT NULL, creation_time REAL NOT NULL)')
+
+        self.purge_expired()
+        if self.max_size is not None:
+            self.evict(self.max_size)
+
+    def _get_connection(self):
+        # connections are not shared between threads nor with forked processes
+        if getattr(self._local, 'pid', None) != os.getpid():
+            # connections are only used by their thread, but closed by the thread calling close
+            connection = sqlite3.connect(self.filename, timeout=self.timeout, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+            with self._connections_lock:
+                self._connections.append((os.getpid(), connection))
+
+        return self._local.connection
+
+    def close(self):
+        """Close the connections of all the threads of the current process.
+
+        New connections are opened if the backend is used again.
+
+        """
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        for pid, connection in connections:
+            if pid == os.getpid():
+                connection.close()
+
+    def _get_expires(self):
+        if self.expiration_time is None:
+            return None
+
+        return time.time() + self.expiration_time
+
+    def purge_expired(self):
+        """Delete the expired rows.
+
+        :return: the number of deleted rows.
+        :rtype: int
+
+        """
+        cursor = self._get_connection().execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        logger.debug('Purged %d expired rows', cursor.rowcount)
+
+        return cursor.rowcount
+
+    def get_size(self):
+        """Get the size of the values.
+
+        :return: the size in bytes.
+        :rtype: int
+
+        """
+        return self._get_connection().execute('SELECT COALESCE(SUM(size), 0) FROM cache').fetchone()[0]
+
+    def get_sizes(self):
+        """Get the size of the values per key namespace.
+
+        :return: the size in bytes per key namespace.
+        :rtype: dict
+
+        """
+        sizes = {}
+        for key, size in self._get_connection().execute('SELECT key, size FROM cache'):
+            namespace = get_key_namespace(key)
+            sizes[namespace] = sizes.get(namespace, 0) + size
+
+        return sizes
+
+    def add_stats(self, stats):
+        """Add statistics per key namespace to the persisted ones.
+
+        :param dict stats: counters of :data:`STATS_COUNTERS` per key namespace.
+
+        """
+        rows = [(namespace,) + tuple(namespace_stats[k] for k in STATS_COUNTERS)
+                for namespace, namespace_stats in stats.items()]
+        connection = self._get_connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany('INSERT INTO stats (namespace, %s) VALUES (?, ?, ?, ?, ?) '
+                                   'ON CONFLICT (namespace) DO UPDATE SET %s' % (
+                                       ', '.join(STATS_COUNTERS),
+                                       ', '.join('%s = %s + excluded.%s' % (k, k, k) for k in STATS_COUNTERS)),
+                                   rows)
+
+    def get_stats(self):
+        """Get the persisted statistics per key namespace.
+
+        :return: counters of :data:`STATS_COUNTERS` per key namespace.
+        :rtype: dict
+
+        """
+        rows = self._get_connection().execute('SELECT namespace, %s FROM stats' % ', '.join(STATS_COUNTERS))
+
+        return {row[0]: dict(zip(STATS_COUNTERS, row[1:])) for row in rows}
+
+    def evict(self, max_size):
+        """Evict the least recently used rows until the size of the values is under `max_size`.
+
+        :param int max_size: maximum size of the values in bytes.
+        :return: the number of evicted rows.
+        :rtype: int
+
+        """
+        connection = self._get_connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            size = connection.execute('SELECT COALESCE(SUM(size), 0) FROM cache').fetchone()[0]
+            keys = []
+            if size > max_size:
+                for key, row_size in connection.execute('SELECT key, size FROM cache ORDER BY accessed'):
+                    keys.append((key,))
+                    size -= row_size
+                    if size <= max_size:
+                        break
+                connection.executemany('DELETE FROM cache WHERE key = ?', keys)
+        logger.debug('Evicted %d rows', len(keys))
+
+        return len(keys)
+
+    def compact(self, max_size=None):
+        """Purge the expired rows, evict rows above `max_size` and rewrite the database to reclaim free space.
+
+        :param int max_size: maximum size of the values in bytes, defaults to the `max_size` argument.
+        :return: the number of removed rows.
+        :rtype: int
+
+        """
+        removed = self.purge_expired()
+        max_size = max_size if max_size is not None else self.max_size
+        if max_size is not None:
+            removed += self.evict(max_size)
+
+        connection = self._get_connection()
+        connection.execute('DELETE FROM locks WHERE acquired <= ?', (time.time() - self.lock_timeout,))
+        connection.execute('VACUUM')
+        connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        logger.info('Compacted %s', self.filename)
+
+        return removed
+
+    def get_mutex(self, key):
+        return SQLiteLock(self, key)
+
+    def acquire_lock(self, key, token):
+        """Acquire the lock of a `key` with a `token`, replacing a stale lock.
+
+        :param str key: the key.
+        :param str token: the token identifying the owner of the lock.
+        :return: whether the lock was acquired.
+        :rtype: bool
+
+        """
+        now = time.time()
+        connection = self._get_connection()
+        connection.execute('DELETE FROM locks WHERE key = ? AND acquired <= ?', (key, now - self.lock_timeout))
+        try:
+            connection.execute('INSERT INTO locks (key, token, acquired) VALUES (?, ?, ?)', (key, token, now))
+        except sqlite3.IntegrityError:
+            return False
+
+        return True
+
+    def release_lock(self, key, token):
+        """Release the lock of a `key` acquired with `token`.
+
+        :param str key: the key.
+        :param str token: the token identifying the owner of the lock.
+
+        """
+        self._get_connection().execute('DELETE FROM locks WHERE key = ? AND token = ?', (key, token))
+
+    def is_locked(self, key):
+        """Whether the `key` is locked.
+
+        :param str key: the key.
+        :rtype: bool
+
+        """
+        row = self._get_connection().execute('SELECT 1 FROM locks WHERE key = ? AND acquired > ?',
+                                             (key, time.time() - self.lock_timeout)).fetchone()
+
+        return row is not None
+
+    def _dumps(self, value):
+        # cached values of the region are stored as tuples that compact formats support
+        if isinstance(value, CachedValue):
+            return b'c' + self.value_serializer.dumps(tuple(value))
+
+        return b'v' + self.value_serializer.dumps(value)
+
+    def _loads(self, key, value):
+        value = bytes(value)
+        try:
+            if value[:1] == b'c':
+                return CachedValue(*self.value_serializer.loads(value[1:]))
+            if value[:1] == b'v':
+                return self.value_serializer.loads(value[1:])
+
+            # values of previous versions are plain pickles
+            return self.value_serializer.loads(value)
+        except Exception:
+            logger.warning('Unable to load cached value of %r', key)
+            return NO_VALUE
+
+    def get(self, key):
+        now = time.time()
+        connection = self._get_connection()
+        row = connection.execute('SELECT value, accessed FROM cache WHERE key = ? AND (expires IS NULL OR '
+                                 'expires > ?)', (key, now)).fetchone()
+        if row is None:
+            return NO_VALUE
+
+        # update the access time, with a coarse resolution to keep reads from writing
+        if now - row[1] > self.access_resolution:
+            try:
+                connection.execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+            except sqlite3.OperationalError:
+                logger.debug('Unable to update the access time of %r', key)
+
+        return self._loads(key, row[0])
+
+    def get_multi(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value):
+        self.set_multi({key: value})
+
+    def set_multi(self, mapping):
+        now = time.time()
+        expires = self._get_expires()
+        rows = []
+        for key, value in mapping.items():
+            value = self._dumps(value)
+            rows.append((key, sqlite3.Binary(value), len(value), expires, now))
+        connection = self._get_connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany('INSERT OR REPLACE INTO cache (key, value, size, expires, accessed) '
+                                   'VALUES (?, ?, ?, ?, ?)', rows)
+
+        # evict from time to time
+        self._sets += len(rows)
+        if self.max_size is not None and self._sets >= 100:
+            self._sets = 0
+            self.evict(self.max_size)
+
+    def delete(self, key):
+        self.delete_multi([key])
+
+    def delete_multi(self, keys):
+        connection = self._get_connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany('DELETE FROM cache WHERE key = ?', [(key,) for key in keys])
+
+
+class SubtitleContentCache(object):
+    """An on-disk cache of downloaded :attr:`~subliminal.subtitle.Subtitle.content`, keyed by provider name and
+    subtitle id.
+
+    Each content is stored in a file named after the SHA-1 of its key, in a sub-directory named after the first two
+    characters of the SHA-1. Files are written atomically so the cache can be shared by several processes. The
+    modification time of a file is the time it was stored and its access time is updated on hits: files expire after
+    `expiration_time` and, when `max_size` is set, the least recently used files are evicted to keep the size of the
+    cache under `max_size`.
+
+    :param str directory: path to the directory of the cache.
+    :param int max_size: maximum size of the cache in bytes, ``None`` for no maximum.
+    :param expiration_time: seconds after which contents expire, ``None`` for no expiration.
+    :type expiration_time: int or :class:`datetime.timedelta`
+
+    """
+    def __init__(self, directory, max_size=None, expiration_time=None):
+        if isinstance(expiration_time, datetime.timedelta):
+            expiration_time = expiration_time.total_seconds()
+
+        #: Path to the directory of the cache
+        self.directory = directory
+
+        #: Maximum size of the cache in bytes
+        self.max_size = max_size
+
+        #: Seconds after which contents expire
+        self.expiration_time = expiration_time
+
+        self._sets = 0
+        self._sets_lock = threading.Lock()
+
+    def _get_path(self, provider_name, subtitle_id):
+        key = u'{}|{}'.format(provider_name, subtitle_id)
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _iter_files(self):
+        for path in glob.glob(os.path.join(self.directory, '??', '*')):
+            try:
+                yield path, os.stat(path)
+            except OSError:
+                continue
+
+    def get(self, provider_name, subtitle_id):
+        """Get the cached content of a subtitle.
+
+        :param str provider_name: name of the provider of the subtitle.
+        :param subtitle_id: id of the subtitle.
+        :return: the content, if cached and not expired.
+        :rtype: bytes
+
+        """
+        path = self._get_path(provider_name, subtitle_id)
+        try:
+            stat = os.stat(path)
+            if self.expiration_time is not None and time.time() - stat.st_mtime > self.expiration_time:
+                return None
+            with open(path, 'rb') as f:
+                content = f.read()
+
+            # update the access time
+            os.utime(path, (time.time(), stat.st_mtime))
+        except (IOError, OSError):
+            return None
+
+        return content
+
+    def set(self, provider_name, subtitle_id, content):
+        """Cache the content of a subtitle.
+
+        :param str provider_name: name of the provider of the subtitle.
+        :param subtitle_id: id of the subtitle.
+        :param bytes content: the content.
+
+        """
+        path = self._get_path(provider_name, subtitle_id)
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+        except OSError:
+            if not os.path.isdir(os.path.dirname(path)):
+                raise
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(temp_path, path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+        # evict from time to time
+        with self._sets_lock:
+            self._sets += 1
+            evict = self.max_size is not None and self._sets >= 100
+            if evict:
+                self._sets = 0
+        if evict:
+            self.evict(self.max_size)
+
+    def get_size(self):
+        """Get the size of the cached contents.
+
+        :return: the size in bytes.
+        :rtype: int
+
+        """
+        return sum(stat.st_size for _, stat in self._iter_files())
+
+    def evict(self, max_size=None):
+        """Delete the expired contents and the least recently used ones to keep the size under `max_size`.
+
+        :param int max_size: maximum size of the cache in bytes, ``None`` to only delete the expired contents.
+        :return: the number of deleted contents.
+        :rtype: int
+
+        """
+        now = time.time()
+        files = []
+        expired = []
+        for path, stat in self._iter_files():
+            if self.expiration_time is not None and now - stat.st_mtime > self.expiration_time:
+                expired.append(path)
+            else:
+                files.append((stat.st_atime, stat.st_size, path))
+
+        # least recently used first
+        if max_size is not None:
+            files.sort()
+            size = sum(f[1] for f in files)
+            for _, file_size, path in files:
+                if size <= max_size:
+                    break
+                expired.append(path)
+                size -= file_size
+
+        deleted = 0
+        for path in expired:
+            try:
+                os.remove(path)
+                deleted += 1
+            except OSError:
+                continue
+        logger.debug('Evicted %d subtitle contents', deleted)
+
+        return deleted
+
+    def clear(self):
+        """Delete all the cached contents."""
+        for path, _ in self._iter_files():
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+
+
+class SessionStore(object):
+    """An on-disk store of the sessions of authenticated providers and refiners, keyed by service name and username, so
+    they resume a session instead of logging in again on each run.
+
+    A session is a JSON-serializable dict, like a token or cookies, stored with its date in a file named after the
+    SHA-1 of its key. The directory and the files are only accessible to the user and the files are written
+    atomically. Passwords must never be stored. Sessions expire after `expiration_time`, the services still have to
+    check that a resumed session is valid.
+
+    :param str directory: path to the directory of the store.
+    :param expiration_time: seconds after which sessions expire, ``None`` for no expiration.
+    :type expiration_time: int or :class:`datetime.timedelta`
+
+    """
+    def __init__(self, directory, expiration_time=None):
+        if isinstance(expiration_time, datetime.timedelta):
+            expiration_time = expiration_time.total_seconds()
+
+        #: Path to the directory of the store
+        self.directory = directory
+
+        #: Seconds after which sessions expire
+        self.expiration_time = expiration_time
+
+    def _get_path(self, name, username):
+        key = u'{}|{}'.format(name, username or '')
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+        return os.path.join(self.directory, digest)
+
+    def get(self, name, username=None):
+        """Get a stored session.
+
+        :param str name: name of the service.
+        :param str username: username of the session.
+        :return: the session and the time it was stored, if stored and not expired.
+        :rtype: tuple(dict, float)
+
+        """
+        path = self._get_path(name, username)
+        try:
+            with open(path, 'rb') as f:
+                data = json.loads(f.read().decode('utf-8'))
+        except (IOError, OSError, ValueError):
+            return None, None
+
+        if self.expiration_time is not None and time.time() - data['date'] > self.expiration_time:
+            return None, None
+
+        return data['session'], data['date']
+
+    def set(self, name, username, session):
+        """Store a session.
+
+        :param str name: name of the service.
+        :param str username: username of the session.
+        :param dict session: the session.
+
+        """
+        try:
+            os.makedirs(self.directory, 0o700)
+        except OSError:
+            if not os.path.isdir(self.directory):
+                raise
+
+        # mkstemp creates the file readable and writable by the user only
+        fd, temp_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(json.dumps({'date': time.time(), 'session': session}).encode('utf-8'))
+            os.replace(temp_path, self._get_path(name, username))
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+    def delete(self, name, username=None):
+        """Delete a stored session.
+
+        :param str name: name of the service.
+        :param str username: username of the session.
+
+        """
+        try:
+            os.remove(self._get_path(name, username))
+        except OSError:
+            pass
+
+    def clear(self):
+        """Delete all the stored sessions."""
+        for path in glob.glob(os.path.join(self.directory, '*')):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+
+
+def compact_dbm(filename):
+    """Rewrite a dbm file to reclaim the space left by overwritten and deleted values.
+
+    :param str filename: path to the dbm file.
+
+    """
+    compact_filename = filename + '.compact'
+    with closing(dbm.open(filename, 'r')) as db, closing(dbm.open(compact_filename, 'n')) as compact_db:
+        for key in db.keys():
+            compact_db[key] = db[key]
+
+    # replace the files of the database with the compacted ones
+    compact_files = glob.glob(compact_filename + '*')
+    for file in glob.glob(filename + '*'):
+        if file not in compact_files:
+            os.remove(file)
+    for file in compact_files:
+        os.rename(file, filename + file[len(compact_filename):])
+    logger.info('Compacted %s', filename)
+
+
+class MemoryCacheProxy(ProxyBackend):
+    """A dogpile.cache proxy keeping the most recently used values in memory, in front of the proxied backend.
+
+    Values are kept as returned by the proxied backend so, with backends that do not use a serializer like
+    :class:`SQLiteBackend`, hot values are only deserialized once per process. It is of no use in front of a region
+    with a serializer, which deserializes every value it gets. Values are shared by all the callers and must not be
+    modified. Serialized values, from :meth:`get_serialized`, are kept apart from the others.
+
+    :param int max_size: maximum number of values kept in memory, per representation.
+    :param expiration_time: seconds after which a value is reloaded from the proxied backend.
+    :type expiration_time: int or :class:`datetime.timedelta`
+
+    """
+    def __init__(self, max_size=256, expiration_time=600):
+        super(MemoryCacheProxy, self).__init__()
+        self.max_size = max_size
+        if isinstance(expiration_time, datetime.timedelta):
+            expiration_time = expiration_time.total_seconds()
+        self.expiration_time = expiration_time
+        self.values = OrderedDict()
+        self.serialized_values = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _get_memory(self, values, key):
+        with self.lock:
+            if key not in values:
+                return NO_VALUE
+
+            value, stored = values[key]
+            if self.expiration_time is not None and time.time() - stored > self.expiration_time:
+                del values[key]
+                return NO_VALUE
+
+            # mark as most recently used
+            del values[key]
+            values[key] = value, stored
+
+            return value
+
+    def _set_memory(self, values, key, value):
+        if value is NO_VALUE:
+            return
+
+        with self.lock:
+            values.pop(key, None)
+            values[key] = value, time.time()
+            while len(values) > self.max_size:
+                values.popitem(last=False)
+
+    def _delete_memory(self, key):
+        with self.lock:
+            self.values.pop(key, None)
+            self.serialized_values.pop(key, None)
+
+    def clear_memory(self):
+        """Clear the values kept in memory."""
+        with self.lock:
+            self.values.clear()
+            self.serialized_values.clear()
+
+    def _get(self, values, key, get):
+        value = self._get_memory(values, key)
+        if value is NO_VALUE:
+            value = get(key)
+            self._set_memory(values, key, value)
+
+        return value
+
+    def _get_multi(self, values, keys, get_multi):
+        memory_values = [self._get_memory(values, key) for key in keys]
+        missing_keys = [key for key, value in zip(keys, memory_values) if value is NO_VALUE]
+        if missing_keys:
+            missing_values = dict(zip(missing_keys, get_multi(missing_keys)))
+            for key, value in missing_values.items():
+                self._set_memory(values, key, value)
+            memory_values = [missing_values[key] if value is NO_VALUE else value
+                             for key, value in zip(keys, memory_values)]
+
+        return memory_values
+
+    def get(self, key):
+        return self._get(self.values, key, self.proxied.get)
+
+    def get_multi(self, keys):
+        return self._get_multi(self.values, list(keys), self.proxied.get_multi)
+
+    def get_serialized(self, key):
+        return self._get(self.serialized_values, key, self.proxied.get_serialized)
+
+    def get_serialized_multi(self, keys):
+        return self._get_multi(self.serialized_values, list(keys), self.proxied.get_serialized_multi)
+
+    def set(self, key, value):
+        self.proxied.set(key, value)
+        self._delete_memory(key)
+        self._set_memory(self.values, key, value)
+
+    def set_multi(self, mapping):
+        self.proxied.set_multi(mapping)
+        for key, value in mapping.items():
+            self._delete_memory(key)
+            self._set_memory(self.values, key, value)
+
+    def set_serialized(self, key, value):
+        self.proxied.set_serialized(key, value)
+        self._delete_memory(key)
+        self._set_memory(self.serialized_values, key, value)
+
+    def set_serialized_multi(self, mapping):
+        self.proxied.set_serialized_multi(mapping)
+        for key, value in mapping.items():
+            self._delete_memory(key)
+            self._set_memory(self.serialized_values, key, value)
+
+    def delete(self, key):
+        self._delete_memory(key)
+        self.proxied.delete(key)
+
+    def delete_multi(self, keys):
+        keys = list(keys)
+        for key in keys:
+            self._delete_memory(key)
+        self.proxied.delete_multi(keys)
+
+
+register_backend('subliminal.sqlite', 'subliminal.cache', 'SQLiteBackend')
@@ -6,7 +6,6 @@ Subliminal uses `click <http://click.pocoo.org>`_ to provide a powerful :abbr:`C
 from __future__ import division
 
 import sys
-from collections import defaultdict
 from datetime import timedelta
 import glob
 import json
@@ -22,8 +21,10 @@ from dogpile.util.readwrite_lock import ReadWriteMutex
 from six.moves import configparser
 
 from subliminal import (AsyncProviderPool, Episode, Movie, Video, __version__, check_video, compute_score, get_scores,
-                        provider_manager, refine, refiner_manager, region, save_subtitles, scan_video, scan_videos, curl)
-from subliminal.core import ARCHIVE_EXTENSIONS, search_external_subtitles
+                        provider_manager, refine, refiner_manager, region, save_subtitles, scan_video, scan_videos,
+                        warm_cache, curl)
+from subliminal.cache import MemoryCacheProxy, Serializer, SessionStore, SubtitleContentCache, compact_dbm
+from subliminal.core import ARCHIVE_EXTENSIONS, group_videos_by_languages, search_external_subtitles
 
 logger = logging.getLogger(__name__)
 
@@ -228,15 +229,96 @@ class AgeParamType(click.ParamType):
 
 AGE = AgeParamType()
 
+
+class SizeParamType(click.ParamType):
+    """:class:`~click.ParamType` for size strings that returns a number of bytes
+
+    A size string is in the form `number + unit` with possible units ``K``, ``M`` and ``G``, optionally followed by
+    ``B``. For example ``500K``, ``200MB`` or ``1G``.
+
+    """
+    name = 'size'
+
+    def convert(self, value, param, ctx):
+        match = re.match(r'^(?P<number>\d+)(?P<unit>[KMG]?)B?$', value.upper())
+        if not match:
+            self.fail('%s is not a valid size' % value)
+
+        return int(match.group('number')) * 1024 ** ' KMG'.index(match.group('unit') or ' ')
+
+
+SIZE = SizeParamType()
+
 PROVIDER = click.Choice(sorted(provider_manager.names()))
 
 REFINER = click.Choice(sorted(refiner_manager.names()))
 
 dirs = AppDirs('subliminal')
-cache_file = 'subliminal.dbm'
+cache_files = {'sqlite': 'subliminal.sqlite', 'dbm': 'subliminal.dbm'}
+content_cache_directory = 'subtitles'
+session_store_directory = 'sessions'
+download_batch_size = 20
 config_file = 'config.ini'
 
 
+def format_saved_subtitles(video, saved_subtitles, verbose, hearing_impaired):
+    """Format the report of the `saved_subtitles` of a video for the download command.
+
+    :param video: the video.
+    :type video: :class:`~subliminal.video.Video`
+    :param saved_subtitles: the saved subtitles of the video.
+    :type saved_subtitles: list of :class:`~subliminal.subtitle.Subtitle`
+    :param int verbose: verbosity of the report.
+    :param bool hearing_impaired: hearing impaired preference.
+    :return: the lines of the report.
+    :rtype: list of str
+
+    """
+    lines = ['%s subtitle%s downloaded for %s' % (click.style(str(len(saved_subtitles)), bold=True),
+                                                  's' if len(saved_subtitles) > 1 else '',
+                                                  os.path.split(video.name)[1])]
+
+    if verbose > 1:
+        for s in saved_subtitles:
+            matches = s.get_matches(video)
+            score = compute_score(s, video)
+
+            # score color
+            score_color = None
+            scores = get_scores(video)
+            if isinstance(video, Movie):
+                if score < scores['title']:
+                    score_color = 'red'
+                elif score < scores['title'] + scores['year'] + scores['release_group']:
+                    score_color = 'yellow'
+                else:
+                    score_color = 'green'
+            elif isinstance(video, Episode):
+                if score < scores['series'] + scores['season'] + scores['episode']:
+                    score_color = 'red'
+                elif score < scores['series'] + scores['season'] + scores['episode'] + scores['release_group']:
+                    score_color = 'yellow'
+                else:
+                    score_color = 'green'
+
+            # scale score from 0 to 100 taking out preferences
+            scaled_score = score
+            if s.hearing_impaired == hearing_impaired:
+                scaled_score -= scores['hearing_impaired']
+            scaled_score *= 100 / scores['hash']
+
+            # echo some nice colored output
+            lines.append('  - [{score}] {language} subtitle from {provider_name} (match on {matches})'.format(
+                score=click.style('{:5.1f}'.format(scaled_score), fg=score_color, bold=score >= scores['hash']),
+                language=s.language.name if s.language.country is None else '%s (%s)' % (s.language.name,
+                                                                                         s.language.country.name),
+                provider_name=s.provider_name,
+                matches=', '.join(sorted(matches, key=lambda m: scores.get(m, 0), reverse=True))
+            ))
+
+    return lines
+
+
 @click.group(context_settings={'max_content_width': 100}, epilog='Suggestions and bug reports are greatly appreciated: '
              'https://github.com/Diaoul/subliminal/')
 @click.option('--addic7ed-session', type=click.STRING, nargs=1, metavar='SESSION', help='Addic7ed session.')
@@ -247,10 +329,19 @@ config_file = 'config.ini'
 @click.option('--omdb', type=click.STRING, nargs=1, metavar='APIKEY', help='OMDB API key.')
 @click.option('--cache-dir', type=click.Path(writable=True, file_okay=False), default=dirs.user_cache_dir,
               show_default=True, expose_value=True, help='Path to the cache directory.')
+@click.option('--cache-backend', type=click.Choice(sorted(cache_files)), default='sqlite', show_default=True,
+              help='Cache backend, sqlite is safe to share between concurrent processes.')
+@click.option('--cache-serializer', type=click.Choice(sorted(Serializer.formats)), default='marshal',
+              show_default=True, help='Format of the cached values, values that it does not support are pickled.')
+@click.option('--cache-compression', type=click.Choice(['none', 'zlib', 'zstd']), default='zlib', show_default=True,
+              help='Compression of the large cached values.')
+@click.option('--content-cache-size', type=SIZE, default='100M', show_default=True, help='Maximum size of the cache '
+              'of downloaded subtitles, checked before downloading a subtitle again.')
 @click.option('--debug', is_flag=True, help='Print useful information for debugging subliminal and for reporting bugs.')
 @click.version_option(__version__)
 @click.pass_context
-def subliminal(ctx, addic7ed_session, addic7ed_fxcookies, legendastv, opensubtitles, omdb, cache_dir, debug):
+def subliminal(ctx, addic7ed_session, addic7ed_fxcookies, legendastv, opensubtitles, omdb, cache_dir, cache_backend,
+               cache_serializer, cache_compression, content_cache_size, debug):
     """Subtitles, faster than your thoughts."""
     # create cache directory
     try:
@@ -260,8 +351,28 @@ def subliminal(ctx, addic7ed_session, addic7ed_fxcookies, legendastv, opensubtit
             raise
 
     # configure cache
-    region.configure('dogpile.cache.dbm', expiration_time=timedelta(days=30),
-                     arguments={'filename': os.path.join(cache_dir, cache_file), 'lock_factory': MutexLock})
+    cache_path = os.path.join(cache_dir, cache_files[cache_backend])
+    if cache_compression == 'none':
+        cache_compression = None
+    try:
+        serializer = Serializer(cache_serializer, cache_compression)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--cache-serializer/--cache-compression')
+    if cache_backend == 'sqlite':
+        region.configure('subliminal.sqlite', expiration_time=timedelta(days=30),
+                         arguments={'filename': cache_path, 'expiration_time': timedelta(days=30),
+                                    'serializer': cache_serializer, 'compression': cache_compression},
+                         wrap=[MemoryCacheProxy()])
+    else:
+        region.configure('dogpile.cache.dbm', expiration_time=timedelta(days=30),
+                         arguments={'filename': cache_path, 'lock_factory': MutexLock})
+        region.serializer = serializer.dumps
+        region.deserializer = serializer.loads
+    # the locks of the dbm backend must be released by the thread that acquired them
+    region.stale_while_revalidate = cache_backend == 'sqlite'
+    ctx.call_on_close(region.close)
+    ctx.call_on_close(region.flush_stats)
+    ctx.call_on_close(region.wait_for_refreshes)
 
     # configure logging
     if debug:
@@ -274,7 +385,11 @@ def subliminal(ctx, addic7ed_session, addic7ed_fxcookies, legendastv, opensubtit
 
     ctx.obj = {
         'provider_configs': {},
-        'refiner_configs': {}
+        'refiner_configs': {},
+        'content_cache': SubtitleContentCache(os.path.join(cache_dir, content_cache_directory),
+                                              max_size=content_cache_size, expiration_time=timedelta(days=30)),
+        'session_store': SessionStore(os.path.join(cache_dir, session_store_directory),
+                                      expiration_time=timedelta(days=1))
     }
 
     # provider configs
@@ -291,18 +406,85 @@ def subliminal(ctx, addic7ed_session, addic7ed_fxcookies, legendastv, opensubtit
     # refiner configs
     if omdb:
         ctx.obj['refiner_configs']['omdb'] = {'apikey': omdb}
+    ctx.obj['refiner_configs']['tvdb'] = {'session_store': ctx.obj['session_store']}
 
 
 @subliminal.command()
 @click.option('--clear-subliminal', is_flag=True, help='Clear subliminal\'s cache. Use this ONLY if your cache is '
               'corrupted or if you experience issues.')
+@click.option('--compact', is_flag=True, help='Remove expired values and shrink subliminal\'s cache.')
+@click.option('--max-size', type=SIZE, help='Evict the least recently used values to keep subliminal\'s cache under '
+              'SIZE, e.g. 200M. Only supported by the sqlite cache backend.')
+@click.option('--stats', is_flag=True, help='Show statistics of subliminal\'s cache per cached function. Only '
+              'supported by the sqlite cache backend.')
+@click.option('--warm', type=click.Path(exists=True), multiple=True, metavar='PATH', help='Prefetch the cached '
+              'lookups of refiners and providers for the videos in PATH (can be used multiple times).')
+@click.option('-p', '--provider', type=PROVIDER, multiple=True, help='Provider to warm the cache of with --warm (can '
+              'be used multiple times).')
+@click.option('-r', '--refiner', type=REFINER, multiple=True, help='Refiner to warm the cache of with --warm (can be '
+              'used multiple times).')
+@click.option('-w', '--max-workers', type=click.IntRange(1, 50), default=None, help='Maximum number of threads to '
+              'use with --warm.')
 @click.pass_context
-def cache(ctx, clear_subliminal):
+def cache(ctx, clear_subliminal, compact, max_size, stats, warm, provider, refiner, max_workers):
     """Cache management."""
+    cache_backend = ctx.parent.params['cache_backend']
+    cache_path = os.path.join(ctx.parent.params['cache_dir'], cache_files[cache_backend])
     if clear_subliminal:
-        for file in glob.glob(os.path.join(ctx.parent.params['cache_dir'], cache_file) + '*'):
+        for file in glob.glob(cache_path + '*'):
             os.remove(file)
+        ctx.obj['content_cache'].clear()
+        ctx.obj['session_store'].clear()
         click.echo('Subliminal\'s cache cleared.')
+    elif compact or max_size is not None:
+        if cache_backend != 'sqlite' and max_size is not None:
+            raise click.BadParameter('only supported by the sqlite cache backend', param_hint='--max-size')
+
+        size = sum(os.path.getsize(file) for file in glob.glob(cache_path + '*'))
+        if cache_backend == 'sqlite':
+            if compact:
+                region.actual_backend.compact(max_size)
+            else:
+                region.actual_backend.evict(max_size)
+        else:
+            compact_dbm(cache_path)
+        ctx.obj['content_cache'].evict(ctx.obj['content_cache'].max_size)
+        new_size = sum(os.path.getsize(file) for file in glob.glob(cache_path + '*'))
+        click.echo('Subliminal\'s cache reduced from %.1f MB to %.1f MB.' % (size / 1024 ** 2, new_size / 1024 ** 2))
+    elif stats:
+        if cache_backend != 'sqlite':
+            raise click.BadParameter('only supported by the sqlite cache backend', param_hint='--stats')
+
+        row_format = '{:<64} {:>8} {:>8} {:>8} {:>9} {:>10} {:>10}'
+        click.echo(row_format.format('Function', 'Hits', 'Misses', 'Expired', 'Hit rate', 'Saved', 'Size'))
+        for namespace, namespace_stats in sorted(region.get_stats().items()):
+            requests = namespace_stats['hits'] + namespace_stats['misses'] + namespace_stats['expirations']
+            click.echo(row_format.format(
+                namespace, namespace_stats['hits'], namespace_stats['misses'], namespace_stats['expirations'],
+                '%.1f%%' % (100 * namespace_stats['hits'] / requests) if requests else '-',
+                '%.1fs' % namespace_stats['saved_time'],
+                '%.1f KB' % (namespace_stats['size'] / 1024) if namespace_stats['size'] is not None else '-'))
+        size = sum(os.path.getsize(file) for file in glob.glob(cache_path + '*'))
+        click.echo('Size on disk: %.1f MB' % (size / 1024 ** 2))
+    elif warm:
+        videos = []
+        with click.progressbar(warm, label='Collecting videos', item_show_func=lambda p: p or '') as bar:
+            for p in bar:
+                logger.debug('Collecting path %s', p)
+                try:
+                    if os.path.isdir(p):
+                        videos.extend(scan_videos(p))
+                    else:
+                        videos.append(scan_video(p))
+                except:
+                    logger.exception('Unexpected error while collecting path %s', p)
+
+        click.echo('Warming subliminal\'s cache for %s video%s' % (click.style(str(len(videos)), bold=True),
+                                                                   's' if len(videos) > 1 else ''))
+        warm_cache(videos, episode_refiners=refiner, movie_refiners=refiner,
+                   refiner_configs=ctx.obj['refiner_configs'], max_workers=max_workers, providers=provider,
+                   provider_configs=ctx.obj['provider_configs'], session_store=ctx.obj['session_store'])
+        click.echo('Subliminal\'s cache warmed.')
     else:
         click.echo('Nothing done.')
 
@@ -326,11 +508,13 @@ def cache(ctx, clear_subliminal):
 @click.option('-w', '--max-workers', type=click.IntRange(1, 50), default=None, help='Maximum number of threads to use.')
 @click.option('-z/-Z', '--archives/--no-archives', default=True, show_default=True, help='Scan archives for videos '
               '(supported extensions: %s).' % ', '.join(ARCHIVE_EXTENSIONS))
+@click.option('--cache-listings/--no-cache-listings', default=False, show_default=True, help='Cache the subtitles '
+              'listed by providers for a short time, so an interrupted run can be resumed without listing them again.')
 @click.option('-v', '--verbose', count=True, help='Increase verbosity.')
 @click.argument('path', type=click.Path(), required=True, nargs=-1)
 @click.pass_obj
 def download(obj, provider, refiner, language, age, directory, encoding, single, force, hearing_impaired, min_score,
-             max_workers, archives, verbose, path):
+             max_workers, archives, cache_listings, verbose, path):
     """Download best subtitles.
 
     PATH can be an directory containing videos, a video file path or a video file name. It can be used multiple times.
@@ -435,70 +619,47 @@ def download(obj, provider, refiner, language, age, directory, encoding, single,
     if not videos:
         return
 
-    # download best subtitles
-    downloaded_subtitles = defaultdict(list)
-    with AsyncProviderPool(max_workers=max_workers, providers=provider, provider_configs=obj['provider_configs']) as p:
-        with click.progressbar(videos, label='Downloading subtitles',
-                               item_show_func=lambda v: os.path.split(v.name)[1] if v is not None else '') as bar:
-            for v in bar:
-                scores = get_scores(v)
-                subtitles = p.download_best_subtitles(p.list_subtitles(v, language - v.subtitle_languages),
-                                                      v, language, min_score=scores['hash'] * min_score / 100,
-                                                      hearing_impaired=hearing_impaired, only_one=single)
-                downloaded_subtitles[v] = subtitles
+    # download best subtitles and save them after each batch
+    total_subtitles = 0
+    reports = []
+    with AsyncProviderPool(max_workers=max_workers, providers=provider, provider_configs=obj['provider_configs'],
+                           content_cache=obj['content_cache'], cache_listings=cache_listings,
+                           session_store=obj['session_store']) as p:
+        # log in and connect to all the providers at once
+        p.prewarm()
+
+        # batches of at most download_batch_size videos of the same type, searching for the same languages
+        batches = []
+        for batch_languages, batch in group_videos_by_languages(videos, language):
+            for video_type in (Episode, Movie):
+                typed_batch = [v for v in batch if isinstance(v, video_type)]
+                for i in range(0, len(typed_batch), download_batch_size):
+                    batches.append((batch_languages, typed_batch[i:i + download_batch_size]))
+
+        with click.progressbar(length=len(videos), label='Downloading subtitles') as bar:
+            for batch_languages, batch in batches:
+                scores = get_scores(batch[0])
+                downloaded_subtitles = p.download_best_subtitles_batch(p.list_subtitles_batch(batch, batch_languages),
+                                                                       language,
+                                                                       min_score=scores['hash'] * min_score / 100,
+                                                                       hearing_impaired=hearing_impaired,
+                                                                       only_one=single)
+
+                # save subtitles
+                for v, subtitles in downloaded_subtitles.items():
+                    saved_subtitles = save_subtitles(v, subtitles, single=single, directory=directory,
+                                                     encoding=encoding)
+                    total_subtitles += len(saved_subtitles)
+                    if verbose > 0:
+                        reports.extend(format_saved_subtitles(v, saved_subtitles, verbose, hearing_impaired))
+                bar.update(len(batch))
 
         if p.discarded_providers:
             click.secho('Some providers have been discarded due to unexpected errors: %s' %
                         ', '.join(p.discarded_providers), fg='yellow')
 
-    # save subtitles
-    total_subtitles = 0
-    for v, subtitles in downloaded_subtitles.items():
-        saved_subtitles = save_subtitles(v, subtitles, single=single, directory=directory, encoding=encoding)
-        total_subtitles += len(saved_subtitles)
-
-        if verbose > 0:
-            click.echo('%s subtitle%s downloaded for %s' % (click.style(str(len(saved_subtitles)), bold=True),
-                                                            's' if len(saved_subtitles) > 1 else '',
-                                                            os.path.split(v.name)[1]))
-
-        if verbose > 1:
-            for s in saved_subtitles:
-                matches = s.get_matches(v)
-                score = compute_score(s, v)
-
-                # score color
-                score_color = None
-                scores = get_scores(v)
-                if isinstance(v, Movie):
-                    if score < scores['title']:
-                        score_color = 'red'
-                    elif score < scores['title'] + scores['year'] + scores['release_group']:
-                        score_color = 'yellow'
-                    else:
-                        score_color = 'green'
-                elif isinstance(v, Episode):
-                    if score < scores['series'] + scores['season'] + scores['episode']:
-                        score_color = 'red'
-                    elif score < scores['series'] + scores['season'] + scores['episode'] + scores['release_group']:
-                        score_color = 'yellow'
-                    else:
-                        score_color = 'green'
-
-                # scale score from 0 to 100 taking out preferences
-                scaled_score = score
-                if s.hearing_impaired == hearing_impaired:
-                    scaled_score -= scores['hearing_impaired']
-                scaled_score *= 100 / scores['hash']
-
-                # echo some nice colored output
-                click.echo('  - [{score}] {language} subtitle from {provider_name} (match on {matches})'.format(
-                    score=click.style('{:5.1f}'.format(scaled_score), fg=score_color, bold=score >= scores['hash']),
-                    language=s.language.name if s.language.country is None else '%s (%s)' % (s.language.name,
-                                                                                             s.language.country.name),
-                    provider_name=s.provider_name,
-                    matches=', '.join(sorted(matches, key=lambda m: scores.get(m, 0), reverse=True))
-                ))
+    for report in reports:
+        click.echo(report)
 
     if verbose == 0:
         click.echo('Downloaded %s subtitle%s' % (click.style(str(total_subtitles), bold=True),
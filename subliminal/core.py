@@ -1,27 +1,43 @@
 # -*- coding: utf-8 -*-
-from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+import heapq
 import io
 import itertools
 import logging
+import multiprocessing
 import operator
 import os
+import threading
+import time
+from pickle import PicklingError
 
 from babelfish import Language, LanguageReverseError
 from guessit import guessit
 from rarfile import BadRarFile, NotRarFile, RarCannotExec, RarFile, Error, is_rarfile
 from zipfile import BadZipfile
 
+from dogpile.cache.api import NO_VALUE
+
+from .cache import LISTING_EXPIRATION_TIME, region
 from .extensions import provider_manager, default_providers, refiner_manager
-from .score import compute_score as default_compute_score
+from .score import compute_max_score, compute_score as default_compute_score
 from .subtitle import SUBTITLE_EXTENSIONS
-from .utils import handle_exception
+from .transport import create_transport
+from .utils import handle_exception, sanitize
 from .video import VIDEO_EXTENSIONS, Episode, Movie, Video
 
 #: Supported archive extensions
 ARCHIVE_EXTENSIONS = ('.rar',)
 
+#: Minimum number of subtitles for the scoring to be done in a pool of processes
+SCORE_PROCESSES_THRESHOLD = 500
+
+#: Maximum time in seconds to wait for the providers to terminate
+TERMINATE_TIMEOUT = 10
+
 logger = logging.getLogger(__name__)
 
 
@@ -37,17 +53,69 @@ class ProviderPool(object):
     :param list providers: name of providers to use, if not all.
     :param dict provider_configs: provider configuration as keyword arguments per provider name to pass when
         instantiating the :class:`~subliminal.providers.Provider`.
+    :param int score_threshold: minimum number of subtitles to score them in a pool of processes, see
+        :func:`score_subtitles`. If `None`, :data:`SCORE_PROCESSES_THRESHOLD` is used.
+    :param int score_workers: maximum number of processes to use for scoring. If `None`, the number of processors
+        on the machine is used. The pool of processes is created on the first scoring that needs it and shut down by
+        :meth:`terminate`.
+    :param content_cache: cache of downloaded subtitle contents, checked before downloading a subtitle.
+    :type content_cache: :class:`~subliminal.cache.SubtitleContentCache`
+    :param bool cache_listings: whether to cache the subtitles listed by each provider in the
+        :data:`~subliminal.cache.region` for :data:`~subliminal.cache.LISTING_EXPIRATION_TIME`, see
+        :func:`get_listing_key`.
+    :param dict transport_options: keyword arguments of the :class:`~subliminal.transport.Transport` created by the
+        pool for each backend and shared by its providers. If `None`, the providers use the default transports, see
+        :func:`~subliminal.transport.get_default_transport`.
+    :param float terminate_timeout: maximum time in seconds to wait for the providers to terminate. If `None`,
+        :data:`TERMINATE_TIMEOUT` is used.
+    :param session_store: store of the sessions of the providers, to resume them instead of logging in again.
+    :type session_store: :class:`~subliminal.cache.SessionStore`
 
     """
-    def __init__(self, providers=None, provider_configs=None):
+    def __init__(self, providers=None, provider_configs=None, score_threshold=None, score_workers=None,
+                 content_cache=None, cache_listings=False, transport_options=None, terminate_timeout=None,
+                 session_store=None):
         #: Name of providers to use
         self.providers = providers or default_providers
 
         #: Provider configuration
         self.provider_configs = provider_configs or {}
 
+        #: Minimum number of subtitles to score them in a pool of processes
+        self.score_threshold = score_threshold if score_threshold is not None else SCORE_PROCESSES_THRESHOLD
+
+        #: Maximum number of processes to use for scoring
+        self.score_workers = score_workers
+
+        #: Pool of processes used for scoring, see :meth:`get_score_executor`
+        self.score_executor = None
+        self.score_executor_lock = threading.Lock()
+
+        #: Cache of downloaded subtitle contents
+        self.content_cache = content_cache
+
+        #: Whether to cache the listed subtitles
+        self.cache_listings = cache_listings
+
+        #: Keyword arguments of the transports created by the pool
+        self.transport_options = transport_options
+
+        #: Transports created by the pool, per backend
+        self.transports = {}
+        self.transports_lock = threading.Lock()
+
+        #: Maximum time in seconds to wait for the providers to terminate
+        self.terminate_timeout = terminate_timeout if terminate_timeout is not None else TERMINATE_TIMEOUT
+
+        #: Store of the sessions of the providers
+        self.session_store = session_store
+
         #: Initialized providers
         self.initialized_providers = {}
+        self.initialized_providers_lock = threading.Lock()
+
+        #: Locks of the initialization of the providers, per provider
+        self.initialization_locks = {}
 
         #: Discarded providers
         self.discarded_providers = set()
@@ -61,28 +129,101 @@ class ProviderPool(object):
     def __getitem__(self, name):
         if name not in self.providers:
             raise KeyError
-        if name not in self.initialized_providers:
-            logger.info('Initializing provider %s', name)
-            provider = provider_manager[name].plugin(**self.provider_configs.get(name, {}))
-            provider.initialize()
-            self.initialized_providers[name] = provider
-
-        return self.initialized_providers[name]
+        provider = self.initialized_providers.get(name)
+        if provider is not None:
+            return provider
+
+        # a provider is initialized once, even when prewarmed while used
+        with self.initialized_providers_lock:
+            initialization_lock = self.initialization_locks.setdefault(name, threading.Lock())
+        with initialization_lock:
+            provider = self.initialized_providers.get(name)
+            if provider is None:
+                logger.info('Initializing provider %s', name)
+                provider = provider_manager[name].plugin(**self.provider_configs.get(name, {}))
+                provider.transport = self.get_transport(provider.transport_backend)
+                provider.session_store = self.session_store
+                provider.initialize()
+                with self.initialized_providers_lock:
+                    self.initialized_providers[name] = provider
+
+        return provider
 
     def __delitem__(self, name):
-        if name not in self.initialized_providers:
-            raise KeyError(name)
+        with self.initialized_providers_lock:
+            if name not in self.initialized_providers:
+                raise KeyError(name)
+            provider = self.initialized_providers.pop(name)
+
+        self.terminate_provider(name, provider)
+
+    def __iter__(self):
+        return iter(self.initialized_providers)
+
+    def get_transport(self, backend):
+        """Get the transport of the `backend` created by the pool for its providers.
 
+        :param str backend: name of the backend.
+        :return: the transport, or `None` if the pool has no :attr:`transport_options`.
+        :rtype: :class:`~subliminal.transport.Transport`
+
+        """
+        if self.transport_options is None:
+            return None
+
+        with self.transports_lock:
+            if backend not in self.transports:
+                self.transports[backend] = create_transport(backend, **self.transport_options)
+
+            return self.transports[backend]
+
+    def terminate_provider(self, name, provider):
+        """Terminate a single provider, already removed from the :attr:`initialized_providers`.
+
+        :param str name: name of the provider.
+        :param provider: the provider.
+        :type provider: :class:`~subliminal.providers.Provider`
+
+        """
         try:
             logger.info('Terminating provider %s', name)
-            self.initialized_providers[name].terminate()
+            provider.terminate()
         except Exception as e:
             handle_exception(e, 'Provider {} improperly terminated'.format(name))
 
-        del self.initialized_providers[name]
+    def prewarm_provider(self, provider):
+        """Initialize a single provider and warm up its connections.
 
-    def __iter__(self):
-        return iter(self.initialized_providers)
+        :param str provider: name of the provider.
+        :return: `True` if the provider has been initialized, `False` otherwise.
+        :rtype: bool
+
+        """
+        try:
+            self[provider].warm_up()
+        except Exception as e:
+            handle_exception(e, 'Provider {} not prewarmed'.format(provider))
+            return False
+
+        return True
+
+    def prewarm(self, max_workers=None):
+        """Initialize all the :attr:`providers` concurrently, instead of one at a time on first use.
+
+        The logins and the first connections of the providers, with their DNS lookups and TLS handshakes, are done at
+        once. Providers failing to initialize are initialized again on first use.
+
+        :param int max_workers: maximum number of threads to use. If `None`, one per provider.
+
+        """
+        providers = [p for p in self.providers if p not in self.initialized_providers]
+        if not providers:
+            return
+
+        logger.info('Prewarming providers %s', ', '.join(providers))
+        with ThreadPoolExecutor(max_workers or len(providers)) as executor:
+            for _ in executor.map(self.prewarm_provider, providers):
+                pass
 
     def list_subtitles_provider(self, provider, video, languages):
         """List subtitles with a single provider.
@@ -109,12 +250,130 @@ class ProviderPool(object):
             logger.info('Skipping provider %r: no language to search for', provider)
             return []
 
+        # check the listing cache
+        if self.cache_listings:
+            key = get_listing_key(provider, video, provider_languages)
+            subtitles = region.get(key, expiration_time=LISTING_EXPIRATION_TIME)
+            if subtitles is not NO_VALUE:
+                logger.info('Using %d cached subtitles of provider %r', len(subtitles), provider)
+                return subtitles
+
         # list subtitles
         logger.info('Listing subtitles with provider %r and languages %r', provider, provider_languages)
         try:
-            return self[provider].list_subtitles(video, provider_languages)
+            subtitles = self[provider].list_subtitles(video, provider_languages)
         except Exception as e:
             handle_exception(e, 'Provider {}'.format(provider))
+            return None
+
+        # cache the listed subtitles
+        if self.cache_listings:
+            region.set(key, subtitles)
+
+        return subtitles
+
+    def list_subtitles_provider_batch(self, provider, videos, languages):
+        """List subtitles for several videos with a single provider, using its
+        :meth:`~subliminal.providers.Provider.list_subtitles_batch`.
+
+        The videos and languages are checked against the provider.
+
+        :param str provider: name of the provider.
+        :param videos: videos to list subtitles for.
+        :type videos: list of :class:`~subliminal.video.Video`
+        :param languages: languages to search for.
+        :type languages: set of :class:`~babelfish.language.Language`
+        :return: found subtitles per video.
+        :rtype: dict of :class:`~subliminal.video.Video` to list of :class:`~subliminal.subtitle.Subtitle` or None
+
+        """
+        subtitles = {video: [] for video in videos}
+
+        # check videos validity
+        videos = [v for v in videos if provider_manager[provider].plugin.check(v)]
+        if not videos:
+            logger.info('Skipping provider %r: no valid video', provider)
+            return subtitles
+
+        # check supported languages
+        provider_languages = provider_manager[provider].plugin.check_languages(languages)
+        if not provider_languages:
+            logger.info('Skipping provider %r: no language to search for', provider)
+            return subtitles
+
+        # check the listing cache
+        keys = {}
+        if self.cache_listings:
+            uncached_videos = []
+            for video in videos:
+                keys[video] = get_listing_key(provider, video, provider_languages)
+                video_subtitles = region.get(keys[video], expiration_time=LISTING_EXPIRATION_TIME)
+                if video_subtitles is NO_VALUE:
+                    uncached_videos.append(video)
+                    continue
+                logger.info('Using %d cached subtitles of provider %r for %r', len(video_subtitles), provider, video)
+                subtitles[video] = video_subtitles
+            videos = uncached_videos
+            if not videos:
+                return subtitles
+
+        # list subtitles
+        logger.info('Listing subtitles of %d videos with provider %r and languages %r', len(videos), provider,
+                    provider_languages)
+        try:
+            listed_subtitles = self[provider].list_subtitles_batch(videos, provider_languages)
+        except Exception as e:
+            handle_exception(e, 'Provider {}'.format(provider))
+            return None
+
+        for video in videos:
+            subtitles[video] = listed_subtitles.get(video, [])
+
+            # cache the listed subtitles
+            if self.cache_listings:
+                region.set(keys[video], subtitles[video])
+
+        return subtitles
+
+    def warm_cache_provider(self, provider, videos):
+        """Prefetch the cached lookups of a single provider for the `videos`.
+
+        The videos are checked against the provider.
+
+        :param str provider: name of the provider.
+        :param videos: videos to prefetch the cached lookups for.
+        :type videos: list of :class:`~subliminal.video.Video`
+        :return: whether the provider succeeded.
+        :rtype: bool
+
+        """
+        videos = [v for v in videos if provider_manager[provider].plugin.check(v)]
+        logger.info('Warming cache of provider %r for %d videos', provider, len(videos))
+        for video in videos:
+            try:
+                self[provider].warm_cache(video)
+            except Exception as e:
+                handle_exception(e, 'Provider {}'.format(provider))
+                return False
+
+        return True
+
+    def warm_cache(self, videos):
+        """Prefetch the cached lookups of the providers for the `videos`.
+
+        :param videos: videos to prefetch the cached lookups for.
+        :type videos: list of :class:`~subliminal.video.Video`
+
+        """
+        for name in self.providers:
+            # check discarded providers
+            if name in self.discarded_providers:
+                logger.debug('Skipping discarded provider %r', name)
+                continue
+
+            if not self.warm_cache_provider(name, videos):
+                logger.info('Discarding provider %s', name)
+                self.discarded_providers.add(name)
 
     def list_subtitles(self, video, languages):
         """List subtitles.
@@ -147,35 +406,118 @@ class ProviderPool(object):
 
         return subtitles
 
+    def list_subtitles_batch(self, videos, languages):
+        """List subtitles for several videos, in as few requests as the providers allow.
+
+        :param videos: videos to list subtitles for.
+        :type videos: list of :class:`~subliminal.video.Video`
+        :param languages: languages to search for.
+        :type languages: set of :class:`~babelfish.language.Language`
+        :return: found subtitles per video.
+        :rtype: dict of :class:`~subliminal.video.Video` to list of :class:`~subliminal.subtitle.Subtitle`
+
+        """
+        subtitles = {video: [] for video in videos}
+
+        for name in self.providers:
+            # check discarded providers
+            if name in self.discarded_providers:
+                logger.debug('Skipping discarded provider %r', name)
+                continue
+
+            # list subtitles
+            provider_subtitles = self.list_subtitles_provider_batch(name, videos, languages)
+            if provider_subtitles is None:
+                logger.info('Discarding provider %s', name)
+                self.discarded_providers.add(name)
+                continue
+
+            # add the subtitles
+            for video in videos:
+                subtitles[video].extend(provider_subtitles[video])
+
+        return subtitles
+
     def download_subtitle(self, subtitle):
         """Download `subtitle`'s :attr:`~subliminal.subtitle.Subtitle.content`.
 
+        The content is taken from the :attr:`content_cache`, if any, before downloading it from the provider.
+
         :param subtitle: subtitle to download.
         :type subtitle: :class:`~subliminal.subtitle.Subtitle`
         :return: `True` if the subtitle has been successfully downloaded, `False` otherwise.
         :rtype: bool
 
         """
-        # check discarded providers
-        if subtitle.provider_name in self.discarded_providers:
-            logger.warning('Provider %r is discarded', subtitle.provider_name)
-            return False
+        return self.download_subtitles([subtitle])[0]
 
-        logger.info('Downloading subtitle %r', subtitle)
-        try:
-            self[subtitle.provider_name].download_subtitle(subtitle)
-        except (BadZipfile, BadRarFile):
-            logger.error('Bad archive for subtitle %r', subtitle)
-        except Exception as e:
-            handle_exception(e, 'Discarding provider {}'.format(subtitle.provider_name))
-            self.discarded_providers.add(subtitle.provider_name)
+    def download_subtitles(self, subtitles):
+        """Download the :attr:`~subliminal.subtitle.Subtitle.content` of several `subtitles`, in a single call to
+        :meth:`~subliminal.providers.Provider.download_subtitles` per provider.
 
-        # check subtitle validity
-        if not subtitle.is_valid():
-            logger.error('Invalid subtitle')
-            return False
+        The contents are taken from the :attr:`content_cache`, if any, before downloading them from the providers.
 
-        return True
+        :param subtitles: subtitles to download.
+        :type subtitles: list of :class:`~subliminal.subtitle.Subtitle`
+        :return: `True` for each subtitle that has been successfully downloaded, `False` otherwise.
+        :rtype: list of bool
+
+        """
+        # check the content cache
+        cached = set()
+        if self.content_cache is not None:
+            for subtitle in subtitles:
+                content = self.content_cache.get(subtitle.provider_name, subtitle.id)
+                if content is not None:
+                    subtitle.content = content
+                    if subtitle.is_valid():
+                        logger.info('Using cached content of subtitle %r', subtitle)
+                        cached.add(id(subtitle))
+                        continue
+                    subtitle.content = None
+
+        # group the subtitles left per provider
+        subtitles_per_provider = OrderedDict()
+        for subtitle in subtitles:
+            if id(subtitle) not in cached:
+                subtitles_per_provider.setdefault(subtitle.provider_name, []).append(subtitle)
+
+        for name, provider_subtitles in subtitles_per_provider.items():
+            # check discarded providers
+            if name in self.discarded_providers:
+                logger.warning('Provider %r is discarded', name)
+                continue
+
+            logger.info('Downloading %d subtitle(s) with provider %r', len(provider_subtitles), name)
+            try:
+                self[name].download_subtitles(provider_subtitles)
+            except (BadZipfile, BadRarFile):
+                logger.error('Bad archive for subtitles %r', provider_subtitles)
+            except Exception as e:
+                handle_exception(e, 'Discarding provider {}'.format(name))
+                self.discarded_providers.add(name)
+
+        # check subtitles validity
+        downloaded = []
+        for subtitle in subtitles:
+            if id(subtitle) in cached:
+                downloaded.append(True)
+                continue
+
+            if not subtitle.is_valid():
+                logger.error('Invalid subtitle %r', subtitle)
+                downloaded.append(False)
+                continue
+
+            # cache the content
+            if self.content_cache is not None:
+                try:
+                    self.content_cache.set(subtitle.provider_name, subtitle.id, subtitle.content)
+                except (IOError, OSError):
+                    logger.exception('Unable to cache the content of subtitle %r', subtitle)
+            downloaded.append(True)
+
+        return downloaded
 
     def download_best_subtitles(self, subtitles, video, languages, min_score=0, hearing_impaired=False, only_one=False,
                                 compute_score=None):
@@ -196,31 +538,118 @@ class ProviderPool(object):
         :rtype: list of :class:`~subliminal.subtitle.Subtitle`
 
         """
-        compute_score = compute_score or default_compute_score
+        downloaded_subtitles = []
+        best_subtitles = self.iter_best_subtitles(subtitles, video, languages, min_score=min_score,
+                                                  hearing_impaired=hearing_impaired, only_one=only_one,
+                                                  compute_score=compute_score)
+        subtitle = next(best_subtitles, None)
+        while subtitle is not None:
+            downloaded = self.download_subtitle(subtitle)
+            if downloaded:
+                downloaded_subtitles.append(subtitle)
+            subtitle = _next_or_none(best_subtitles, downloaded)
 
-        # sort subtitles by score
-        scored_subtitles = sorted([(s, compute_score(s, video, hearing_impaired=hearing_impaired))
-                                  for s in subtitles], key=operator.itemgetter(1), reverse=True)
+        return downloaded_subtitles
 
-        # download best subtitles, falling back on the next on error
-        downloaded_subtitles = []
-        for subtitle, score in scored_subtitles:
-            # check score
-            if score < min_score:
-                logger.info('Score %d is below min_score (%d)', score, min_score)
-                break
+    def download_best_subtitles_batch(self, subtitles, languages, min_score=0, hearing_impaired=False,
+                                      only_one=False, compute_score=None):
+        """Download the best matching subtitles of several videos.
 
-            # check downloaded languages
-            if subtitle.language in set(s.language for s in downloaded_subtitles):
-                logger.debug('Skipping subtitle: %r already downloaded', subtitle.language)
-                continue
+        Each round downloads the next best subtitle of every video with :meth:`download_subtitles`, so the providers
+        get the subtitles of all the videos at once.
+
+        :param dict subtitles: the subtitles to use per video.
+        :param languages: languages to download.
+        :type languages: set of :class:`~babelfish.language.Language`
+        :param int min_score: minimum score for a subtitle to be downloaded.
+        :param bool hearing_impaired: hearing impaired preference.
+        :param bool only_one: download only one subtitle per video, not one per language.
+        :param compute_score: function that takes `subtitle` and `video` as positional arguments,
+            `hearing_impaired` as keyword argument and returns the score.
+        :return: downloaded subtitles per video.
+        :rtype: dict of :class:`~subliminal.video.Video` to list of :class:`~subliminal.subtitle.Subtitle`
+
+        """
+        downloaded_subtitles = {video: [] for video in subtitles}
+
+        # next best subtitle of each video
+        best_subtitles = {}
+        next_subtitles = {}
+        for video, video_subtitles in subtitles.items():
+            best_subtitles[video] = self.iter_best_subtitles(video_subtitles, video, languages, min_score=min_score,
+                                                             hearing_impaired=hearing_impaired, only_one=only_one,
+                                                             compute_score=compute_score)
+            subtitle = next(best_subtitles[video], None)
+            if subtitle is not None:
+                next_subtitles[video] = subtitle
+
+        # download the next best subtitles until every video is done
+        while next_subtitles:
+            videos = list(next_subtitles)
+            batch = [next_subtitles[video] for video in videos]
+            next_subtitles = {}
+            for video, subtitle, downloaded in zip(videos, batch, self.download_subtitles(batch)):
+                if downloaded:
+                    downloaded_subtitles[video].append(subtitle)
+                subtitle = _next_or_none(best_subtitles[video], downloaded)
+                if subtitle is not None:
+                    next_subtitles[video] = subtitle
+
+        return downloaded_subtitles
+
+    def iter_best_subtitles(self, subtitles, video, languages, min_score=0, hearing_impaired=False, only_one=False,
+                            compute_score=None):
+        """Iterate over the best matching subtitles to download, without downloading them.
+
+        This generator yields the next subtitle to download and must be sent whether its download succeeded before it
+        yields the next one, falling back on the next subtitle of the same language on failure. It stops once a
+        subtitle is downloaded for each language, or for one language with `only_one`.
+
+        See :meth:`download_best_subtitles` for the parameters.
+
+        """
+        compute_score = compute_score or default_compute_score
+
+        # group subtitles per wanted language, remembering their position to break ties
+        positions = {}
+        subtitles_per_language = defaultdict(list)
+        for i, subtitle in enumerate(subtitles):
+            if subtitle.language in languages:
+                positions[id(subtitle)] = i
+                subtitles_per_language[subtitle.language].append(subtitle)
+
+        # score subtitles lazily, best first, for each language independently
+        scored_subtitles = {language: self.iter_scored_subtitles(language_subtitles, video, min_score=min_score,
+                                                                 hearing_impaired=hearing_impaired,
+                                                                 compute_score=compute_score)
+                            for language, language_subtitles in subtitles_per_language.items()}
+
+        # heap of the next best subtitle of each language
+        heap = []
+
+        def push(language):
+            scored_subtitle = next(scored_subtitles[language], None)
+            if scored_subtitle is not None:
+                subtitle, score = scored_subtitle
+                heapq.heappush(heap, (-score, positions[id(subtitle)], subtitle))
+
+        for language in scored_subtitles:
+            push(language)
+
+        # yield best subtitles, falling back on the next of the same language on error
+        downloaded_count = 0
+        while heap:
+            _, _, subtitle = heapq.heappop(heap)
 
             # download
-            if self.download_subtitle(subtitle):
-                downloaded_subtitles.append(subtitle)
+            if (yield subtitle):
+                downloaded_count += 1
+            else:
+                push(subtitle.language)
+                continue
 
             # stop when all languages are downloaded
-            if set(s.language for s in downloaded_subtitles) == languages:
+            if downloaded_count == len(languages):
                 logger.debug('All languages downloaded')
                 break
 
@@ -229,13 +658,153 @@ class ProviderPool(object):
                 logger.debug('Only one subtitle downloaded')
                 break
 
-        return downloaded_subtitles
+    def iter_scored_subtitles(self, subtitles, video, min_score=0, hearing_impaired=False, compute_score=None):
+        """Iterate over the `subtitles` and their score, best first.
+
+        Subtitles are scored lazily: with the default `compute_score`, the maximum score of each subtitle is computed
+        with :func:`~subliminal.score.compute_max_score` and a subtitle is only scored when no other subtitle can
+        score better. Subtitles with the same maximum score are scored together with :func:`score_subtitles`.
+
+        :param subtitles: the subtitles to score.
+        :type subtitles: list of :class:`~subliminal.subtitle.Subtitle`
+        :param video: video to score the subtitles against.
+        :type video: :class:`~subliminal.video.Video`
+        :param int min_score: minimum score for a subtitle to be yielded.
+        :param bool hearing_impaired: hearing impaired preference.
+        :param compute_score: function that takes `subtitle` and `video` as positional arguments,
+            `hearing_impaired` as keyword argument and returns the score.
+        :return: the subtitles and their score, best first.
+        :rtype: iterator of tuple of :class:`~subliminal.subtitle.Subtitle` and int
+
+        """
+        compute_score = compute_score or default_compute_score
+
+        # maximum scores are only known for the default compute_score
+        if compute_score is default_compute_score:
+            max_scores = [compute_max_score(s, video, hearing_impaired=hearing_impaired) for s in subtitles]
+        else:
+            max_scores = [float('inf')] * len(subtitles)
+
+        # heap of (-score, scored, index) where score is the maximum score until the subtitle is scored
+        heap = [(-m, False, i) for i, m in enumerate(max_scores) if m >= min_score]
+        logger.debug('Discarded %d subtitles below min_score (%d)', len(subtitles) - len(heap), min_score)
+        heapq.heapify(heap)
+
+        while heap:
+            # check score
+            if -heap[0][0] < min_score:
+                logger.info('Score %d is below min_score (%d)', -heap[0][0], min_score)
+                break
+
+            # best subtitle is scored
+            if heap[0][1]:
+                score, _, i = heapq.heappop(heap)
+                yield subtitles[i], -score
+                continue
+
+            # score all the subtitles with the best maximum score
+            max_score = heap[0][0]
+            indexes = []
+            while heap and heap[0][0] == max_score and not heap[0][1]:
+                indexes.append(heapq.heappop(heap)[2])
+            # the pool of processes is only started for batches large enough to be scored in it
+            executor = None
+            if self.score_threshold is not None and len(indexes) >= self.score_threshold:
+                executor = self.get_score_executor()
+            scores = score_subtitles([subtitles[i] for i in indexes], video, hearing_impaired=hearing_impaired,
+                                     compute_score=compute_score, threshold=self.score_threshold,
+                                     max_workers=self.score_workers, executor=executor)
+            for i, score in zip(indexes, scores):
+                heapq.heappush(heap, (-score, True, i))
+
+    def get_score_executor(self):
+        """Get the pool of processes used for scoring, creating it on first use with :func:`create_score_executor`.
+
+        :return: the pool of processes.
+        :rtype: :class:`~concurrent.futures.ProcessPoolExecutor`
+
+        """
+        with self.score_executor_lock:
+            if self.score_executor is None:
+                logger.debug('Starting a pool of processes for scoring')
+                self.score_executor = create_score_executor(self.score_workers)
+
+            return self.score_executor
 
     def terminate(self):
-        """Terminate all the :attr:`initialized_providers`."""
+        """Terminate all the :attr:`initialized_providers`, once the background refreshes of the cache are done.
+
+        The providers are terminated concurrently, waiting for them at most :attr:`terminate_timeout` seconds in
+        total. Providers still terminating after that are left behind, their transports are closed once they are done.
+        The pool of processes used for scoring is shut down.
+
+        """
+        with self.score_executor_lock:
+            if self.score_executor is not None:
+                logger.debug('Shutting down the pool of processes for scoring')
+                self.score_executor.shutdown()
+                self.score_executor = None
+
+        region.wait_for_refreshes()
+
         logger.debug('Terminating initialized providers')
-        for name in list(self.initialized_providers):
-            del self[name]
+        with self.initialized_providers_lock:
+            providers = list(self.initialized_providers.items())
+            self.initialized_providers.clear()
+
+        threads = []
+        for name, provider in providers:
+            # daemon threads do not hold the interpreter on exit
+            thread = threading.Thread(target=self.terminate_provider, args=(name, provider),
+                                      name='terminate-{}'.format(name))
+            thread.daemon = True
+            thread.start()
+            threads.append((name, provider, thread))
+
+        deadline = time.time() + self.terminate_timeout
+        pending_threads = []
+        pending_transports = []
+        for name, provider, thread in threads:
+            thread.join(max(deadline - time.time(), 0))
+            if thread.is_alive():
+                logger.warning('Provider %s not terminated after %s seconds', name, self.terminate_timeout)
+                pending_threads.append(thread)
+                if provider.transport is not None:
+                    pending_transports.append(provider.transport)
+
+        # close the transports of the pool, except the ones still used by the providers left behind
+        with self.transports_lock:
+            transports = list(self.transports.values())
+            self.transports.clear()
+        left_transports = []
+        for transport in transports:
+            if any(transport is t for t in pending_transports):
+                left_transports.append(transport)
+            else:
+                transport.close()
+
+        if left_transports:
+            thread = threading.Thread(target=self.close_transports, args=(left_transports, pending_threads),
+                                      name='close-transports')
+            thread.daemon = True
+            thread.start()
+
+    @staticmethod
+    def close_transports(transports, threads):
+        """Close the `transports` once the `threads` using them are done.
+
+        :param transports: the transports to close.
+        :type transports: list of :class:`~subliminal.transport.Transport`
+        :param threads: the threads using the transports.
+        :type threads: list of :class:`threading.Thread`
+
+        """
+        for thread in threads:
+            thread.join()
+
+        logger.debug('Closing %d transports left behind', len(transports))
+        for transport in transports:
+            transport.close()
 
 
 class AsyncProviderPool(ProviderPool):
@@ -272,6 +841,128 @@ class AsyncProviderPool(ProviderPool):
 
         return subtitles
 
+    def list_subtitles_provider_batch(self, provider, videos, languages):
+        return provider, super(AsyncProviderPool, self).list_subtitles_provider_batch(provider, videos, languages)
+
+    def list_subtitles_batch(self, videos, languages):
+        subtitles = {video: [] for video in videos}
+
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            for provider, provider_subtitles in executor.map(self.list_subtitles_provider_batch, self.providers,
+                                                             itertools.repeat(videos, len(self.providers)),
+                                                             itertools.repeat(languages, len(self.providers))):
+                # discard provider that failed
+                if provider_subtitles is None:
+                    logger.info('Discarding provider %s', provider)
+                    self.discarded_providers.add(provider)
+                    continue
+
+                # add subtitles
+                for video in videos:
+                    subtitles[video].extend(provider_subtitles[video])
+
+        return subtitles
+
+    def warm_cache(self, videos):
+        providers = [p for p in self.providers if p not in self.discarded_providers]
+
+        # providers are warmed concurrently, each one at its own pace
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            for provider, success in zip(providers, executor.map(self.warm_cache_provider, providers,
+                                                                 itertools.repeat(videos, len(providers)))):
+                if not success:
+                    logger.info('Discarding provider %s', provider)
+                    self.discarded_providers.add(provider)
+
+
+def _next_or_none(generator, value):
+    """Send `value` to the `generator` and return the next item it yields, or `None` once it is exhausted.
+
+    :param generator: the generator.
+    :param value: the value to send.
+
+    """
+    try:
+        return generator.send(value)
+    except StopIteration:
+        return None
+
+
+def _compute_scores(compute_score, subtitles, video, hearing_impaired):
+    """Compute the scores of `subtitles`, this is the unit of work of :func:`score_subtitles` worker processes."""
+    return [compute_score(s, video, hearing_impaired=hearing_impaired) for s in subtitles]
+
+
+def create_score_executor(max_workers=None):
+    """Create a pool of processes for :func:`score_subtitles`.
+
+    The workers are started with the forkserver method, or spawn where it is not available, rather than forked from
+    a process that may be running provider and cache threads.
+
+    :param int max_workers: maximum number of processes to use. If `None`, the number of processors on the machine
+        is used.
+    :return: the pool of processes.
+    :rtype: :class:`~concurrent.futures.ProcessPoolExecutor`
+
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+    return ProcessPoolExecutor(max_workers or os.cpu_count() or 1, mp_context=multiprocessing.get_context(method))
+
+
+def _submit_scores(executor, compute_score, chunks, video, hearing_impaired):
+    """Score the `chunks` of subtitles in the `executor` and return the scores, in order."""
+    futures = [executor.submit(_compute_scores, compute_score, c, video, hearing_impaired) for c in chunks]
+
+    return [score for future in futures for score in future.result()]
+
+
+def score_subtitles(subtitles, video, hearing_impaired=False, compute_score=None, threshold=SCORE_PROCESSES_THRESHOLD,
+                    max_workers=None, executor=None):
+    """Compute the score of each of the `subtitles` against the `video`.
+
+    Scoring is mostly spent in guessit so, when there are at least `threshold` subtitles, the `subtitles` are split in
+    chunks that are scored in a pool of processes. Scoring falls back on the current process if the `subtitles`,
+    the `video` or `compute_score` cannot be sent to the workers.
+
+    The pool of processes is the `executor` if given, it is left running for the next calls. Otherwise a pool is
+    created with :func:`create_score_executor` and shut down before returning.
+
+    :param subtitles: the subtitles to score.
+    :type subtitles: list of :class:`~subliminal.subtitle.Subtitle`
+    :param video: video to score the subtitles against.
+    :type video: :class:`~subliminal.video.Video`
+    :param bool hearing_impaired: hearing impaired preference.
+    :param compute_score: function that takes `subtitle` and `video` as positional arguments,
+        `hearing_impaired` as keyword argument and returns the score. It must be picklable to be used in the workers.
+    :param int threshold: minimum number of subtitles to score them in a pool of processes, `None` to disable.
+    :param int max_workers: maximum number of processes to use. If `None`, the number of processors on the machine
+        is used.
+    :param executor: pool of processes to use.
+    :type executor: :class:`~concurrent.futures.ProcessPoolExecutor`
+    :return: the scores, in the same order as `subtitles`.
+    :rtype: list of int
+
+    """
+    compute_score = compute_score or default_compute_score
+
+    if threshold is None or len(subtitles) < threshold:
+        return _compute_scores(compute_score, subtitles, video, hearing_impaired)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    chunk_size = -(-len(subtitles) // (max_workers * 4))
+    chunks = [subtitles[i:i + chunk_size] for i in range(0, len(subtitles), chunk_size)]
+    logger.info('Scoring %d subtitles in %d chunks with %d processes', len(subtitles), len(chunks), max_workers)
+    try:
+        if executor is not None:
+            return _submit_scores(executor, compute_score, chunks, video, hearing_impaired)
+        with create_score_executor(max_workers) as executor:
+            return _submit_scores(executor, compute_score, chunks, video, hearing_impaired)
+    except (AttributeError, BrokenProcessPool, OSError, PicklingError, TypeError):
+        logger.exception('Failed to score subtitles in a pool of processes, falling back on the current process')
+
+    return _compute_scores(compute_score, subtitles, video, hearing_impaired)
+
 
 def check_video(video, languages=None, age=None, undefined=False):
     """Perform some checks on the `video`.
@@ -551,6 +1242,121 @@ def refine(video, episode_refiners=None, movie_refiners=None, refiner_configs=No
             handle_exception(e, 'Failed to refine video {0!r}'.format(video.name))
 
 
+def get_listing_key(provider, video, languages):
+    """Get the cache key of the subtitles listed by a `provider` for a `video` and `languages`.
+
+    The video is identified by its hash for the provider and its size, if any, otherwise by its sanitized series,
+    season and episodes or by its sanitized title, with its year.
+
+    :param str provider: name of the provider.
+    :param video: the video.
+    :type video: :class:`~subliminal.video.Video`
+    :param languages: languages to search for.
+    :type languages: set of :class:`~babelfish.language.Language`
+    :return: the cache key.
+    :rtype: str
+
+    """
+    if provider in video.hashes:
+        video_key = 'hash:{}:{}'.format(video.hashes[provider], video.size)
+    elif isinstance(video, Episode):
+        video_key = 'episode:{}:{}:{}:{}'.format(sanitize(video.series), video.year, video.season,
+                                                 ','.join(str(e) for e in video.episodes))
+    elif isinstance(video, Movie):
+        video_key = 'movie:{}:{}'.format(sanitize(video.title), video.year)
+    else:
+        video_key = 'name:{}'.format(os.path.basename(video.name))
+
+    return u'{}:list_subtitles|{}|{}|{}'.format(__name__, provider, video_key,
+                                                 ','.join(sorted(str(l) for l in languages)))
+
+
+def group_videos_by_languages(videos, languages):
+    """Group the `videos` by the `languages` they miss, the ones to search for.
+
+    :param videos: videos to group.
+    :type videos: list of :class:`~subliminal.video.Video`
+    :param languages: wanted languages.
+    :type languages: set of :class:`~babelfish.language.Language`
+    :return: the missing languages and their videos, in the order of `videos`.
+    :rtype: list of tuple(set of :class:`~babelfish.language.Language`, list of :class:`~subliminal.video.Video`)
+
+    """
+    groups = OrderedDict()
+    for video in videos:
+        groups.setdefault(frozenset(languages - video.subtitle_languages), []).append(video)
+
+    return [(set(l), v) for l, v in groups.items()]
+
+
+def warm_cache(videos, refiner_max_workers=4, pool_class=AsyncProviderPool, episode_refiners=None,
+               movie_refiners=None, refiner_configs=None, **kwargs):
+    """Prefetch the cached lookups of refiners and providers for the `videos`.
+
+    Videos are refined once per season and per movie, in parallel, then the cached lookups of the providers are
+    prefetched for all the `videos` with :meth:`ProviderPool.warm_cache`. Refiners send their requests with the
+    transport of the pool, if it has one.
+
+    :param videos: videos to prefetch the cached lookups for.
+    :type videos: list of :class:`~subliminal.video.Video`
+    :param int refiner_max_workers: maximum number of threads to refine videos.
+    :param pool_class: class to use as provider pool.
+    :type pool_class: :class:`ProviderPool`, :class:`AsyncProviderPool` or similar
+    :param tuple episode_refiners: refiners to use for episodes.
+    :param tuple movie_refiners: refiners to use for movies.
+    :param dict refiner_configs: refiner configuration as keyword arguments per refiner name.
+    :param \*\*kwargs: additional parameters for the provided `pool_class` constructor.
+
+    """
+    # keep one video per season and per movie
+    distinct_videos = {}
+    video_keys = []
+    for video in videos:
+        if isinstance(video, Episode):
+            key = (video.series, video.year, video.country, video.season)
+        elif isinstance(video, Movie):
+            key = (video.title, video.year)
+        else:
+            continue
+        distinct_videos.setdefault(key, video)
+        video_keys.append((video, key))
+    logger.info('Warming cache for %d distinct seasons and movies', len(distinct_videos))
+
+    with pool_class(**kwargs) as pool:
+        # refine with the transport of the pool, if any
+        refine_kwargs = {}
+        transport = pool.get_transport('requests')
+        if transport is not None:
+            refine_kwargs['transport'] = transport
+        with ThreadPoolExecutor(refiner_max_workers) as executor:
+            futures = {executor.submit(refine, video, episode_refiners=episode_refiners, movie_refiners=movie_refiners,
+                                       refiner_configs=refiner_configs, embedded_subtitles=False,
+                                       providers=kwargs.get('providers'), **refine_kwargs): video
+                       for video in distinct_videos.values()}
+            for future, video in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    handle_exception(e, 'Failed to refine video {0!r}'.format(video.name))
+
+        # propagate the refined titles to the other videos
+        for video, key in video_keys:
+            distinct_video = distinct_videos[key]
+            if distinct_video is video:
+                continue
+            video.year = distinct_video.year
+            video.country = distinct_video.country
+            if isinstance(video, Episode):
+                video.series = distinct_video.series
+                video.alternative_series = distinct_video.alternative_series
+            else:
+                video.title = distinct_video.title
+                video.alternative_titles = distinct_video.alternative_titles
+
+        # warm the cache of providers
+        pool.warm_cache(videos)
+
+
 def list_subtitles(videos, languages, pool_class=ProviderPool, **kwargs):
     """List subtitles.
 
@@ -581,13 +1387,14 @@ def list_subtitles(videos, languages, pool_class=ProviderPool, **kwargs):
     if not checked_videos:
         return listed_subtitles
 
-    # list subtitles
+    # list subtitles, in batches of videos searching for the same languages
     with pool_class(**kwargs) as pool:
-        for video in checked_videos:
-            logger.info('Listing subtitles for %r', video)
-            subtitles = pool.list_subtitles(video, languages - video.subtitle_languages)
-            listed_subtitles[video].extend(subtitles)
-            logger.info('Found %d subtitle(s)', len(subtitles))
+        for batch_languages, batch in group_videos_by_languages(checked_videos, languages):
+            logger.info('Listing subtitles for %d video(s)', len(batch))
+            batch_subtitles = pool.list_subtitles_batch(batch, batch_languages)
+            for video in batch:
+                listed_subtitles[video].extend(batch_subtitles[video])
+                logger.info('Found %d subtitle(s) for %r', len(batch_subtitles[video]), video)
 
     return listed_subtitles
 
@@ -603,9 +1410,8 @@ def download_subtitles(subtitles, pool_class=ProviderPool, **kwargs):
 
     """
     with pool_class(**kwargs) as pool:
-        for subtitle in subtitles:
-            logger.info('Downloading subtitle %r', subtitle)
-            pool.download_subtitle(subtitle)
+        logger.info('Downloading %d subtitle(s)', len(subtitles))
+        pool.download_subtitles(subtitles)
 
 
 def download_best_subtitles(videos, languages, min_score=0, hearing_impaired=False, only_one=False, compute_score=None,
@@ -644,16 +1450,17 @@ def download_best_subtitles(videos, languages, min_score=0, hearing_impaired=Fal
     if not checked_videos:
         return downloaded_subtitles
 
-    # download best subtitles
+    # download best subtitles, listed in batches of videos searching for the same languages
     with pool_class(**kwargs) as pool:
-        for video in checked_videos:
-            logger.info('Downloading best subtitles for %r', video)
-            subtitles = pool.download_best_subtitles(pool.list_subtitles(video, languages - video.subtitle_languages),
-                                                     video, languages, min_score=min_score,
-                                                     hearing_impaired=hearing_impaired, only_one=only_one,
-                                                     compute_score=compute_score)
-            logger.info('Downloaded %d subtitle(s)', len(subtitles))
-            downloaded_subtitles[video].extend(subtitles)
+        for batch_languages, batch in group_videos_by_languages(checked_videos, languages):
+            batch_subtitles = pool.list_subtitles_batch(batch, batch_languages)
+            logger.info('Downloading best subtitles for %d video(s)', len(batch))
+            batch_subtitles = pool.download_best_subtitles_batch(batch_subtitles, languages, min_score=min_score,
+                                                                 hearing_impaired=hearing_impaired,
+                                                                 only_one=only_one, compute_score=compute_score)
+            for video in batch:
+                logger.info('Downloaded %d subtitle(s) for %r', len(batch_subtitles[video]), video)
+                downloaded_subtitles[video].extend(batch_subtitles[video])
 
     return downloaded_subtitles
 
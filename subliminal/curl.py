@@ -1,10 +1,19 @@
+import codecs
+import logging
 import os
+import threading
 import libcurl as lcurl
 import ctypes as ct
-from email.parser import BytesParser
+from collections import deque
+from concurrent.futures import Future
+from email.parser import Parser
 from requests import HTTPError
 from types import SimpleNamespace
 
+from .transport import Transport
+
+logger = logging.getLogger(__name__)
+
 
 def curl_init(dll_fullpath):
     # TODO: find a place to call lcurl.global_cleanup()
@@ -19,20 +28,73 @@ def curl_init(dll_fullpath):
     lcurl.global_init(lcurl.CURL_GLOBAL_DEFAULT)
 
 
+_easy_impersonate = None
+
+
+def _get_easy_impersonate():
+    global _easy_impersonate
+    if _easy_impersonate is None:
+        # bound with the function type of the binding for the platform, ct.WINFUNCTYPE only exists on Windows
+        _easy_impersonate = lcurl._platform.CFUNC(lcurl._curl.CURLcode,
+                                                  ct.POINTER(lcurl._curl.CURL),
+                                                  ct.c_char_p,
+                                                  ct.c_int)(
+            ("curl_easy_impersonate", lcurl._dll.dll), (
+                (1, "data"),
+                (1, "target"),
+                (1, "default_headers"),))
+    return _easy_impersonate
+
+
 def curl_easy_impersonate(data, target, default_headers):
     try:
-        easy_impersonate = ct.WINFUNCTYPE(lcurl._curl.CURLcode,
-                            ct.POINTER(lcurl._curl.CURL),
-                            ct.c_char_p,
-                            ct.c_int)(
-                            ("curl_easy_impersonate", lcurl._dll.dll), (
-                            (1, "data"),
-                            (1, "target"),
-                            (1, "default_headers"),))
-        return easy_impersonate(data, target.encode('utf-8'), default_headers)
+        easy_impersonate = _get_easy_impersonate()
     except AttributeError:
         # Provided libcurl lacks impersonation support; try https://github.com/lwthiker/curl-impersonate
         return lcurl.CURLE_NOT_BUILT_IN
+    return easy_impersonate(data, target.encode('utf-8'), default_headers)
+
+
+class CurlBuffer(object):
+    """Growable buffer receiving the data of a transfer from :func:`curl_write_function`.
+
+    The chunks are copied once, straight from libcurl into the buffer, and :meth:`getbuffer` exposes the data without
+    copying it again.
+
+    :param int size: initial capacity of the buffer in bytes.
+
+    """
+    def __init__(self, size=65536):
+        self.data = bytearray(size)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __bytes__(self):
+        return bytes(self.getbuffer())
+
+    def write(self, pointer, length):
+        """Copy `length` bytes at `pointer` at the end of the buffer, growing it if needed.
+
+        :param pointer: address of the data.
+        :param int length: length of the data.
+
+        """
+        end = self.size + length
+        if end > len(self.data):
+            self.data.extend(bytes(max(end, 2 * len(self.data)) - len(self.data)))
+        ct.memmove((ct.c_char * length).from_buffer(self.data, self.size), pointer, length)
+        self.size = end
+
+    def getbuffer(self):
+        """Get a view of the data of the buffer, which must not be written anymore while the view is used.
+
+        :return: the view.
+        :rtype: memoryview
+
+        """
+        return memoryview(self.data)[:self.size]
 
 
 @lcurl.write_callback
@@ -42,10 +104,41 @@ def curl_write_function(buffer, size, nitems, stream):
     data_buffer = lcurl.from_oid(stream)
     buffer_size = size * nitems
     if buffer_size == 0: return 0
-    data_buffer += bytes(buffer[:buffer_size])
+    data_buffer.write(buffer, buffer_size)
     return buffer_size
 
 
+class CurlResponse(object):
+    """Response of a libcurl transfer.
+
+    :param view: the body of the response.
+    :type view: memoryview
+    :param details: the status line and the headers of the response, as returned by
+        :func:`basic_resp_header_parser`, if stored.
+    :param str content_type: content type of the response.
+
+    """
+    def __init__(self, view, details=None, content_type=''):
+        #: Body of the response, a view of the buffer of the transfer
+        self.view = view
+
+        #: Status line and headers of the response
+        self.details = details
+
+        #: Content type of the response
+        self.content_type = content_type
+
+        self._content = None
+
+    @property
+    def content(self):
+        """Body of the response as `bytes`, copied from :attr:`view` on first access."""
+        if self._content is None:
+            self._content = self.view.tobytes()
+
+        return self._content
+
+
 def curl_get_resp_code(curl):
     response_code = ct.c_long()
     res = lcurl.easy_getinfo(curl, lcurl.CURLINFO_RESPONSE_CODE, ct.byref(response_code))
@@ -86,6 +179,224 @@ def curl_raise_for_status(curl, url='', reason=None):
 
 def basic_resp_header_parser(request_text):
     # Brandon Rhodes: https://stackoverflow.com/a/5955949
-    request_line, headers_alone = request_text.split(b'\r\n', 1)
-    headers = BytesParser().parsebytes(headers_alone)
+    if isinstance(request_text, CurlBuffer):
+        # split the buffer in place, only the status line is copied
+        index = request_text.data.find(b'\r\n', 0, request_text.size)
+        view = request_text.getbuffer()
+        request_line, headers_alone = view[:index].tobytes(), view[index + 2:]
+    else:
+        request_line, headers_alone = request_text.split(b'\r\n', 1)
+    headers = Parser().parsestr(codecs.decode(headers_alone, 'ascii', 'surrogateescape'))
     return SimpleNamespace(request_line=request_line, headers=headers, headers_raw=headers_alone)
+
+
+class CurlMulti(object):
+    """Engine running the transfers of easy handles concurrently on the event loop of a libcurl multi handle.
+
+    The event loop runs in a background thread and the transfers are submitted from any thread with :meth:`submit`,
+    their easy handles must not be used until they are done.
+
+    :param transport: the transport of the easy handles.
+    :type transport: :class:`CurlTransport`
+
+    """
+    #: Maximum time to wait for activity on the transfers in the event loop, in milliseconds
+    poll_timeout = 1000
+
+    def __init__(self, transport):
+        self.multi = lcurl.multi_init()
+        if not self.multi:
+            raise RuntimeError('Unable to initialize cURL multi handle')
+        lcurl.multi_setopt(self.multi, lcurl.CURLMOPT_MAXCONNECTS, transport.pool_connections * transport.pool_maxsize)
+        lcurl.multi_setopt(self.multi, lcurl.CURLMOPT_MAX_HOST_CONNECTIONS, transport.pool_maxsize)
+        lcurl.multi_setopt(self.multi, lcurl.CURLMOPT_PIPELINING, lcurl.CURLPIPE_MULTIPLEX)
+
+        #: Transfers waiting to be added to the multi handle, as (handle, future) tuples
+        self.pending = deque()
+
+        #: Futures of the running transfers, per address of their easy handle
+        self.running = {}
+
+        self.closed = False
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name='subliminal-curl-multi')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, handle):
+        """Submit the transfer of an easy handle.
+
+        :param handle: the easy handle, with its options set.
+        :return: the future of the :class:`libcurl.CURLcode` of the transfer.
+        :rtype: :class:`concurrent.futures.Future`
+
+        """
+        future = Future()
+        with self.lock:
+            if self.closed:
+                raise RuntimeError('cURL multi handle is closed')
+            self.pending.append((handle, future))
+        lcurl.multi_wakeup(self.multi)
+
+        return future
+
+    def perform(self, handle):
+        """Perform the transfer of an easy handle, like ``libcurl.easy_perform`` but sharing the event loop.
+
+        :param handle: the easy handle, with its options set.
+        :return: the result of the transfer.
+        :rtype: :class:`libcurl.CURLcode`
+
+        """
+        return self.submit(handle).result()
+
+    def perform_all(self, handles):
+        """Perform the transfers of several easy handles concurrently.
+
+        :param list handles: the easy handles, with their options set.
+        :return: the results of the transfers, in the order of `handles`.
+        :rtype: list of :class:`libcurl.CURLcode`
+
+        """
+        return [f.result() for f in [self.submit(h) for h in handles]]
+
+    def _add_pending(self):
+        with self.lock:
+            while self.pending:
+                handle, future = self.pending.popleft()
+                if not future.set_running_or_notify_cancel():
+                    continue
+                res = lcurl.multi_add_handle(self.multi, handle)
+                if res != lcurl.CURLM_OK:
+                    future.set_exception(RuntimeError('Unable to add cURL handle: [%d]' % res))
+                    continue
+                self.running[ct.cast(handle, ct.c_void_p).value] = (handle, future)
+
+    def _read_done(self):
+        msgs_in_queue = ct.c_int()
+        while True:
+            msg = lcurl.multi_info_read(self.multi, ct.byref(msgs_in_queue))
+            if not msg:
+                break
+            if msg.contents.msg != lcurl.CURLMSG_DONE:
+                continue
+            handle, future = self.running.pop(ct.cast(msg.contents.easy_handle, ct.c_void_p).value)
+            result = msg.contents.data.result
+            lcurl.multi_remove_handle(self.multi, handle)
+            future.set_result(result)
+
+    def _run(self):
+        running_handles = ct.c_int()
+        numfds = ct.c_int()
+        while not self.closed:
+            self._add_pending()
+            res = lcurl.multi_perform(self.multi, ct.byref(running_handles))
+            if res != lcurl.CURLM_OK:
+                logger.error('cURL multi handle failed: [%d]', res)
+            self._read_done()
+            # sleeps until there is activity on the transfers or multi_wakeup is called
+            lcurl.multi_poll(self.multi, None, 0, self.poll_timeout, ct.byref(numfds))
+
+    def close(self):
+        """Stop the event loop, abort the transfers left and clean up the multi handle."""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+        lcurl.multi_wakeup(self.multi)
+        self.thread.join()
+
+        for handle, future in self.running.values():
+            lcurl.multi_remove_handle(self.multi, handle)
+            future.set_exception(RuntimeError('cURL multi handle is closed'))
+        for handle, future in self.pending:
+            future.set_exception(RuntimeError('cURL multi handle is closed'))
+        self.running.clear()
+        self.pending.clear()
+        lcurl.multi_cleanup(self.multi)
+
+
+class CurlTransport(Transport):
+    """Transport creating libcurl easy handles that share the connection cache, the DNS cache and the TLS sessions of
+    a single share handle.
+
+    The transfers of the handles can run concurrently on the event loop of the :meth:`multi` engine.
+    libcurl must be initialized with :func:`curl_init` before creating handles.
+
+    """
+    backend = 'curl'
+
+    #: Data shared between the handles
+    shared_data = (lcurl.CURL_LOCK_DATA_CONNECT, lcurl.CURL_LOCK_DATA_DNS, lcurl.CURL_LOCK_DATA_SSL_SESSION)
+
+    def __init__(self, *args, **kwargs):
+        super(CurlTransport, self).__init__(*args, **kwargs)
+        self.share = None
+        self._multi = None
+        self.share_lock = threading.Lock()
+
+        # handles can be used from several threads, libcurl locks the shared data with these callbacks
+        self.data_locks = {data: threading.Lock() for data in range(lcurl.CURL_LOCK_DATA_LAST)}
+        self._lock_function = lcurl.lock_function(self._lock)
+        self._unlock_function = lcurl.unlock_function(self._unlock)
+
+    def _lock(self, handle, data, access, userptr):
+        self.data_locks[data].acquire()
+
+    def _unlock(self, handle, data, userptr):
+        self.data_locks[data].release()
+
+    def _get_share(self):
+        with self.share_lock:
+            if self.share is None:
+                share = lcurl.share_init()
+                if not share:
+                    raise RuntimeError('Unable to initialize cURL share handle')
+                lcurl.share_setopt(share, lcurl.CURLSHOPT_LOCKFUNC, ct.cast(self._lock_function, ct.c_void_p))
+                lcurl.share_setopt(share, lcurl.CURLSHOPT_UNLOCKFUNC, ct.cast(self._unlock_function, ct.c_void_p))
+                for data in self.shared_data:
+                    lcurl.share_setopt(share, lcurl.CURLSHOPT_SHARE, data)
+                self.share = share
+
+            return self.share
+
+    def easy_handle(self):
+        """Create an easy handle using the shared connections and the settings of the transport.
+
+        :return: the easy handle, to clean up with ``libcurl.easy_cleanup``.
+
+        """
+        handle = lcurl.easy_init()
+        if not handle:
+            raise RuntimeError('Unable to initialize cURL')
+        lcurl.easy_setopt(handle, lcurl.CURLOPT_SHARE, self._get_share())
+        # like requests, time out when connecting or when no data is received for the timeout
+        lcurl.easy_setopt(handle, lcurl.CURLOPT_CONNECTTIMEOUT_MS, int(self.timeout * 1000))
+        lcurl.easy_setopt(handle, lcurl.CURLOPT_LOW_SPEED_LIMIT, 1)
+        lcurl.easy_setopt(handle, lcurl.CURLOPT_LOW_SPEED_TIME, int(self.timeout))
+        lcurl.easy_setopt(handle, lcurl.CURLOPT_MAXCONNECTS, self.pool_connections * self.pool_maxsize)
+        lcurl.easy_setopt(handle, lcurl.CURLOPT_TCP_KEEPALIVE, 1)
+
+        return handle
+
+    def multi(self):
+        """Get the :class:`CurlMulti` engine of the transport, running the transfers of its easy handles concurrently.
+
+        :return: the engine.
+        :rtype: :class:`CurlMulti`
+
+        """
+        with self.share_lock:
+            if self._multi is None:
+                self._multi = CurlMulti(self)
+
+            return self._multi
+
+    def close(self):
+        with self.share_lock:
+            if self._multi is not None:
+                self._multi.close()
+                self._multi = None
+            if self.share is not None:
+                lcurl.share_cleanup(self.share)
+                self.share = None
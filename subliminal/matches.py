@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 from rebulk.loose import ensure_list
 
-from .score import get_equivalent_release_groups, score_keys
+from .score import release_group_index, score_keys
 from .video import Episode, Movie
 from .utils import sanitize, sanitize_release_group
 
@@ -120,9 +120,12 @@ def release_group_matches(video, release_group=None, **kwargs):
     :rtype: bool
 
     """
-    return (video.release_group and release_group and
-            any(r in sanitize_release_group(release_group)
-                for r in get_equivalent_release_groups(sanitize_release_group(video.release_group))))
+    if not video.release_group or not release_group:
+        return False
+
+    # the release group may contain other information, e.g. 'HDTV.x264-LOL', or be glued to it, e.g. '720PDIMENSION'
+    return (release_group_index.canonical(sanitize_release_group(video.release_group)) in
+            release_group_index.canonical_ids(sanitize_release_group(release_group)))
 
 
 def streaming_service_matches(video, streaming_service=None, **kwargs):
@@ -227,3 +230,41 @@ def guess_matches(video, guess, partial=False):
             matches.add(key)
 
     return matches
+
+
+def upper_bound_matches(video, type=None, season=None, episode=None, series=None):
+    """Get the matches :func:`guess_matches` can possibly find for a subtitle with the given structured fields.
+
+    A subtitle for another type of video, another season or another episode cannot match on these, nor can a subtitle
+    for a series whose name neither contains nor is contained in a name of the series of the video. The structured
+    fields are authoritative: providers drop the matches their release names guess beyond this bound.
+
+    :param video: the video.
+    :type video: :class:`~subliminal.video.Video`
+    :param str type: type of video of the subtitle (`episode` or `movie`), if known.
+    :param int season: season of the subtitle, if known.
+    :param episode: episode of the subtitle, if known.
+    :type episode: list of int or int
+    :param str series: series name of the subtitle, if known.
+    :return: possible matches.
+    :rtype: set
+
+    """
+    matches = set(matches_manager)
+    if isinstance(video, Episode):
+        if type == 'movie':
+            matches -= {'series', 'season', 'episode'}
+        if season is not None and season != video.season:
+            matches.discard('season')
+        if episode is not None and ensure_list(episode) != video.episodes:
+            matches -= {'episode', 'title'}
+        if series is not None:
+            # names like 'The Office (US)' still match 'The Office' with the country guessed from the release name
+            series = sanitize(series)
+            names = [sanitize(name) for name in [video.series] + video.alternative_series if name]
+            if not any(series in name or name in series for name in names):
+                matches.discard('series')
+    elif isinstance(video, Movie) and type == 'episode':
+        matches.discard('title')
+
+    return matches
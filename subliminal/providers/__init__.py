@@ -1,30 +1,24 @@
 # -*- coding: utf-8 -*-
+from concurrent.futures import ThreadPoolExecutor
 import logging
-import ssl
 
 from bs4 import BeautifulSoup, FeatureNotFound
+from six.moves.urllib.parse import urlsplit
 from six.moves.xmlrpc_client import SafeTransport
-from requests import adapters
-from urllib3 import poolmanager
+from requests import RequestException, Session
 
 from .. import __short_version__
+from ..transport import TLSAdapter, get_default_transport
 from ..video import Episode, Movie
 
 logger = logging.getLogger(__name__)
 
 
-class SecLevelOneTLSAdapter(adapters.HTTPAdapter):
-
-    def init_poolmanager(self, connections, maxsize, block=False):
-        """Create and initialize the urllib3 PoolManager."""
-        ctx = ssl.create_default_context()
-        ctx.set_ciphers('DEFAULT@SECLEVEL=1')
-        self.poolmanager = poolmanager.PoolManager(
-                num_pools=connections,
-                maxsize=maxsize,
-                block=block,
-                ssl_version=ssl.PROTOCOL_TLS,
-                ssl_context=ctx)
+class SecLevelOneTLSAdapter(TLSAdapter):
+    """:class:`~subliminal.transport.TLSAdapter` lowering the OpenSSL security level to 1, for servers with weak
+    ciphers."""
+    def __init__(self, **kwargs):
+        super(SecLevelOneTLSAdapter, self).__init__(security_level=1, **kwargs)
 
 
 class TimeoutSafeTransport(SafeTransport):
@@ -92,6 +86,20 @@ class Provider(object):
     #: User Agent to use
     user_agent = 'Subliminal/%s' % __short_version__
 
+    #: Backend of the :class:`~subliminal.transport.Transport` to use
+    transport_backend = 'requests'
+
+    #: :class:`~subliminal.transport.Transport` to use, set by the :class:`~subliminal.core.ProviderPool`. If `None`,
+    #: the default transport of the :attr:`transport_backend` is used
+    transport = None
+
+    #: :class:`~subliminal.cache.SessionStore` to resume the sessions of the provider from, set by the
+    #: :class:`~subliminal.core.ProviderPool`. If `None`, the provider logs in and out on each run
+    session_store = None
+
+    #: Maximum number of pages of a search fetched concurrently
+    page_workers = 4
+
     def __enter__(self):
         self.initialize()
         return self
@@ -99,6 +107,42 @@ class Provider(object):
     def __exit__(self, exc_type, exc_value, traceback):
         self.terminate()
 
+    def get_transport(self):
+        """Get the :class:`~subliminal.transport.Transport` to create the sessions of the provider with.
+
+        :return: the transport.
+        :rtype: :class:`~subliminal.transport.Transport`
+
+        """
+        return self.transport or get_default_transport(self.transport_backend)
+
+    def fetch_pages(self, fetch_page, pages):
+        """Fetch the `pages` of a search concurrently, with at most :attr:`page_workers` requests at once.
+
+        The results are yielded in page order. When the iteration stops early, closing the generator cancels the pages
+        not being fetched yet and the errors of the others are ignored.
+
+        :param fetch_page: function that takes a page as positional argument and returns its result.
+        :param list pages: the pages to fetch.
+        :return: the result of each page.
+        :rtype: generator
+
+        """
+        if len(pages) <= 1 or self.page_workers <= 1:
+            for page in pages:
+                yield fetch_page(page)
+            return
+
+        executor = ThreadPoolExecutor(min(self.page_workers, len(pages)))
+        futures = [executor.submit(fetch_page, page) for page in pages]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
     def initialize(self):
         """Initialize the provider.
 
@@ -122,6 +166,25 @@ class Provider(object):
         """
         raise NotImplementedError
 
+    def warm_up(self):
+        """Warm up the connections of the provider, once initialized.
+
+        The default sends a HEAD request to the host of the `server_url` of the provider with its `session`, if it has
+        both, so the DNS lookup and the TLS handshake are done before its first search. Failures are only logged.
+
+        """
+        session = getattr(self, 'session', None)
+        server_url = getattr(self, 'server_url', None)
+        if not isinstance(session, Session) or not server_url:
+            return
+
+        url = '{0.scheme}://{0.netloc}/'.format(urlsplit(server_url))
+        logger.debug('Warming up the connection to %s', url)
+        try:
+            session.head(url, allow_redirects=False).close()
+        except RequestException as e:
+            logger.debug('Unable to warm up the connection to %s: %r', url, e)
+
     @classmethod
     def check(cls, video):
         """Check if the `video` can be processed.
@@ -182,6 +245,18 @@ class Provider(object):
         """
         raise NotImplementedError
 
+    def warm_cache(self, video):
+        """Prefetch the cached lookups needed to list subtitles for the `video`.
+
+        Providers that cache some lookups, like show ids, should override this method. The default does nothing.
+
+        :param video: video to prefetch the cached lookups for.
+        :type video: :class:`~subliminal.video.Video`
+        :raise: :class:`~subliminal.exceptions.ProviderError`
+
+        """
+        pass
+
     def list_subtitles(self, video, languages):
         """List subtitles for the `video` with the given `languages`.
 
@@ -199,6 +274,23 @@ class Provider(object):
         """
         raise NotImplementedError
 
+    def list_subtitles_batch(self, videos, languages):
+        """List subtitles for several `videos` with the given `languages`.
+
+        Providers able to search for several videos in a single request should override this method. The default calls
+        :meth:`list_subtitles` for each video.
+
+        :param videos: videos to list subtitles for.
+        :type videos: list of :class:`~subliminal.video.Video`
+        :param languages: languages to search for.
+        :type languages: set of :class:`~babelfish.language.Language`
+        :return: found subtitles per video.
+        :rtype: dict of :class:`~subliminal.video.Video` to list of :class:`~subliminal.subtitle.Subtitle`
+        :raise: :class:`~subliminal.exceptions.ProviderError`
+
+        """
+        return {video: self.list_subtitles(video, languages) for video in videos}
+
     def download_subtitle(self, subtitle):
         """Download `subtitle`'s :attr:`~subliminal.subtitle.Subtitle.content`.
 
@@ -209,5 +301,19 @@ class Provider(object):
         """
         raise NotImplementedError
 
+    def download_subtitles(self, subtitles):
+        """Download the :attr:`~subliminal.subtitle.Subtitle.content` of several `subtitles`.
+
+        Providers able to download several subtitles in a single request should override this method. The default calls
+        :meth:`download_subtitle` for each subtitle.
+
+        :param subtitles: subtitles to download.
+        :type subtitles: list of :class:`~subliminal.subtitle.Subtitle`
+        :raise: :class:`~subliminal.exceptions.ProviderError`
+
+        """
+        for subtitle in subtitles:
+            self.download_subtitle(subtitle)
+
     def __repr__(self):
         return '<%s [%r]>' % (self.__class__.__name__, self.video_types)
@@ -3,6 +3,7 @@ import libcurl as lcurl
 import logging
 import os
 import re
+import threading
 import time
 
 from babelfish import Language, language_converters
@@ -15,11 +16,12 @@ from urllib.parse import urlencode
 
 from . import ParserBeautifulSoup, Provider
 from ..cache import SHOW_EXPIRATION_TIME, region
-from ..curl import curl_write_function, curl_easy_impersonate, curl_raise_for_status, basic_resp_header_parser, curl_get_content_type
+from ..curl import (CurlBuffer, CurlResponse, curl_write_function, curl_easy_impersonate, curl_raise_for_status,
+                    basic_resp_header_parser, curl_get_content_type)
 from ..exceptions import AuthenticationError, DownloadLimitExceeded, ProviderError, ServiceUnavailable
-from ..matches import guess_matches
+from ..matches import guess_matches, upper_bound_matches
 from ..subtitle import Subtitle, fix_line_ending
-from ..utils import sanitize
+from ..utils import TitleIndex, sanitize
 from ..video import Episode
 
 logger = logging.getLogger(__name__)
@@ -32,6 +34,9 @@ show_cells_re = re.compile(b'<td class="vr">.*?</td>', re.DOTALL)
 #: Series header parsing regex
 series_year_re = re.compile(r'^(?P<series>[ \w\'.:(),*&!?-]+?)(?: \((?P<year>\d{4})\))?$')
 
+#: Year or country suffix of the sanitized series in the show ids
+series_suffix_re = re.compile(r'^.+ (?:(?P<year>\d{4})|(?P<country>[a-z]{2}))$')
+
 
 class Addic7edSubtitle(Subtitle):
     """Addic7ed Subtitle."""
@@ -78,8 +83,15 @@ class Addic7edSubtitle(Subtitle):
         if self.version:
             matches |= guess_matches(video, guessit(self.version, {'type': 'episode'}), partial=True)
 
+        # the structured fields are authoritative over the release names
+        matches &= self.upper_bound_matches(video)
+
         return matches
 
+    def upper_bound_matches(self, video):
+        return upper_bound_matches(video, type='episode', season=self.season, episode=self.episode,
+                                   series=self.series)
+
 
 class Addic7edProvider(Provider):
     """Addic7ed Provider."""
@@ -89,6 +101,7 @@ class Addic7edProvider(Provider):
         'slk', 'slv', 'spa', 'sqi', 'srp', 'swe', 'tha', 'tur', 'ukr', 'vie', 'zho'
     ]}
     video_types = (Episode,)
+    transport_backend = 'curl'
     domain = "www.addic7ed.com"
     server_url = f'https://{domain}/'
     subtitle_class = Addic7edSubtitle
@@ -97,12 +110,14 @@ class Addic7edProvider(Provider):
         self.phpsessid = phpsessid
         self.fxcookies = fxcookies
         self.cookie_string = ""
-        self.session = None
         self.curl_reqheader_chunk = None
-        self.curl_error_buffer = (c_char * lcurl.CURL_ERROR_SIZE)()
-        self.curl_data_buffer = bytearray(b"")
-        self.curl_header_buffer = bytearray(b"")
+        self.curl_handles = []
+        self.curl_idle_handles = []
+        self.curl_handles_lock = threading.Lock()
         self.last_request = 0
+        self.request_lock = threading.Lock()
+        self.show_ids = None
+        self.show_index = None
 
     def initialize(self):
         # login
@@ -130,71 +145,100 @@ class Addic7edProvider(Provider):
         self._curl_initialize()
 
     def _curl_initialize(self):
-        self.session: POINTER(lcurl.CURL) = lcurl.easy_init()
-        if not self.session:
-            raise ProviderError("Unable to initialize cURL")
-        if "SSL_CERT_FILE" in os.environ:
-            lcurl.easy_setopt(self.session, lcurl.CURLOPT_CAINFO, os.environ["SSL_CERT_FILE"].encode("utf-8"))
-        lcurl.easy_setopt(self.session, lcurl.CURLOPT_ERRORBUFFER, self.curl_error_buffer)
-        lcurl.easy_setopt(self.session, lcurl.CURLOPT_WRITEFUNCTION, curl_write_function)
-        lcurl.easy_setopt(self.session, lcurl.CURLOPT_WRITEDATA, id(self.curl_data_buffer))
-        lcurl.easy_setopt(self.session, lcurl.CURLOPT_FOLLOWLOCATION, 1)  # Mirror Requests - mostly
-        #lcurl.easy_setopt(self.session, lcurl.CURLOPT_CONNECTTIMEOUT, 30)
-        lcurl.easy_setopt(self.session, lcurl.CURLOPT_TIMEOUT, 30)
         if self.cookie_string and len(self.cookie_string) > 0:
             self.cookie_string = self.cookie_string.strip("; ") # Fx does not send a cookie string with a terminating semicolon
-            lcurl.easy_setopt(self.session, lcurl.CURLOPT_COOKIE, self.cookie_string.encode("utf-8"))
-        lcurl.easy_setopt(self.session, lcurl.CURLOPT_REFERER, self.server_url.encode("utf-8"))
         self.curl_reqheader_chunk = POINTER(lcurl.slist)()
         self.curl_reqheader_chunk = lcurl.slist_append(self.curl_reqheader_chunk, "Connection: keep-alive".encode("utf-8"))
         self.curl_reqheader_chunk = lcurl.slist_append(self.curl_reqheader_chunk, "User-Agent: {0}".format(self.user_agent).encode("utf-8"))
-        lcurl.easy_setopt(self.session, lcurl.CURLOPT_HTTPHEADER, self.curl_reqheader_chunk)
-        curl_easy_impersonate(self.session, "ff98", 1)
+        self.curl_idle_handles.append(self._curl_create_handle())
+
+    def _curl_create_handle(self):
+        # every request has its own handle and buffers, the transfers run concurrently on the event loop of the
+        # transport
+        try:
+            curl: POINTER(lcurl.CURL) = self.get_transport().easy_handle()
+        except RuntimeError as e:
+            raise ProviderError(str(e))
+        handle = SimpleNamespace(curl=curl, error_buffer=(c_char * lcurl.CURL_ERROR_SIZE)(),
+                                 data_buffer=None, header_buffer=None)
+        with self.curl_handles_lock:
+            self.curl_handles.append(handle)
 
-    def _curl_make_request(self, url, params=None, store_resp_headers=False):
-        if time.time() < self.last_request + 5:
-            time.sleep(5)
-        self.last_request = time.time()
+        if "SSL_CERT_FILE" in os.environ:
+            lcurl.easy_setopt(curl, lcurl.CURLOPT_CAINFO, os.environ["SSL_CERT_FILE"].encode("utf-8"))
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_ERRORBUFFER, handle.error_buffer)
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_WRITEFUNCTION, curl_write_function)
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_FOLLOWLOCATION, 1)  # Mirror Requests - mostly
+        if self.cookie_string:
+            lcurl.easy_setopt(curl, lcurl.CURLOPT_COOKIE, self.cookie_string.encode("utf-8"))
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_REFERER, self.server_url.encode("utf-8"))
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_HTTPHEADER, self.curl_reqheader_chunk)
+        curl_easy_impersonate(curl, "ff98", 1)
+
+        return handle
 
+    def _curl_make_request(self, url, params=None, store_resp_headers=False):
+        # space the start of the requests, including the ones of the background refreshes of the cache
+        with self.request_lock:
+            if time.time() < self.last_request + 5:
+                time.sleep(5)
+            self.last_request = time.time()
+
+        with self.curl_handles_lock:
+            handle = self.curl_idle_handles.pop() if self.curl_idle_handles else None
+        if handle is None:
+            handle = self._curl_create_handle()
+        try:
+            return self._curl_perform_request(handle, url, params, store_resp_headers)
+        finally:
+            with self.curl_handles_lock:
+                self.curl_idle_handles.append(handle)
+
+    def _curl_perform_request(self, handle, url, params=None, store_resp_headers=False):
         if params is not None:
             if not url.endswith("?"):
                 url += "?"
             url += urlencode(params, doseq=True)
 
-        lcurl.easy_setopt(self.session, lcurl.CURLOPT_URL, url.encode("utf-8"))
+        lcurl.easy_setopt(handle.curl, lcurl.CURLOPT_URL, url.encode("utf-8"))
+        # the response keeps the views of its buffers, the next request of the handle gets new ones
+        handle.data_buffer = CurlBuffer()
+        lcurl.easy_setopt(handle.curl, lcurl.CURLOPT_WRITEDATA, id(handle.data_buffer))
         if not store_resp_headers:
-            lcurl.easy_setopt(self.session, lcurl.CURLOPT_HEADERFUNCTION, None)
-            lcurl.easy_setopt(self.session, lcurl.CURLOPT_HEADERDATA, None)
+            handle.header_buffer = None
+            lcurl.easy_setopt(handle.curl, lcurl.CURLOPT_HEADERFUNCTION, None)
+            lcurl.easy_setopt(handle.curl, lcurl.CURLOPT_HEADERDATA, None)
         else:
-            lcurl.easy_setopt(self.session, lcurl.CURLOPT_HEADERFUNCTION, curl_write_function)
-            lcurl.easy_setopt(self.session, lcurl.CURLOPT_HEADERDATA, id(self.curl_header_buffer))
-            self.curl_header_buffer.clear()
+            handle.header_buffer = CurlBuffer(4096)
+            lcurl.easy_setopt(handle.curl, lcurl.CURLOPT_HEADERFUNCTION, curl_write_function)
+            lcurl.easy_setopt(handle.curl, lcurl.CURLOPT_HEADERDATA, id(handle.header_buffer))
 
-        self.curl_data_buffer.clear()
-        res: lcurl.CURLcode = lcurl.easy_perform(self.session)
+        res: lcurl.CURLcode = self.get_transport().multi().perform(handle.curl)
         if res != lcurl.CURLE_OK:
-            logger.error("Failed to get '%s': [%d] %s", url, res, self.curl_error_buffer.raw.decode("utf-8"))
+            logger.error("Failed to get '%s': [%d] %s", url, res, handle.error_buffer.value.decode("utf-8"))
             if res == lcurl.CURLE_OPERATION_TIMEDOUT:
                 raise Timeout()
 
         if not store_resp_headers:
             details = None
-            curl_raise_for_status(self.session, url)
+            curl_raise_for_status(handle.curl, url)
         else:
-            details = basic_resp_header_parser(bytes(self.curl_header_buffer))
-            curl_raise_for_status(self.session, url, details.request_line)
+            details = basic_resp_header_parser(handle.header_buffer)
+            curl_raise_for_status(handle.curl, url, details.request_line)
 
-        return SimpleNamespace(content=bytes(self.curl_data_buffer), details=details)
+        return CurlResponse(handle.data_buffer.getbuffer(), details, curl_get_content_type(handle.curl))
 
     def terminate(self):
+        with self.curl_handles_lock:
+            for handle in self.curl_handles:
+                lcurl.easy_cleanup(handle.curl)
+            self.curl_handles = []
+            self.curl_idle_handles = []
+
         if self.curl_reqheader_chunk is not None:
             lcurl.slist_free_all(self.curl_reqheader_chunk)
             self.curl_reqheader_chunk = None
 
-        if self.session is not None:
-            lcurl.easy_cleanup(self.session)
-            self.session = None
-
     @region.cache_on_arguments(expiration_time=SHOW_EXPIRATION_TIME)
     def _get_show_ids(self):
         """Get the ``dict`` of show ids per series by querying the `shows.php` page.
@@ -210,7 +254,7 @@ class Addic7edProvider(Provider):
         # LXML parser seems to fail when parsing Addic7ed.com HTML markup.
         # Last known version to work properly is 3.6.4 (next version, 3.7.0, fails)
         # Assuming the site's markup is bad, and stripping it down to only contain what's needed.
-        show_cells = re.findall(show_cells_re, r.content)
+        show_cells = re.findall(show_cells_re, r.view)
         if show_cells:
             soup = ParserBeautifulSoup(b''.join(show_cells), ['lxml', 'html.parser'])
         else:
@@ -261,10 +305,29 @@ class Addic7edProvider(Provider):
 
         return show_id
 
+    def get_show_index(self):
+        """Get the :class:`~subliminal.utils.TitleIndex` of the show ids returned by :meth:`_get_show_ids`.
+
+        The index is rebuilt whenever :meth:`_get_show_ids` returns another object than the one it was built from, like
+        when the cached show ids are refreshed.
+
+        :return: the show index.
+        :rtype: :class:`~subliminal.utils.TitleIndex`
+
+        """
+        show_ids = self._get_show_ids()
+        if self.show_index is None or show_ids is not self.show_ids:
+            self.show_ids = show_ids
+            self.show_index = TitleIndex(show_ids)
+            logger.debug('Indexed %d show ids', len(self.show_index))
+
+        return self.show_index
+
     def get_show_id(self, series, year=None, country_code=None):
         """Get the best matching show id for `series`, `year` and `country_code`.
 
-        First search in the result of :meth:`_get_show_ids` and fallback on a search with :meth:`_search_show_id`.
+        First search in the index of the result of :meth:`_get_show_ids` and fallback on a search with
+        :meth:`_search_show_id`.
 
         :param str series: series of the episode.
         :param year: year of the series, if any.
@@ -276,28 +339,38 @@ class Addic7edProvider(Provider):
 
         """
         series_sanitized = sanitize(series).lower()
-        show_ids = self._get_show_ids()
-        show_id = None
-
-        # attempt with country
-        if not show_id and country_code:
-            logger.debug('Getting show id with country')
-            show_id = show_ids.get('%s %s' % (series_sanitized, country_code.lower()))
-
-        # attempt with year
-        if not show_id and year:
-            logger.debug('Getting show id with year')
-            show_id = show_ids.get('%s %d' % (series_sanitized, year))
-
-        # attempt clean
-        if not show_id:
-            logger.debug('Getting show id')
-            show_id = show_ids.get(series_sanitized)
+        show_index = self.get_show_index()
+
+        # build the attempts, with country and year first
+        attempts = []
+        if country_code:
+            attempts.append('%s %s' % (series_sanitized, country_code.lower()))
+        if year:
+            attempts.append('%s %d' % (series_sanitized, year))
+        attempts.append(series_sanitized)
+
+        # attempt exact matches
+        for attempt in attempts:
+            logger.debug('Getting show id with %r', dict(series=attempt, fuzzy=False))
+            show_id = show_index.get(attempt, fuzzy=False)
+            if show_id:
+                return show_id
+
+        # attempt a fuzzy match of the series alone, unless it has another year or country
+        logger.debug('Getting show id with %r', dict(series=series_sanitized, fuzzy=True))
+        title = show_index.match(series_sanitized)
+        if title is not None:
+            match = series_suffix_re.match(title)
+            if match and year and match.group('year') and int(match.group('year')) != year:
+                logger.debug('Year of %r does not match', title)
+            elif match and country_code and match.group('country') and match.group('country') != country_code.lower():
+                logger.debug('Country of %r does not match', title)
+            else:
+                return show_index.titles[title]
 
         # search as last resort
-        if not show_id:
-            logger.warning('Series %s not found in show ids', series)
-            show_id = self._search_show_id(series)
+        logger.warning('Series %s not found in show ids', series)
+        show_id = self._search_show_id(series)
 
         return show_id
 
@@ -349,6 +422,11 @@ class Addic7edProvider(Provider):
 
         return subtitles
 
+    def warm_cache(self, video):
+        for title in [video.series] + video.alternative_series:
+            if self.get_show_id(title, video.year) is not None:
+                break
+
     def list_subtitles(self, video, languages):
         # lookup show_id
         titles = [video.series] + video.alternative_series
@@ -374,14 +452,14 @@ class Addic7edProvider(Provider):
         logger.info('Downloading subtitle %r', subtitle)
         r = self._curl_make_request(self.server_url + subtitle.download_link)
 
-        if not r.content or len(r.content) == 0:
+        if len(r.view) == 0:
             # Provider returns a status of 304 Not Modified with an empty content
             # raise_for_status won't raise exception for that status code
             logger.debug('Unable to download subtitle. No data returned from provider')
             return
 
         # detect download limit exceeded
-        if curl_get_content_type(self.session).startswith('text/html'):
+        if r.content_type.startswith('text/html'):
             raise DownloadLimitExceeded
 
         subtitle.content = fix_line_ending(r.content)
@@ -6,13 +6,12 @@ from zipfile import ZipFile
 
 from babelfish import Language
 from guessit import guessit
-from requests import Session
 from six.moves import urllib
 
 from . import Provider
 from ..cache import EPISODE_EXPIRATION_TIME, region
 from ..exceptions import ProviderError
-from ..matches import guess_matches
+from ..matches import guess_matches, upper_bound_matches
 from ..subtitle import Subtitle, fix_line_ending
 from ..video import Episode
 
@@ -52,8 +51,16 @@ class ArgenteamSubtitle(Subtitle):
             matches.add('resolution')
 
         matches |= guess_matches(video, guessit(self.version, {'type': 'episode'}), partial=True)
+
+        # the structured fields are authoritative over the release names
+        matches &= self.upper_bound_matches(video)
+
         return matches
 
+    def upper_bound_matches(self, video):
+        return upper_bound_matches(video, type='episode', season=self.season, episode=self.episode,
+                                   series=self.series)
+
 
 class ArgenteamProvider(Provider):
     provider_name = 'argenteam'
@@ -67,13 +74,12 @@ class ArgenteamProvider(Provider):
         self.session = None
 
     def initialize(self):
-        self.session = Session()
-        self.session.headers['User-Agent'] = self.user_agent
+        self.session = self.get_transport().session(headers={'User-Agent': self.user_agent})
 
     def terminate(self):
         self.session.close()
 
-    @region.cache_on_arguments(expiration_time=EPISODE_EXPIRATION_TIME, should_cache_fn=lambda value: value)
+    @region.cache_on_arguments(expiration_time=EPISODE_EXPIRATION_TIME)
     def search_episode_id(self, series, season, episode):
         """Search the episode id from the `series`, `season` and `episode`.
 
@@ -87,7 +93,7 @@ class ArgenteamProvider(Provider):
         # make the search
         query = '%s S%#02dE%#02d' % (series, season, episode)
         logger.info('Searching episode id for %r', query)
-        r = self.session.get(self.server_url + 'search', params={'q': query}, timeout=10)
+        r = self.session.get(self.server_url + 'search', params={'q': query})
         r.raise_for_status()
         results = json.loads(r.text)
         if results['total'] == 1:
@@ -100,7 +106,7 @@ class ArgenteamProvider(Provider):
         if episode_id is None:
             return []
 
-        response = self.session.get(self.server_url + 'episode', params={'id': episode_id}, timeout=10)
+        response = self.session.get(self.server_url + 'episode', params={'id': episode_id})
         response.raise_for_status()
         content = json.loads(response.text)
         subtitles = []
@@ -112,6 +118,11 @@ class ArgenteamProvider(Provider):
 
         return subtitles
 
+    def warm_cache(self, video):
+        for title in [video.series] + video.alternative_series:
+            if self.search_episode_id(title, video.season, video.episode) is not None:
+                break
+
     def list_subtitles(self, video, languages):
         titles = [video.series] + video.alternative_series
         for title in titles:
@@ -124,7 +135,7 @@ class ArgenteamProvider(Provider):
     def download_subtitle(self, subtitle):
         # download as a zip
         logger.info('Downloading subtitle %r', subtitle)
-        r = self.session.get(subtitle.download_link, timeout=10)
+        r = self.session.get(subtitle.download_link)
         r.raise_for_status()
 
         # open the zip
@@ -4,8 +4,10 @@ import json
 import logging
 import os
 import re
+import time
 
 from babelfish import Language, language_converters
+from contextlib import closing
 from datetime import datetime, timedelta
 from dogpile.cache.api import NO_VALUE
 from guessit import guessit
@@ -13,15 +15,14 @@ import pytz
 import rarfile
 from rarfile import RarFile, is_rarfile
 from rebulk.loose import ensure_list
-from requests import Session
 from zipfile import ZipFile, is_zipfile
 
 from . import ParserBeautifulSoup, Provider
 from ..cache import SHOW_EXPIRATION_TIME, region
 from ..exceptions import AuthenticationError, ConfigurationError, ProviderError, ServiceUnavailable
-from ..matches import guess_matches
+from ..matches import guess_matches, upper_bound_matches
 from ..subtitle import SUBTITLE_EXTENSIONS, Subtitle, fix_line_ending
-from ..utils import sanitize
+from ..utils import sanitize, timestamp
 from ..video import Episode, Movie
 
 logger = logging.getLogger(__name__)
@@ -95,10 +96,50 @@ class LegendasTVArchive(object):
         #: Compressed content as :class:`rarfile.RarFile` or :class:`zipfile.ZipFile`
         self.content = None
 
+    def __getstate__(self):
+        # the opened archive cannot be pickled, it is downloaded again when needed
+        state = self.__dict__.copy()
+        state['content'] = None
+
+        return state
+
     def __repr__(self):
         return '<%s [%s] %r>' % (self.__class__.__name__, self.id, self.name)
 
 
+def dump_archives(archives):
+    """Convert the `archives` to tuples, their cached form.
+
+    :param archives: the archives.
+    :type archives: list of :class:`LegendasTVArchive`
+    :return: the archives as tuples.
+    :rtype: list of tuple
+
+    """
+    return [(a.id, a.name, a.pack, a.featured, a.link, a.downloads, a.rating,
+             timestamp(a.timestamp.astimezone(pytz.utc).replace(tzinfo=None)) if a.timestamp else None)
+            for a in archives]
+
+
+def load_archives(archives):
+    """Convert the tuples of :func:`dump_archives` back to archives.
+
+    :param list archives: the archives as tuples.
+    :return: the archives.
+    :rtype: list of :class:`LegendasTVArchive`
+
+    """
+    loaded_archives = []
+    for a in archives:
+        archive = LegendasTVArchive(*a[:7])
+        if a[7] is not None:
+            archive.timestamp = pytz.utc.localize(datetime.utcfromtimestamp(a[7])).astimezone(
+                pytz.timezone('America/Sao_Paulo'))
+        loaded_archives.append(archive)
+
+    return loaded_archives
+
+
 class LegendasTVSubtitle(Subtitle):
     """LegendasTV Subtitle."""
 
@@ -143,6 +184,20 @@ class LegendasTVSubtitle(Subtitle):
         # name
         matches |= guess_matches(video, guessit(self.name, {'type': self.type}))
 
+        # the structured fields are authoritative over the release names
+        matches &= self.upper_bound_matches(video)
+
+        return matches
+
+    def upper_bound_matches(self, video):
+        matches = upper_bound_matches(video, type=self.type, season=self.season)
+
+        # imdb_id
+        if isinstance(video, Episode) and video.series_imdb_id and self.imdb_id == video.series_imdb_id:
+            matches.add('series_imdb_id')
+        elif isinstance(video, Movie) and video.imdb_id and self.imdb_id == video.imdb_id:
+            matches.add('imdb_id')
+
         return matches
 
 
@@ -174,28 +229,102 @@ class LegendasTVProvider(Provider):
         self.session = None
 
     def initialize(self):
-        self.session = Session()
-        self.session.headers['User-Agent'] = self.user_agent
+        self.session = self.get_transport().session(headers={'User-Agent': self.user_agent})
 
         # login
         if self.username and self.password:
-            logger.info('Logging in')
-            data = {'_method': 'POST', 'data[User][username]': self.username, 'data[User][password]': self.password}
-            r = self.session.post(self.server_url + 'login', data, allow_redirects=False, timeout=10)
-            raise_for_status(r)
+            if self.resume_session():
+                return
+
+            self.login()
+
+    def login(self):
+        """Log in with the credentials and store the session, see :meth:`store_session`.
+
+        :raise: :class:`~subliminal.exceptions.AuthenticationError` if the credentials are invalid.
 
-            soup = ParserBeautifulSoup(r.content, ['html.parser'])
-            if soup.find('div', {'class': 'alert-error'}, string=re.compile(u'Usuário ou senha inválidos')):
-                raise AuthenticationError(self.username)
+        """
+        logger.info('Logging in')
+        data = {'_method': 'POST', 'data[User][username]': self.username, 'data[User][password]': self.password}
+        r = self.session.post(self.server_url + 'login', data, allow_redirects=False)
+        raise_for_status(r)
+
+        soup = ParserBeautifulSoup(r.content, ['html.parser'])
+        if soup.find('div', {'class': 'alert-error'}, string=re.compile(u'Usuário ou senha inválidos')):
+            raise AuthenticationError(self.username)
+
+        logger.debug('Logged in')
+        self.logged_in = True
+        self.store_session()
+
+    def check_session(self):
+        """Check with a request to the home page that the session is logged in, its pages then link to the logout.
+
+        :return: `True` if the session is logged in, `False` otherwise.
+        :rtype: bool
+
+        """
+        logger.debug('Checking session')
+        r = self.session.get(self.server_url, allow_redirects=False)
+        raise_for_status(r)
+
+        return r.status_code == 200 and b'users/logout' in r.content
+
+    def resume_session(self):
+        """Resume the session stored in the :attr:`~subliminal.providers.Provider.session_store`, if any.
+
+        The cookies that have not expired are checked with :meth:`check_session`, as the server may have revoked them.
+
+        :return: `True` if the session has been resumed, `False` otherwise.
+        :rtype: bool
+
+        """
+        if self.session_store is None:
+            return False
+
+        session, _ = self.session_store.get('legendastv', self.username)
+        if session is None:
+            return False
+
+        now = time.time()
+        cookies = [c for c in session['cookies'] if c['expires'] is None or c['expires'] > now]
+        if not cookies:
+            logger.info('Stored session expired')
+            return False
+
+        for cookie in cookies:
+            self.session.cookies.set(cookie['name'], cookie['value'], domain=cookie['domain'], path=cookie['path'],
+                                     expires=cookie['expires'])
+        if not self.check_session():
+            logger.info('Stored session revoked')
+            self.session.cookies.clear()
+            self.session_store.delete('legendastv', self.username)
+            return False
 
-            logger.debug('Logged in')
-            self.logged_in = True
+        logger.debug('Resumed session')
+        self.logged_in = True
+
+        return True
+
+    def store_session(self):
+        """Store the cookies of the session in the :attr:`~subliminal.providers.Provider.session_store`, if any."""
+        if self.session_store is None:
+            return
+
+        cookies = [{'name': c.name, 'value': c.value, 'domain': c.domain, 'path': c.path, 'expires': c.expires}
+                   for c in self.session.cookies]
+        self.session_store.set('legendastv', self.username, {'cookies': cookies})
 
     def terminate(self):
+        # the stored session is kept alive for the next run, with its refreshed cookies
+        if self.logged_in and self.session_store is not None:
+            self.store_session()
+            self.logged_in = False
+
         # logout
         if self.logged_in:
             logger.info('Logging out')
-            r = self.session.get(self.server_url + 'users/logout', allow_redirects=False, timeout=10)
+            r = self.session.get(self.server_url + 'users/logout', allow_redirects=False)
             raise_for_status(r)
             logger.debug('Logged out')
             self.logged_in = False
@@ -256,7 +385,7 @@ class LegendasTVProvider(Provider):
 
         return True
 
-    @region.cache_on_arguments(expiration_time=SHOW_EXPIRATION_TIME, should_cache_fn=lambda value: value)
+    @region.cache_on_arguments(expiration_time=SHOW_EXPIRATION_TIME)
     def search_titles(self, title, season, title_year):
         """Search for titles matching the `title`.
 
@@ -280,7 +409,7 @@ class LegendasTVProvider(Provider):
             else:
                 logger.info('Searching movie title %r', sanitized_title)
 
-            r = self.session.get(self.server_url + 'legenda/sugestao/{}'.format(sanitized_title), timeout=10)
+            r = self.session.get(self.server_url + 'legenda/sugestao/{}'.format(sanitized_title))
             raise_for_status(r)
             results = json.loads(r.text)
 
@@ -332,7 +461,8 @@ class LegendasTVProvider(Provider):
 
         return titles
 
-    @region.cache_on_arguments(expiration_time=timedelta(minutes=15).total_seconds())
+    @region.cache_on_arguments(expiration_time=timedelta(minutes=15).total_seconds(), dump=dump_archives,
+                               load=load_archives, namespace='archives-v2')
     def get_archives(self, title_id, language_code, type, season, episodes):
         """Get the archive list from a given `title_id`, `language_code`, `type`, `season` and `episode`.
 
@@ -346,61 +476,97 @@ class LegendasTVProvider(Provider):
 
         """
         archives = []
-        page = 0
-        while True:
-            # get the archive page
-            url = self.server_url + 'legenda/busca/-/{language}/-/{page}/{title}'.format(
-                language=language_code, page=page, title=title_id)
-            r = self.session.get(url)
-            raise_for_status(r)
+        page_size = None
+        pages = [0]
+        while pages:
+            # the number of pages is unknown, the pages after the first one are fetched in rounds of page_workers
+            soups = self.fetch_pages(lambda p: self.get_archives_page(title_id, language_code, p), pages)
+            with closing(soups):
+                for page, soup in zip(pages, soups):
+                    # parse the results
+                    for archive in self.parse_archives(soup, type, season, episodes):
+                        logger.info('Found archive for title %d and language %d at page %s: %s',
+                                    title_id, language_code, page, archive)
+                        archives.append(archive)
+
+                    # stop on last page, without a link to the next one or shorter than the first one
+                    size = len(soup.select('div.list_element > article'))
+                    if page_size is None:
+                        page_size = size
+                    if soup.find('a', attrs={'class': 'load_more'}, string='carregar mais') is None or size < page_size:
+                        pages = []
+                        break
+                else:
+                    # get the next pages
+                    pages = list(range(pages[-1] + 1, pages[-1] + 1 + self.page_workers))
 
-            # parse the results
-            soup = ParserBeautifulSoup(r.content, ['lxml', 'html.parser'])
-            for archive_soup in soup.select('div.list_element > article > div > div.f_left'):
-                # create archive
-                archive = LegendasTVArchive(archive_soup.a['href'].split('/')[2],
-                                            archive_soup.a.text,
-                                            'pack' in archive_soup.parent['class'],
-                                            'destaque' in archive_soup.parent['class'],
-                                            self.server_url + archive_soup.a['href'][1:])
-                # clean name of path separators and pack flags
-                clean_name = archive.name.replace('/', '-')
-                if archive.pack and clean_name.startswith('(p)'):
-                    clean_name = clean_name[3:]
-
-                if type == 'episode' and not archive.pack and not self.episode_matches(clean_name, season, episodes):
-                    continue
-
-                # extract text containing downloads, rating and timestamp
-                data_text = archive_soup.find('p', class_='data').text
-
-                # match downloads
-                archive.downloads = int(downloads_re.search(data_text).group('downloads'))
-
-                # match rating
-                match = rating_re.search(data_text)
-                if match:
-                    archive.rating = int(match.group('rating'))
-
-                # match timestamp and validate it
-                time_data = {k: int(v) for k, v in timestamp_re.search(data_text).groupdict().items()}
-                archive.timestamp = pytz.timezone('America/Sao_Paulo').localize(datetime(**time_data))
-                if archive.timestamp > datetime.utcnow().replace(tzinfo=pytz.utc):
-                    raise ProviderError('Archive timestamp is in the future')
-
-                # add archive
-                logger.info('Found archive for title %d and language %d at page %s: %s',
-                            title_id, language_code, page, archive)
-                archives.append(archive)
-
-            # stop on last page
-            if soup.find('a', attrs={'class': 'load_more'}, string='carregar mais') is None:
-                break
+        logger.debug('Found %d archives', len(archives))
 
-            # increment page count
-            page += 1
+        return archives
 
-        logger.debug('Found %d archives', len(archives))
+    def get_archives_page(self, title_id, language_code, page):
+        """Get a page of the archive list of a given `title_id` and `language_code`.
+
+        :param int title_id: title id.
+        :param int language_code: language code.
+        :param int page: the page, starting at 0.
+        :return: the parsed page.
+        :rtype: :class:`~subliminal.providers.ParserBeautifulSoup`
+
+        """
+        url = self.server_url + 'legenda/busca/-/{language}/-/{page}/{title}'.format(
+            language=language_code, page=page, title=title_id)
+        r = self.session.get(url)
+        raise_for_status(r)
+
+        return ParserBeautifulSoup(r.content, ['lxml', 'html.parser'])
+
+    def parse_archives(self, soup, type, season, episodes):
+        """Parse the archives of a page of the archive list, keeping the ones of the `season` and `episodes`.
+
+        :param soup: the parsed page.
+        :type soup: :class:`~subliminal.providers.ParserBeautifulSoup`
+        :param str type: episode or movie
+        :param int season: season
+        :param list episodes: episodes
+        :return: the archives.
+        :rtype: list of :class:`LegendasTVArchive`
+
+        """
+        archives = []
+        for archive_soup in soup.select('div.list_element > article > div > div.f_left'):
+            # create archive
+            archive = LegendasTVArchive(archive_soup.a['href'].split('/')[2],
+                                        archive_soup.a.text,
+                                        'pack' in archive_soup.parent['class'],
+                                        'destaque' in archive_soup.parent['class'],
+                                        self.server_url + archive_soup.a['href'][1:])
+            # clean name of path separators and pack flags
+            clean_name = archive.name.replace('/', '-')
+            if archive.pack and clean_name.startswith('(p)'):
+                clean_name = clean_name[3:]
+
+            if type == 'episode' and not archive.pack and not self.episode_matches(clean_name, season, episodes):
+                continue
+
+            # extract text containing downloads, rating and timestamp
+            data_text = archive_soup.find('p', class_='data').text
+
+            # match downloads
+            archive.downloads = int(downloads_re.search(data_text).group('downloads'))
+
+            # match rating
+            match = rating_re.search(data_text)
+            if match:
+                archive.rating = int(match.group('rating'))
+
+            # match timestamp and validate it
+            time_data = {k: int(v) for k, v in timestamp_re.search(data_text).groupdict().items()}
+            archive.timestamp = pytz.timezone('America/Sao_Paulo').localize(datetime(**time_data))
+            if archive.timestamp > datetime.utcnow().replace(tzinfo=pytz.utc):
+                raise ProviderError('Archive timestamp is in the future')
+
+            archives.append(archive)
 
         return archives
 
@@ -489,6 +655,18 @@ class LegendasTVProvider(Provider):
 
         return subtitles
 
+    def warm_cache(self, video):
+        if isinstance(video, Episode):
+            titles = [video.series] + video.alternative_series
+            season = video.season
+        else:
+            titles = [video.title] + video.alternative_titles
+            season = None
+
+        for title in titles:
+            if self.search_titles(title, season, video.year):
+                break
+
     def list_subtitles(self, video, languages):
         season = None
         episodes = []
@@ -2,7 +2,6 @@
 import logging
 
 from babelfish import Language
-from requests import Session
 
 from . import Provider
 from ..subtitle import Subtitle
@@ -60,6 +59,9 @@ class NapiProjektSubtitle(Subtitle):
 
         return matches
 
+    def upper_bound_matches(self, video):
+        return self.get_matches(video)
+
 
 class NapiProjektProvider(Provider):
     """NapiProjekt Provider."""
@@ -72,8 +74,7 @@ class NapiProjektProvider(Provider):
         self.session = None
 
     def initialize(self):
-        self.session = Session()
-        self.session.headers['User-Agent'] = self.user_agent
+        self.session = self.get_transport().session(headers={'User-Agent': self.user_agent})
 
     def terminate(self):
         self.session.close()
@@ -89,7 +90,7 @@ class NapiProjektProvider(Provider):
             'f': hash,
             't': get_subhash(hash)}
         logger.info('Searching subtitle %r', params)
-        r = self.session.get(self.server_url, params=params, timeout=10)
+        r = self.session.get(self.server_url, params=params)
         r.raise_for_status()
 
         # handle subtitles not found and errors
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import base64
+from collections import OrderedDict
 import logging
 import os
 import re
@@ -9,12 +10,13 @@ from babelfish import Language, language_converters
 from guessit import guessit
 from six.moves.xmlrpc_client import ServerProxy
 
-from . import Provider, TimeoutSafeTransport
+from . import Provider
 from .. import __short_version__
 from ..exceptions import (AuthenticationError, ConfigurationError, DownloadLimitExceeded, ProviderError,
                           ServiceUnavailable)
-from ..matches import guess_matches
+from ..matches import guess_matches, upper_bound_matches
 from ..subtitle import Subtitle, fix_line_ending
+from ..transport import XMLRPCTransport
 from ..video import Episode, Movie
 
 logger = logging.getLogger(__name__)
@@ -87,6 +89,9 @@ class OpenSubtitlesSubtitle(Subtitle):
         matches |= guess_matches(video, guessit(self.movie_release_name, {'type': self.movie_kind}))
         matches |= guess_matches(video, guessit(self.filename, {'type': self.movie_kind}))
 
+        # the structured fields are authoritative over the release names
+        matches &= self.upper_bound_matches(video)
+
         # hash
         if 'opensubtitles' in video.hashes and self.hash == video.hashes['opensubtitles']:
             if self.movie_kind == 'movie' and 'title' in matches:
@@ -102,6 +107,32 @@ class OpenSubtitlesSubtitle(Subtitle):
 
         return matches
 
+    def upper_bound_matches(self, video):
+        if (isinstance(video, Episode) and self.movie_kind != 'episode') or (
+                isinstance(video, Movie) and self.movie_kind != 'movie'):
+            return set()
+
+        matches = upper_bound_matches(video, type=self.movie_kind, season=self.series_season,
+                                      episode=self.series_episode,
+                                      series=self.series_name if self.movie_kind == 'episode' else None)
+
+        # tag
+        if self.matched_by == 'tag' and (not video.imdb_id or self.movie_imdb_id == video.imdb_id):
+            if self.movie_kind == 'episode':
+                matches |= {'series', 'year', 'season', 'episode'}
+            elif self.movie_kind == 'movie':
+                matches |= {'title', 'year'}
+
+        # hash
+        if 'opensubtitles' in video.hashes and self.hash == video.hashes['opensubtitles']:
+            matches.add('hash')
+
+        # imdb_id
+        if video.imdb_id and self.movie_imdb_id == video.imdb_id:
+            matches.add('imdb_id')
+
+        return matches
+
 
 class OpenSubtitlesProvider(Provider):
     """OpenSubtitles Provider.
@@ -115,8 +146,17 @@ class OpenSubtitlesProvider(Provider):
     subtitle_class = OpenSubtitlesSubtitle
     user_agent = 'subliminal v%s' % __short_version__
 
+    #: Maximum number of search criteria of a `SearchSubtitles` call
+    search_criteria_limit = 20
+
+    #: Maximum number of subtitles returned by a `SearchSubtitles` call
+    search_results_limit = 500
+
+    #: Maximum number of subtitle ids of a `DownloadSubtitles` call
+    download_ids_limit = 20
+
     def __init__(self, username=None, password=None):
-        self.server = ServerProxy(self.server_url, TimeoutSafeTransport(10))
+        self.server = None
         if any((username, password)) and not all((username, password)):
             raise ConfigurationError('Username and password must be specified')
         # None values not allowed for logging in, so replace it by ''
@@ -125,23 +165,69 @@ class OpenSubtitlesProvider(Provider):
         self.token = None
 
     def initialize(self):
+        self.server = ServerProxy(self.server_url, XMLRPCTransport(self.get_transport().session()))
+        if self.resume_session():
+            return
+
         logger.info('Logging in')
         response = checked(self.server.LogIn(self.username, self.password, 'eng', self.user_agent))
         self.token = response['token']
         logger.debug('Logged in with token %r', self.token)
 
+        if self.session_store is not None:
+            self.session_store.set(self.subtitle_class.provider_name, self.username, {'token': self.token})
+
+    def resume_session(self):
+        """Resume the session stored in the :attr:`~subliminal.providers.Provider.session_store`, if any.
+
+        The stored token is checked with :meth:`no_operation`, which also keeps the session alive.
+
+        :return: `True` if the session has been resumed, `False` otherwise.
+        :rtype: bool
+
+        """
+        if self.session_store is None:
+            return False
+
+        session, _ = self.session_store.get(self.subtitle_class.provider_name, self.username)
+        if session is None:
+            return False
+
+        self.token = session['token']
+        try:
+            self.no_operation()
+        except (NoSession, Unauthorized):
+            logger.info('Stored session expired')
+            self.session_store.delete(self.subtitle_class.provider_name, self.username)
+            self.token = None
+            return False
+
+        logger.debug('Resumed session with token %r', self.token)
+
+        return True
+
     def terminate(self):
-        logger.info('Logging out')
-        checked(self.server.LogOut(self.token))
-        self.server.close()
+        # the stored session is kept alive for the next run
+        if self.session_store is None:
+            logger.info('Logging out')
+            checked(self.server.LogOut(self.token))
+            logger.debug('Logged out')
+        self.server('close')()
         self.token = None
-        logger.debug('Logged out')
 
     def no_operation(self):
         logger.debug('No operation')
         checked(self.server.NoOperation(self.token))
 
-    def query(self, languages, hash=None, size=None, imdb_id=None, query=None, season=None, episode=None, tag=None):
+    @staticmethod
+    def get_criteria(languages, hash=None, size=None, imdb_id=None, query=None, season=None, episode=None, tag=None):
+        """Get the search criteria of `SearchSubtitles`, as :meth:`query` sends them.
+
+        :return: the search criteria.
+        :rtype: list of dict
+        :raise: ValueError if there is not enough information.
+
+        """
         # fill the search criteria
         criteria = []
         if hash and size:
@@ -164,6 +250,33 @@ class OpenSubtitlesProvider(Provider):
         for criterion in criteria:
             criterion['sublanguageid'] = ','.join(sorted(l.opensubtitles for l in languages))
 
+        return criteria
+
+    @staticmethod
+    def get_query_params(video):
+        """Get the parameters of :meth:`query` for the `video`.
+
+        :param video: the video.
+        :type video: :class:`~subliminal.video.Video`
+        :return: the parameters.
+        :rtype: dict
+
+        """
+        season = episode = None
+        if isinstance(video, Episode):
+            query = video.series
+            season = video.season
+            episode = video.episode
+        else:
+            query = video.title
+
+        return dict(hash=video.hashes.get('opensubtitles'), size=video.size, imdb_id=video.imdb_id, query=query,
+                    season=season, episode=episode, tag=os.path.basename(video.name))
+
+    def query(self, languages, hash=None, size=None, imdb_id=None, query=None, season=None, episode=None, tag=None):
+        criteria = self.get_criteria(languages, hash=hash, size=size, imdb_id=imdb_id, query=query, season=season,
+                                     episode=episode, tag=tag)
+
         # query the server
         logger.info('Searching subtitles %r', criteria)
         response = checked(self.server.SearchSubtitles(self.token, criteria))
@@ -176,47 +289,162 @@ class OpenSubtitlesProvider(Provider):
 
         # loop over subtitle items
         for subtitle_item in response['data']:
-            # read the item
-            language = Language.fromopensubtitles(subtitle_item['SubLanguageID'])
-            hearing_impaired = bool(int(subtitle_item['SubHearingImpaired']))
-            page_link = subtitle_item['SubtitlesLink']
-            subtitle_id = int(subtitle_item['IDSubtitleFile'])
-            matched_by = subtitle_item['MatchedBy']
-            movie_kind = subtitle_item['MovieKind']
-            hash = subtitle_item['MovieHash']
-            movie_name = subtitle_item['MovieName']
-            movie_release_name = subtitle_item['MovieReleaseName']
-            movie_year = int(subtitle_item['MovieYear']) if subtitle_item['MovieYear'] else None
-            movie_imdb_id = 'tt' + subtitle_item['IDMovieImdb']
-            series_season = int(subtitle_item['SeriesSeason']) if subtitle_item['SeriesSeason'] else None
-            series_episode = int(subtitle_item['SeriesEpisode']) if subtitle_item['SeriesEpisode'] else None
-            filename = subtitle_item['SubFileName']
-            encoding = subtitle_item.get('SubEncoding') or None
-
-            subtitle = self.subtitle_class(language, hearing_impaired, page_link, subtitle_id, matched_by, movie_kind,
-                                           hash, movie_name, movie_release_name, movie_year, movie_imdb_id,
-                                           series_season, series_episode, filename, encoding)
-            logger.debug('Found subtitle %r by %s', subtitle, matched_by)
-            subtitles.append(subtitle)
+            subtitles.append(self.parse_subtitle(subtitle_item))
 
         return subtitles
 
+    def parse_subtitle(self, subtitle_item):
+        """Parse a subtitle item of a `SearchSubtitles` response.
+
+        :param dict subtitle_item: the subtitle item.
+        :return: the subtitle.
+        :rtype: :class:`OpenSubtitlesSubtitle`
+
+        """
+        # read the item
+        language = Language.fromopensubtitles(subtitle_item['SubLanguageID'])
+        hearing_impaired = bool(int(subtitle_item['SubHearingImpaired']))
+        page_link = subtitle_item['SubtitlesLink']
+        subtitle_id = int(subtitle_item['IDSubtitleFile'])
+        matched_by = subtitle_item['MatchedBy']
+        movie_kind = subtitle_item['MovieKind']
+        hash = subtitle_item['MovieHash']
+        movie_name = subtitle_item['MovieName']
+        movie_release_name = subtitle_item['MovieReleaseName']
+        movie_year = int(subtitle_item['MovieYear']) if subtitle_item['MovieYear'] else None
+        movie_imdb_id = 'tt' + subtitle_item['IDMovieImdb']
+        series_season = int(subtitle_item['SeriesSeason']) if subtitle_item['SeriesSeason'] else None
+        series_episode = int(subtitle_item['SeriesEpisode']) if subtitle_item['SeriesEpisode'] else None
+        filename = subtitle_item['SubFileName']
+        encoding = subtitle_item.get('SubEncoding') or None
+
+        subtitle = self.subtitle_class(language, hearing_impaired, page_link, subtitle_id, matched_by, movie_kind,
+                                       hash, movie_name, movie_release_name, movie_year, movie_imdb_id,
+                                       series_season, series_episode, filename, encoding)
+        logger.debug('Found subtitle %r by %s', subtitle, matched_by)
+
+        return subtitle
+
     def list_subtitles(self, video, languages):
-        season = episode = None
-        if isinstance(video, Episode):
-            query = video.series
-            season = video.season
-            episode = video.episode
-        else:
-            query = video.title
+        return self.query(languages, **self.get_query_params(video))
+
+    def list_subtitles_batch(self, videos, languages):
+        subtitles = {video: [] for video in videos}
+
+        # pack the criteria of the videos in batches, up to the limit of a search
+        batches = [[]]
+        criteria_count = 0
+        for video in videos:
+            criteria = self.get_criteria(languages, **self.get_query_params(video))
+            if batches[-1] and criteria_count + len(criteria) > self.search_criteria_limit:
+                batches.append([])
+                criteria_count = 0
+            batches[-1].append((video, criteria))
+            criteria_count += len(criteria)
+
+        for batch in batches:
+            if batch:
+                self.search_batch(batch, subtitles)
+
+        return subtitles
+
+    def search_batch(self, batch, subtitles):
+        """Search the subtitles of a batch of videos with a single `SearchSubtitles` call.
 
-        return self.query(languages, hash=video.hashes.get('opensubtitles'), size=video.size, imdb_id=video.imdb_id,
-                          query=query, season=season, episode=episode, tag=os.path.basename(video.name))
+        The results of a search are truncated to :attr:`search_results_limit`, a batch reaching it is split in two and
+        each half is searched again.
+
+        :param list batch: the videos and their search criteria, as returned by :meth:`get_criteria`.
+        :param dict subtitles: the subtitles per video to add the found subtitles to.
+
+        """
+        criteria = [c for _, video_criteria in batch for c in video_criteria]
+        logger.info('Searching subtitles of %d videos with %d criteria', len(batch), len(criteria))
+        response = checked(self.server.SearchSubtitles(self.token, criteria))
+
+        # exit if no data
+        if not response['data']:
+            logger.debug('No subtitles found')
+            return
+
+        # split the batch if the results may be truncated
+        if len(response['data']) >= self.search_results_limit and len(batch) > 1:
+            logger.debug('Search results reached the limit, splitting the batch')
+            self.search_batch(batch[:len(batch) // 2], subtitles)
+            self.search_batch(batch[len(batch) // 2:], subtitles)
+            return
+
+        # route the subtitles back to their videos
+        criteria_videos = [video for video, video_criteria in batch for _ in video_criteria]
+        for subtitle_item in response['data']:
+            video = self.route_subtitle(subtitle_item, batch, criteria_videos)
+            if video is None:
+                logger.warning('No video found for subtitle %s', subtitle_item['IDSubtitleFile'])
+                continue
+            subtitles[video].append(self.parse_subtitle(subtitle_item))
+
+    @staticmethod
+    def route_subtitle(subtitle_item, batch, criteria_videos):
+        """Find the video of a subtitle item of a batched search.
+
+        The item is routed by the index of its matching criterion, or else by its hash, IMDb ID or query.
+
+        :param dict subtitle_item: the subtitle item.
+        :param list batch: the videos and their search criteria.
+        :param list criteria_videos: the video of each criterion of the search.
+        :return: the video, if found.
+        :rtype: :class:`~subliminal.video.Video`
+
+        """
+        query_number = subtitle_item.get('QueryNumber')
+        if query_number is not None and 0 <= int(query_number) < len(criteria_videos):
+            return criteria_videos[int(query_number)]
+
+        matched_by = subtitle_item['MatchedBy']
+        parameters = subtitle_item.get('QueryParameters') or {}
+        for video, video_criteria in batch:
+            for criterion in video_criteria:
+                if matched_by == 'moviehash':
+                    if criterion.get('moviehash') == subtitle_item['MovieHash']:
+                        return video
+                elif matched_by == 'imdbid':
+                    if 'imdbid' in criterion and int(criterion['imdbid']) == int(subtitle_item['IDMovieImdb']) and \
+                            all(str(criterion.get(k)) == str(v) for k, v in parameters.items()
+                                if k in ('season', 'episode')):
+                        return video
+                elif parameters and all(str(criterion.get(k, '')).lower() == str(v).lower()
+                                        for k, v in parameters.items() if k != 'sublanguageid'):
+                    return video
+
+        return None
 
     def download_subtitle(self, subtitle):
         logger.info('Downloading subtitle %r', subtitle)
         response = checked(self.server.DownloadSubtitles(self.token, [str(subtitle.subtitle_id)]))
-        subtitle.content = fix_line_ending(zlib.decompress(base64.b64decode(response['data'][0]['data']), 47))
+        subtitle.content = decode_content(response['data'][0]['data'])
+
+    def download_subtitles(self, subtitles):
+        # subtitles of several videos may share the same file
+        subtitles_per_id = OrderedDict()
+        for subtitle in subtitles:
+            subtitles_per_id.setdefault(str(subtitle.subtitle_id), []).append(subtitle)
+
+        ids = list(subtitles_per_id)
+        for i in range(0, len(ids), self.download_ids_limit):
+            chunk = ids[i:i + self.download_ids_limit]
+            logger.info('Downloading %d subtitles', len(chunk))
+            response = checked(self.server.DownloadSubtitles(self.token, chunk))
+
+            for subtitle_item in response['data'] or []:
+                # a subtitle that cannot be decoded does not prevent the others of the chunk from being filled in
+                try:
+                    content = decode_content(subtitle_item['data'])
+                except (ValueError, zlib.error) as e:
+                    logger.error('Unable to decode subtitle file %s: %r', subtitle_item['idsubtitlefile'], e)
+                    continue
+
+                for subtitle in subtitles_per_id.get(str(subtitle_item['idsubtitlefile']), []):
+                    subtitle.content = content
 
 
 class OpenSubtitlesVipSubtitle(OpenSubtitlesSubtitle):
@@ -292,3 +520,15 @@ def checked(response):
         raise OpenSubtitlesError(response['status'])
 
     return response
+
+
+def decode_content(data):
+    """Decode the base64-encoded and gzip-compressed content of a `DownloadSubtitles` item.
+
+    :param str data: the encoded content.
+    :return: the content.
+    :rtype: bytes
+    :raise: ValueError or :class:`zlib.error` if the content cannot be decoded.
+
+    """
+    return fix_line_ending(zlib.decompress(base64.b64decode(data), 47))
@@ -5,12 +5,11 @@ import logging
 
 from babelfish import Language, language_converters
 from guessit import guessit
-from requests import Session
 from zipfile import ZipFile
 
 from . import Provider, SecLevelOneTLSAdapter
 from ..exceptions import ProviderError
-from ..matches import guess_matches
+from ..matches import guess_matches, upper_bound_matches
 from ..subtitle import Subtitle, fix_line_ending
 from ..video import Episode
 
@@ -52,8 +51,17 @@ class PodnapisiSubtitle(Subtitle):
         for release in self.releases:
             matches |= guess_matches(video, guessit(release, {'type': video_type}))
 
+        # the structured fields are authoritative over the release names
+        matches &= self.upper_bound_matches(video)
+
         return matches
 
+    def upper_bound_matches(self, video):
+        if self.season is None:
+            return upper_bound_matches(video, type='movie')
+
+        return upper_bound_matches(video, type='episode', season=self.season, episode=self.episode, series=self.title)
+
 
 class PodnapisiProvider(Provider):
     """Podnapisi Provider."""
@@ -66,10 +74,10 @@ class PodnapisiProvider(Provider):
         self.session = None
 
     def initialize(self):
-        self.session = Session()
+        self.session = self.get_transport().session(headers={'User-Agent': self.user_agent,
+                                                             'Accept': 'application/json'})
+        # podnapisi requires a lower TLS security level, with connection pools of its own
         self.session.mount('https://', SecLevelOneTLSAdapter())
-        self.session.headers['User-Agent'] = self.user_agent
-        self.session.headers['Accept'] = 'application/json'
 
     def terminate(self):
         self.session.close()
@@ -88,16 +96,22 @@ class PodnapisiProvider(Provider):
         if year:
             params['year'] = year
 
-        # loop over paginated results
+        # get the first page, which gives the number of pages
         logger.info('Searching subtitles %r', params)
+        result = self.search_page(params)
+        results = [result]
+
+        # get the other pages concurrently
+        page, all_pages = int(result['page']), int(result['all_pages'])
+        if page < all_pages:
+            logger.debug('Getting pages %d to %d', page + 1, all_pages)
+            results.extend(self.fetch_pages(lambda p: self.search_page(params, page=p),
+                                            list(range(page + 1, all_pages + 1))))
+
+        # loop over paginated results, in page order
         subtitles = []
         pids = set()
-        while True:
-            # query the server
-            r = self.session.get(self.server_url + 'search/advanced', params=params, timeout=10)
-            r.raise_for_status()
-            result = json.loads(r.text)
-
+        for result in results:
             # loop over subtitles
             for data in result['data']:
                 # read xml elements
@@ -131,15 +145,23 @@ class PodnapisiProvider(Provider):
                 subtitles.append(subtitle)
                 pids.add(pid)
 
-            # stop on last page
-            if int(result['page']) >= int(result['all_pages']):
-                break
+        return subtitles
 
-            # increment current page
-            params['page'] = int(result['page']) + 1
-            logger.debug('Getting page %d', params['page'])
+    def search_page(self, params, page=None):
+        """Get a page of the results of a search.
 
-        return subtitles
+        :param dict params: parameters of the search.
+        :param int page: the page, the first one if `None`.
+        :return: the page of results.
+        :rtype: dict
+
+        """
+        if page is not None:
+            params = dict(params, page=page)
+        r = self.session.get(self.server_url + 'search/advanced', params=params)
+        r.raise_for_status()
+
+        return json.loads(r.text)
 
     def list_subtitles(self, video, languages):
         season = episode = None
@@ -161,7 +183,7 @@ class PodnapisiProvider(Provider):
     def download_subtitle(self, subtitle):
         # download as a zip
         logger.info('Downloading subtitle %r', subtitle)
-        r = self.session.get(self.server_url + subtitle.pid + '/download', params={'container': 'zip'}, timeout=10)
+        r = self.session.get(self.server_url + subtitle.pid + '/download', params={'container': 'zip'})
         r.raise_for_status()
 
         # open the zip
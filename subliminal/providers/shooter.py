@@ -4,7 +4,6 @@ import logging
 import os
 
 from babelfish import Language, language_converters
-from requests import Session
 
 from . import Provider
 from ..subtitle import Subtitle, fix_line_ending
@@ -40,6 +39,9 @@ class ShooterSubtitle(Subtitle):
 
         return matches
 
+    def upper_bound_matches(self, video):
+        return self.get_matches(video)
+
 
 class ShooterProvider(Provider):
     """Shooter Provider."""
@@ -51,8 +53,7 @@ class ShooterProvider(Provider):
         self.session = None
 
     def initialize(self):
-        self.session = Session()
-        self.session.headers['User-Agent'] = self.user_agent
+        self.session = self.get_transport().session(headers={'User-Agent': self.user_agent})
 
     def terminate(self):
         self.session.close()
@@ -61,7 +62,7 @@ class ShooterProvider(Provider):
         # query the server
         params = {'filehash': hash, 'pathinfo': os.path.realpath(filename), 'format': 'json', 'lang': language.shooter}
         logger.debug('Searching subtitles %r', params)
-        r = self.session.post(self.server_url, params=params, timeout=10)
+        r = self.session.post(self.server_url, params=params)
         r.raise_for_status()
 
         # handle subtitles not found
@@ -80,7 +81,7 @@ class ShooterProvider(Provider):
 
     def download_subtitle(self, subtitle):
         logger.info('Downloading subtitle %r', subtitle)
-        r = self.session.get(subtitle.download_link, timeout=10)
+        r = self.session.get(subtitle.download_link)
         r.raise_for_status()
 
         subtitle.content = fix_line_ending(r.content)
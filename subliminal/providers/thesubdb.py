@@ -2,7 +2,6 @@
 import logging
 
 from babelfish import Language, language_converters
-from requests import Session
 
 from . import Provider
 from .. import __short_version__
@@ -38,6 +37,9 @@ class TheSubDBSubtitle(Subtitle):
 
         return matches
 
+    def upper_bound_matches(self, video):
+        return self.get_matches(video)
+
 
 class TheSubDBProvider(Provider):
     """TheSubDB Provider."""
@@ -51,8 +53,7 @@ class TheSubDBProvider(Provider):
         self.session = None
 
     def initialize(self):
-        self.session = Session()
-        self.session.headers['User-Agent'] = self.user_agent
+        self.session = self.get_transport().session(headers={'User-Agent': self.user_agent})
 
     def terminate(self):
         self.session.close()
@@ -61,7 +62,7 @@ class TheSubDBProvider(Provider):
         # make the query
         params = {'action': 'search', 'hash': hash}
         logger.info('Searching subtitles %r', params)
-        r = self.session.get(self.server_url, params=params, timeout=10)
+        r = self.session.get(self.server_url, params=params)
 
         # handle subtitles not found and errors
         if r.status_code == 404:
@@ -86,7 +87,7 @@ class TheSubDBProvider(Provider):
     def download_subtitle(self, subtitle):
         logger.info('Downloading subtitle %r', subtitle)
         params = {'action': 'download', 'hash': subtitle.hash, 'language': subtitle.language.alpha2}
-        r = self.session.get(self.server_url, params=params, timeout=10)
+        r = self.session.get(self.server_url, params=params)
         r.raise_for_status()
 
         subtitle.content = fix_line_ending(r.content)
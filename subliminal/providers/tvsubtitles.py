@@ -6,13 +6,13 @@ from zipfile import ZipFile
 
 from babelfish import Language, language_converters
 from guessit import guessit
-from requests import Session
 
 from . import ParserBeautifulSoup, Provider
 from ..cache import EPISODE_EXPIRATION_TIME, SHOW_EXPIRATION_TIME, region
 from ..exceptions import ProviderError
-from ..matches import guess_matches
+from ..matches import guess_matches, upper_bound_matches
 from ..subtitle import Subtitle, fix_line_ending
+from ..utils import TitleIndex
 from ..video import Episode
 
 logger = logging.getLogger(__name__)
@@ -60,8 +60,15 @@ class TVsubtitlesSubtitle(Subtitle):
         if self.rip:
             matches |= guess_matches(video, guessit(self.rip, {'type': 'episode'}), partial=True)
 
+        # the structured fields are authoritative over the release names
+        matches &= self.upper_bound_matches(video)
+
         return matches
 
+    def upper_bound_matches(self, video):
+        return upper_bound_matches(video, type='episode', season=self.season, episode=self.episode,
+                                   series=self.series)
+
 
 class TVsubtitlesProvider(Provider):
     """TVsubtitles Provider."""
@@ -77,8 +84,7 @@ class TVsubtitlesProvider(Provider):
         self.session = None
 
     def initialize(self):
-        self.session = Session()
-        self.session.headers['User-Agent'] = self.user_agent
+        self.session = self.get_transport().session(headers={'User-Agent': self.user_agent})
 
     def terminate(self):
         self.session.close()
@@ -96,25 +102,34 @@ class TVsubtitlesProvider(Provider):
         """
         # make the search
         logger.info('Searching show id for %r', series)
-        r = self.session.post(self.server_url + 'search.php', data={'q': series}, timeout=10)
+        r = self.session.post(self.server_url + 'search.php', data={'q': series})
         r.raise_for_status()
 
-        # get the series out of the suggestions
+        # index the series of the suggestions, with their first year if the year is known
         soup = ParserBeautifulSoup(r.content, ['lxml', 'html.parser'])
-        show_id = None
+        show_index = TitleIndex()
+        first_years = {}
         for suggestion in soup.select('div.left li div a[href^="/tvshow-"]'):
             match = link_re.match(suggestion.text)
             if not match:
                 logger.error('Failed to match %s', suggestion.text)
                 continue
 
-            if match.group('series').lower() == series.lower():
-                if year is not None and int(match.group('first_year')) != year:
-                    logger.debug('Year does not match')
-                    continue
-                show_id = int(suggestion['href'][8:-5])
-                logger.debug('Found show id %d', show_id)
-                break
+            show_id = int(suggestion['href'][8:-5])
+            first_years[show_id] = int(match.group('first_year'))
+            if year is not None:
+                show_index.add('%s %s' % (match.group('series'), match.group('first_year')), show_id)
+            else:
+                show_index.add(match.group('series'), show_id)
+
+        # get the series out of the index
+        show_id = show_index.get('%s %d' % (series, year) if year is not None else series)
+        if show_id is not None and year is not None and first_years[show_id] != year:
+            # the fuzzy match may be on the year
+            logger.debug('Year does not match')
+            show_id = None
+        if show_id is not None:
+            logger.debug('Found show id %d', show_id)
 
         return show_id
 
@@ -130,7 +145,7 @@ class TVsubtitlesProvider(Provider):
         """
         # get the page of the season of the show
         logger.info('Getting the page of show id %d, season %d', show_id, season)
-        r = self.session.get(self.server_url + 'tvshow-%d-%d.html' % (show_id, season), timeout=10)
+        r = self.session.get(self.server_url + 'tvshow-%d-%d.html' % (show_id, season))
         soup = ParserBeautifulSoup(r.content, ['lxml', 'html.parser'])
 
         # loop over episode rows
@@ -162,7 +177,7 @@ class TVsubtitlesProvider(Provider):
 
         # get the episode page
         logger.info('Getting the page for episode %d', episode_ids[episode])
-        r = self.session.get(self.server_url + 'episode-%d.html' % episode_ids[episode], timeout=10)
+        r = self.session.get(self.server_url + 'episode-%d.html' % episode_ids[episode])
         soup = ParserBeautifulSoup(r.content, ['lxml', 'html.parser'])
 
         # loop over subtitles rows
@@ -182,6 +197,13 @@ class TVsubtitlesProvider(Provider):
 
         return subtitles
 
+    def warm_cache(self, video):
+        for title in [video.series] + video.alternative_series:
+            show_id = self.search_show_id(title, video.year)
+            if show_id is not None:
+                self.get_episode_ids(show_id, video.season)
+                break
+
     def list_subtitles(self, video, languages):
         # lookup show_id
         titles = [video.series] + video.alternative_series
@@ -205,7 +227,7 @@ class TVsubtitlesProvider(Provider):
     def download_subtitle(self, subtitle):
         # download as a zip
         logger.info('Downloading subtitle %r', subtitle)
-        r = self.session.get(self.server_url + 'download-%d.html' % subtitle.subtitle_id, timeout=10)
+        r = self.session.get(self.server_url + 'download-%d.html' % subtitle.subtitle_id)
         r.raise_for_status()
 
         # open the zip
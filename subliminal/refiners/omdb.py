@@ -2,10 +2,9 @@
 import logging
 import operator
 
-import requests
-
 from .. import __short_version__
 from ..cache import REFINER_EXPIRATION_TIME, region
+from ..transport import get_default_transport
 from ..video import Episode, Movie
 
 logger = logging.getLogger(__name__)
@@ -14,14 +13,33 @@ logger = logging.getLogger(__name__)
 class OMDBClient(object):
     base_url = 'http://www.omdbapi.com'
 
-    def __init__(self, version=1, session=None, headers=None, timeout=10):
+    def __init__(self, version=1, session=None, headers=None, timeout=None, transport=None):
+        #: Transport of the :attr:`session`
+        self.transport = transport or get_default_transport()
+
         #: Session for the requests
-        self.session = session or requests.Session()
-        self.session.timeout = timeout
+        self.session = session or self.transport.session()
+        if timeout is not None:
+            self.session.timeout = timeout
         self.session.headers.update(headers or {})
         self.session.params['r'] = 'json'
         self.session.params['v'] = version
 
+    def use_transport(self, transport):
+        """Send the requests with a new session of the `transport`, keeping the headers and the parameters of the
+        current session.
+
+        :param transport: the transport.
+        :type transport: :class:`~subliminal.transport.Transport`
+
+        """
+        if transport is self.transport:
+            return
+
+        session = transport.session(headers=self.session.headers)
+        session.params.update(self.session.params)
+        self.session, self.transport = session, transport
+
     def get(self, id=None, title=None, type=None, year=None, plot='short', tomatoes=False):
         # build the params
         params = {}
@@ -89,7 +107,7 @@ def search(title, type, year):
     return all_results
 
 
-def refine(video, apikey=None, **kwargs):
+def refine(video, apikey=None, transport=None, **kwargs):
     """Refine a video by searching `OMDb API <http://omdbapi.com/>`_.
 
     Several :class:`~subliminal.video.Episode` attributes can be found:
@@ -104,11 +122,18 @@ def refine(video, apikey=None, **kwargs):
       * :attr:`~subliminal.video.Movie.year`
       * :attr:`~subliminal.video.Video.imdb_id`
 
+    :param str apikey: API key of the OMDb API.
+    :param transport: transport of the requests of the :data:`omdb_client`, e.g. the one of a
+        :class:`~subliminal.core.ProviderPool`.
+    :type transport: :class:`~subliminal.transport.Transport`
+
     """
     if not apikey:
         logger.warning('No apikey. Skipping omdb refiner.')
         return
 
+    if transport is not None:
+        omdb_client.use_transport(transport)
     omdb_client.session.params['apikey'] = apikey
 
     if isinstance(video, Episode):
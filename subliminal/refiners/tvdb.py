@@ -10,6 +10,7 @@ import requests
 
 from .. import __short_version__
 from ..cache import REFINER_EXPIRATION_TIME, region
+from ..transport import get_default_transport
 from ..utils import sanitize
 from ..video import Episode
 
@@ -40,7 +41,11 @@ class TVDBClient(object):
     :param session: session object to use.
     :type session: :class:`requests.sessions.Session` or compatible.
     :param dict headers: additional headers.
-    :param int timeout: timeout for the requests.
+    :param int timeout: timeout for the requests, the one of the default transport if `None`.
+    :param session_store: store of the token, to resume it instead of logging in again.
+    :type session_store: :class:`~subliminal.cache.SessionStore`
+    :param transport: transport to create the session with, the default transport if `None`.
+    :type transport: :class:`~subliminal.transport.Transport`
 
     """
     #: Base URL of the API
@@ -53,7 +58,7 @@ class TVDBClient(object):
     refresh_token_every = timedelta(minutes=30)
 
     def __init__(self, apikey=None, username=None, password=None, language='en', session=None, headers=None,
-                 timeout=10):
+                 timeout=None, session_store=None, transport=None):
         #: API key
         self.apikey = apikey
 
@@ -66,13 +71,34 @@ class TVDBClient(object):
         #: Last token acquisition date
         self.token_date = datetime.utcnow() - self.token_lifespan
 
+        #: Store of the token
+        self.session_store = session_store
+
+        #: Transport of the :attr:`session`
+        self.transport = transport or get_default_transport()
+
         #: Session for the requests
-        self.session = session or requests.Session()
-        self.session.timeout = timeout
+        self.session = session or self.transport.session()
+        if timeout is not None:
+            self.session.timeout = timeout
         self.session.headers.update(headers or {})
         self.session.headers['Content-Type'] = 'application/json'
         self.session.headers['Accept-Language'] = language
 
+    def use_transport(self, transport):
+        """Send the requests with a new session of the `transport`, keeping the headers, and so the token, of the
+        current session.
+
+        :param transport: the transport.
+        :type transport: :class:`~subliminal.transport.Transport`
+
+        """
+        if transport is self.transport:
+            return
+
+        session = transport.session(headers=self.session.headers)
+        self.session, self.transport = session, transport
+
     @property
     def language(self):
         return self.session.headers['Accept-Language']
@@ -96,7 +122,10 @@ class TVDBClient(object):
         return datetime.utcnow() - self.token_date > self.refresh_token_every
 
     def login(self):
-        """Login"""
+        """Login, unless the token of the :attr:`session_store` can be resumed"""
+        if self.resume_token():
+            return
+
         # perform the request
         data = {'apikey': self.apikey, 'username': self.username, 'password': self.password}
         r = self.session.post(self.base_url + '/login', json=data)
@@ -107,6 +136,7 @@ class TVDBClient(object):
 
         # update token_date
         self.token_date = datetime.utcnow()
+        self.store_token()
 
     def refresh_token(self):
         """Refresh token"""
@@ -119,6 +149,40 @@ class TVDBClient(object):
 
         # update token_date
         self.token_date = datetime.utcnow()
+        self.store_token()
+
+    def resume_token(self):
+        """Resume the token of the :attr:`session_store`, if any and not expired, checking it with
+        :meth:`refresh_token`.
+
+        :return: `True` if the token has been resumed, `False` otherwise.
+        :rtype: bool
+
+        """
+        if self.session_store is None or self.token is not None:
+            return False
+
+        session, date = self.session_store.get('tvdb', self.username)
+        if session is None or datetime.utcnow() - datetime.utcfromtimestamp(date) > self.token_lifespan:
+            return False
+
+        self.session.headers['Authorization'] = 'Bearer ' + session['token']
+        try:
+            self.refresh_token()
+        except requests.HTTPError:
+            logger.info('Stored token expired')
+            del self.session.headers['Authorization']
+            self.session_store.delete('tvdb', self.username)
+            return False
+
+        logger.debug('Resumed token')
+
+        return True
+
+    def store_token(self):
+        """Store the token in the :attr:`session_store`, if any"""
+        if self.session_store is not None:
+            self.session_store.set('tvdb', self.username, {'token': self.token})
 
     @requires_auth
     def search_series(self, name=None, imdb_id=None, zap2it_id=None):
@@ -242,7 +306,7 @@ def get_series_episode(series_id, season, episode):
         return tvdb_client.get_episode(result['data'][0]['id'])
 
 
-def refine(video, **kwargs):
+def refine(video, session_store=None, transport=None, **kwargs):
     """Refine a video by searching `TheTVDB <http://thetvdb.com/>`_.
 
     .. note::
@@ -259,7 +323,18 @@ def refine(video, **kwargs):
       * :attr:`~subliminal.video.Video.imdb_id`
       * :attr:`~subliminal.video.Episode.tvdb_id`
 
+    :param session_store: store of the token of the :data:`tvdb_client`, to resume it instead of logging in again.
+    :type session_store: :class:`~subliminal.cache.SessionStore`
+    :param transport: transport of the requests of the :data:`tvdb_client`, e.g. the one of a
+        :class:`~subliminal.core.ProviderPool`.
+    :type transport: :class:`~subliminal.transport.Transport`
+
     """
+    if session_store is not None:
+        tvdb_client.session_store = session_store
+    if transport is not None:
+        tvdb_client.use_transport(transport)
+
     # only deal with Episode videos
     if not isinstance(video, Episode):
         logger.error('Cannot refine episodes')
@@ -30,7 +30,12 @@ Available matches:
 
 """
 from __future__ import division, print_function
+from collections import OrderedDict
+import io
 import logging
+import os
+import re
+import threading
 
 from .video import Episode, Movie
 
@@ -49,8 +54,176 @@ movie_scores = {'hash': 269, 'title': 135, 'year': 45, 'country': 45, 'release_g
 #: All scores names
 score_keys = set([s for s in episode_scores.keys()] + [s for s in movie_scores.keys()])
 
-#: Equivalent release groups
-equivalent_release_groups = ({'LOL', 'DIMENSION'}, {'ASAP', 'IMMERSE', 'FLEET'}, {'AVS', 'SVA'})
+#: Path to the default file of equivalent release groups
+RELEASE_GROUPS_FILE = os.path.join(os.path.dirname(__file__), 'data', 'release_groups.txt')
+
+
+def normalize_release_group(release_group):
+    """Normalize a `release_group` into a key of the :class:`ReleaseGroupIndex`.
+
+    :param str release_group: the release group to normalize.
+    :return: the normalized release group.
+    :rtype: str
+
+    """
+    return re.sub(r'[\W_]+', '', release_group).upper()
+
+
+class ReleaseGroupIndex(object):
+    """Index of equivalent release groups.
+
+    Equivalences are stored in a union-find structure over the normalized release groups so that getting the
+    canonical release group of any release group is a dict lookup. The canonical release groups found in a release
+    string are computed once and cached, for the `max_ids` most recently used release strings, see
+    :meth:`canonical_ids`.
+
+    :param groups: groups of equivalent release groups.
+    :type groups: iterable of iterable of str
+    :param int max_ids: maximum number of release strings whose canonical release groups are cached.
+
+    """
+    def __init__(self, groups=None, max_ids=4096):
+        #: Parent of each normalized release group
+        self.parents = {}
+
+        #: Release groups by canonical release group
+        self.members = {}
+
+        #: Cached canonical release groups by release string, least recently used first
+        self.ids = OrderedDict()
+        self.ids_lock = threading.Lock()
+
+        #: Maximum number of release strings whose canonical release groups are cached
+        self.max_ids = max_ids
+
+        for group in groups or []:
+            self.add(group)
+
+    def _find(self, key):
+        root = key
+        while self.parents[root] != root:
+            root = self.parents[root]
+
+        # compress the path
+        while self.parents[key] != root:
+            self.parents[key], key = root, self.parents[key]
+
+        return root
+
+    def add(self, group):
+        """Add a group of equivalent release groups, merging it with the groups it shares a release group with.
+
+        :param group: the equivalent release groups.
+        :type group: iterable of str
+
+        """
+        with self.ids_lock:
+            self.ids.clear()
+        root = None
+        for release_group in group:
+            key = normalize_release_group(release_group)
+            if not key:
+                continue
+
+            if key not in self.parents:
+                self.parents[key] = key
+                self.members[key] = {release_group.upper()}
+            else:
+                self.members[self._find(key)].add(release_group.upper())
+
+            if root is None:
+                root = self._find(key)
+                continue
+
+            other = self._find(key)
+            if other != root:
+                # merge the smaller group into the bigger one
+                if len(self.members[other]) > len(self.members[root]):
+                    root, other = other, root
+                self.parents[other] = root
+                self.members[root] |= self.members.pop(other)
+
+    def load(self, path):
+        """Load groups of equivalent release groups from a file.
+
+        The file has one group per line, release groups being separated by whitespace. Empty lines and lines starting
+        with ``#`` are ignored.
+
+        :param str path: path to the file.
+
+        """
+        with io.open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    self.add(line.split())
+
+    def canonical(self, release_group):
+        """Get the canonical release group of the given `release_group`.
+
+        :param str release_group: the release group.
+        :return: the canonical release group, the normalized `release_group` if it has no equivalent.
+        :rtype: str
+
+        """
+        key = normalize_release_group(release_group)
+        if key not in self.parents:
+            return key
+
+        return self._find(key)
+
+    def canonical_ids(self, release):
+        """Get the canonical release groups found in the given `release`.
+
+        The `release` may contain other information, e.g. ``HDTV.x264-LOL`` or ``LOL-DIMENSION``, or have the release
+        group glued to it, e.g. ``720PDIMENSION``, so the whole `release`, each of its tokens and each suffix of its
+        tokens are canonicalized. The result is cached by `release`.
+
+        :param str release: the release.
+        :return: the canonical release groups.
+        :rtype: frozenset
+
+        """
+        with self.ids_lock:
+            ids = self.ids.pop(release, None)
+            if ids is not None:
+                # mark as most recently used
+                self.ids[release] = ids
+                return ids
+
+        tokens = [normalize_release_group(t) for t in re.split(r'[\W_]+', release)]
+        keys = {normalize_release_group(release)} | {t[i:] for t in tokens for i in range(len(t))}
+        ids = frozenset(self._find(k) if k in self.parents else k for k in keys if k)
+
+        with self.ids_lock:
+            self.ids[release] = ids
+            while len(self.ids) > self.max_ids:
+                self.ids.popitem(last=False)
+
+        return ids
+
+    def equivalents(self, release_group):
+        """Get all the equivalents of the given `release_group`.
+
+        :param str release_group: the release group.
+        :return: the equivalent release groups.
+        :rtype: set
+
+        """
+        key = normalize_release_group(release_group)
+        if key not in self.parents:
+            return {release_group}
+
+        return set(self.members[self._find(key)])
+
+
+#: Index of the equivalent release groups
+release_group_index = ReleaseGroupIndex()
+release_group_index.load(RELEASE_GROUPS_FILE)
+
+#: Equivalent release groups of the :data:`release_group_index`, kept for compatibility
+equivalent_release_groups = tuple(set(members) for members in release_group_index.members.values()
+                                  if len(members) > 1)
 
 
 def get_equivalent_release_groups(release_group):
@@ -61,11 +234,7 @@ def get_equivalent_release_groups(release_group):
     :rtype: set
 
     """
-    for equivalent_release_group in equivalent_release_groups:
-        if release_group in equivalent_release_group:
-            return equivalent_release_group
-
-    return {release_group}
+    return release_group_index.equivalents(release_group)
 
 
 def get_scores(video):
@@ -154,6 +323,53 @@ def compute_score(subtitle, video, hearing_impaired=None):
     return score
 
 
+def compute_max_score(subtitle, video, hearing_impaired=None):
+    """Compute the maximum score :func:`compute_score` can give to the `subtitle` against the `video`.
+
+    It uses the :meth:`Subtitle.upper_bound_matches <subliminal.subtitle.Subtitle.upper_bound_matches>` method which,
+    unlike :meth:`~subliminal.subtitle.Subtitle.get_matches`, is cheap to compute.
+
+    :param subtitle: the subtitle to compute the maximum score of.
+    :type subtitle: :class:`~subliminal.subtitle.Subtitle`
+    :param video: the video to compute the maximum score against.
+    :type video: :class:`~subliminal.video.Video`
+    :param bool hearing_impaired: hearing impaired preference.
+    :return: maximum score of the subtitle.
+    :rtype: int
+
+    """
+    # get the scores dict
+    scores = get_scores(video)
+
+    # get the possible matches
+    matches = subtitle.upper_bound_matches(video)
+    if matches is None or 'hash' in matches:
+        # the hash score is worth all the other matches
+        matches = {'hash'}
+
+    # handle equivalent matches
+    if isinstance(video, Episode):
+        if 'title' in matches:
+            matches.add('episode')
+        if 'series_imdb_id' in matches:
+            matches |= {'series', 'year', 'country'}
+        if 'imdb_id' in matches:
+            matches |= {'series', 'year', 'country', 'season', 'episode'}
+        if 'tvdb_id' in matches:
+            matches |= {'series', 'year', 'country', 'season', 'episode'}
+        if 'series_tvdb_id' in matches:
+            matches |= {'series', 'year', 'country'}
+    elif isinstance(video, Movie):
+        if 'imdb_id' in matches:
+            matches |= {'title', 'year', 'country'}
+
+    # handle hearing impaired
+    if hearing_impaired is not None and subtitle.hearing_impaired == hearing_impaired:
+        matches.add('hearing_impaired')
+
+    return sum((scores.get(match, 0) for match in matches))
+
+
 def solve_episode_equations():
     from sympy import Eq, solve, symbols
 
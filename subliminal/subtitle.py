@@ -179,6 +179,20 @@ class Subtitle(object):
         """
         raise NotImplementedError
 
+    def upper_bound_matches(self, video):
+        """Get the matches that :meth:`get_matches` can possibly find against the `video`.
+
+        Unlike :meth:`get_matches`, this must be cheap: it relies on the structured fields of the subtitle only and
+        never on guessit. It is used to discard subtitles that cannot reach a score before computing their matches.
+
+        :param video: the video to get the possible matches with.
+        :type video: :class:`~subliminal.video.Video`
+        :return: possible matches of the subtitle, `None` if unknown.
+        :rtype: set
+
+        """
+        return None
+
     def __hash__(self):
         return hash(self.provider_name + '-' + self.id)
 
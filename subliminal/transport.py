@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+import ssl
+import threading
+import zlib
+
+from requests import ConnectionError, Session
+from requests.adapters import HTTPAdapter
+from requests.utils import DEFAULT_CA_BUNDLE_PATH
+from six import string_types
+from six.moves import xmlrpc_client
+from urllib3.exceptions import ProtocolError
+
+logger = logging.getLogger(__name__)
+
+#: Default timeout of the requests in seconds
+DEFAULT_TIMEOUT = 10
+
+#: Default number of hosts to keep connection pools for
+DEFAULT_POOL_CONNECTIONS = 10
+
+#: Default maximum number of connections kept alive per host
+DEFAULT_POOL_MAXSIZE = 10
+
+
+class Transport(object):
+    """Base class for transports, the HTTP layer shared by providers and refiners.
+
+    A transport holds the connection pools and the settings of the requests: the sessions and handles it creates reuse
+    the same connections, per host, and the same timeout.
+
+    :param float timeout: timeout of the requests in seconds.
+    :param int pool_connections: number of hosts to keep connection pools for.
+    :param int pool_maxsize: maximum number of connections kept alive per host.
+    :param int max_retries: maximum number of retries of failed connections.
+
+    """
+    #: Name of the backend
+    backend = None
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, max_retries=0):
+        #: Timeout of the requests in seconds
+        self.timeout = timeout
+
+        #: Number of hosts to keep connection pools for
+        self.pool_connections = pool_connections
+
+        #: Maximum number of connections kept alive per host
+        self.pool_maxsize = pool_maxsize
+
+        #: Maximum number of retries of failed connections
+        self.max_retries = max_retries
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the connections of the transport."""
+        pass
+
+
+class ResumingSSLSocket(ssl.SSLSocket):
+    """``ssl.SSLSocket`` giving its TLS session back to its :class:`ResumingSSLContext` when closed."""
+    def close(self):
+        self.context.save_session(self)
+        super(ResumingSSLSocket, self).close()
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """``ssl.SSLContext`` resuming the TLS sessions of the previous connections to the same host.
+
+    The session of each connection is saved after the handshake and when the connection is closed, once the TLS 1.3
+    session tickets are received, and given to the next connection to the same host. Resumed connections skip the
+    certificate exchange and verification of a full handshake. A session is only resumed with the context it was
+    created with.
+
+    """
+    sslsocket_class = ResumingSSLSocket
+
+    def __init__(self, *args, **kwargs):
+        #: Last TLS session per host
+        self.sessions = {}
+        self.sessions_lock = threading.Lock()
+
+    def wrap_socket(self, sock, server_side=False, do_handshake_on_connect=True, suppress_ragged_eofs=True,
+                    server_hostname=None, session=None):
+        if session is None and not server_side and server_hostname is not None:
+            with self.sessions_lock:
+                session = self.sessions.get(server_hostname)
+
+        try:
+            sslsock = super(ResumingSSLContext, self).wrap_socket(sock, server_side, do_handshake_on_connect,
+                                                                  suppress_ragged_eofs, server_hostname, session)
+        except ssl.SSLError:
+            # forget a session the server may have rejected
+            if session is not None:
+                with self.sessions_lock:
+                    self.sessions.pop(server_hostname, None)
+            raise
+
+        if session is not None and sslsock.session_reused:
+            logger.debug('Resumed TLS session with %s', server_hostname)
+        self.save_session(sslsock)
+
+        return sslsock
+
+    def save_session(self, sslsock):
+        """Save the TLS session of a connection to resume it in the next connection to the same host.
+
+        :param sslsock: the connection.
+        :type sslsock: :class:`ResumingSSLSocket`
+
+        """
+        if sslsock.server_side or sslsock.server_hostname is None:
+            return
+
+        try:
+            session = sslsock.session
+        except (ValueError, OSError):
+            return
+        if session is not None:
+            with self.sessions_lock:
+                self.sessions[sslsock.server_hostname] = session
+
+
+def create_ssl_context(security_level=None, verify=True):
+    """Create an SSL context of the `security_level` verifying the certificates like `verify`.
+
+    The CA certificates are loaded once in the context, instead of on each connection.
+
+    :param int security_level: OpenSSL security level of the ciphers, the default one if `None`.
+    :param verify: whether to verify the certificates, with the certifi CA bundle, or the path to a CA bundle.
+    :type verify: bool or str
+    :return: the SSL context.
+    :rtype: :class:`ResumingSSLContext`
+
+    """
+    logger.debug('Creating SSL context of security level %r verifying %r', security_level, verify)
+    context = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    if verify is False:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    else:
+        ca_bundle = DEFAULT_CA_BUNDLE_PATH if verify is True else verify
+        if os.path.isdir(ca_bundle):
+            context.load_verify_locations(capath=ca_bundle)
+        else:
+            context.load_verify_locations(cafile=ca_bundle)
+    if security_level is not None:
+        context.set_ciphers('DEFAULT@SECLEVEL=%d' % security_level)
+
+    return context
+
+
+class TLSAdapter(HTTPAdapter):
+    """:class:`~requests.adapters.HTTPAdapter` with its own SSL contexts of a security level, see
+    :func:`create_ssl_context`.
+
+    The connections of the adapter share the SSL context of their `verify` value, and with it its TLS sessions, see
+    :class:`ResumingSSLContext`.
+
+    :param int security_level: OpenSSL security level of the ciphers, the default one if `None`.
+    :param \*\*kwargs: additional parameters for the :class:`~requests.adapters.HTTPAdapter` constructor.
+
+    """
+    __attrs__ = HTTPAdapter.__attrs__ + ['security_level']
+
+    def __init__(self, security_level=None, **kwargs):
+        #: OpenSSL security level of the ciphers
+        self.security_level = security_level
+
+        #: SSL context per `verify` value
+        self.ssl_contexts = {}
+        self.ssl_contexts_lock = threading.Lock()
+
+        super(TLSAdapter, self).__init__(**kwargs)
+
+    def __setstate__(self, state):
+        self.ssl_contexts = {}
+        self.ssl_contexts_lock = threading.Lock()
+
+        super(TLSAdapter, self).__setstate__(state)
+
+    def get_ssl_context(self, verify=True):
+        """Get the SSL context of the adapter verifying the certificates like `verify`.
+
+        :param verify: whether to verify the certificates, with the certifi CA bundle, or the path to a CA bundle.
+        :type verify: bool or str
+        :return: the SSL context.
+        :rtype: :class:`ResumingSSLContext`
+
+        """
+        if not isinstance(verify, string_types):
+            verify = bool(verify)
+
+        with self.ssl_contexts_lock:
+            if verify not in self.ssl_contexts:
+                self.ssl_contexts[verify] = create_ssl_context(self.security_level, verify)
+
+            return self.ssl_contexts[verify]
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        pool_kwargs['ssl_context'] = self.get_ssl_context()
+
+        super(TLSAdapter, self).init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super(TLSAdapter, self).build_connection_pool_key_attributes(request, verify, cert)
+        pool_kwargs['ssl_context'] = self.get_ssl_context(verify)
+
+        # the CA certificates are already loaded in the context
+        pool_kwargs.pop('ca_certs', None)
+        pool_kwargs.pop('ca_cert_dir', None)
+
+        return host_params, pool_kwargs
+
+    def cert_verify(self, conn, url, verify, cert):
+        super(TLSAdapter, self).cert_verify(conn, url, verify, cert)
+
+        # the CA certificates are already loaded in the context, urllib3 would load them again on each connection
+        conn.ca_certs = None
+        conn.ca_cert_dir = None
+
+
+class TransportSession(Session):
+    """A :class:`requests.Session` using the connection pools of a :class:`RequestsTransport`.
+
+    Requests use the :attr:`timeout` of the session, the one of the transport by default, unless one is given.
+    Closing the session leaves the connection pools open for the other sessions of the transport.
+
+    :param transport: the transport.
+    :type transport: :class:`RequestsTransport`
+
+    """
+    def __init__(self, transport):
+        super(TransportSession, self).__init__()
+
+        #: Transport of the session
+        self.transport = transport
+
+        #: Timeout of the requests in seconds
+        self.timeout = transport.timeout
+
+        self.mount('https://', transport.adapter)
+        self.mount('http://', transport.adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+
+        return super(TransportSession, self).request(method, url, **kwargs)
+
+    def close(self):
+        # the adapter of the transport is shared with its other sessions
+        for adapter in self.adapters.values():
+            if adapter is not self.transport.adapter:
+                adapter.close()
+
+
+class RequestsTransport(Transport):
+    """Transport creating :class:`requests.Session` that share the connection pools of a single
+    :class:`~requests.adapters.HTTPAdapter`.
+
+    Sessions keep their own headers and cookies.
+
+    """
+    backend = 'requests'
+
+    def __init__(self, *args, **kwargs):
+        super(RequestsTransport, self).__init__(*args, **kwargs)
+
+        #: Adapter holding the connection pools
+        self.adapter = TLSAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize,
+                                  max_retries=self.max_retries)
+
+    def session(self, headers=None):
+        """Create a session using the connection pools of the transport.
+
+        :param dict headers: headers of the session.
+        :return: the session.
+        :rtype: :class:`TransportSession`
+
+        """
+        session = TransportSession(self)
+        session.headers.update(headers or {})
+
+        return session
+
+    def close(self):
+        self.adapter.close()
+
+
+class XMLRPCTransport(xmlrpc_client.Transport):
+    """``xmlrpc.client.Transport`` sending the calls with a :class:`TransportSession`.
+
+    Calls reuse the keep-alive connections of the session, from any thread, and ask for gzip-compressed responses. A
+    call failing on a connection the server closed in the meantime is sent again on a new connection.
+
+    :param session: the session.
+    :type session: :class:`TransportSession`
+    :param str scheme: scheme of the server, 'https' or 'http'.
+
+    """
+    def __init__(self, session, scheme='https'):
+        xmlrpc_client.Transport.__init__(self)
+
+        #: Session sending the calls
+        self.session = session
+
+        #: Scheme of the server
+        self.scheme = scheme
+
+    def request(self, host, handler, request_body, verbose=False):
+        url = '%s://%s%s' % (self.scheme, host, handler)
+        headers = {'User-Agent': self.user_agent, 'Content-Type': 'text/xml', 'Accept-Encoding': 'gzip'}
+        for attempt in (0, 1):
+            try:
+                response = self.session.post(url, data=request_body, headers=headers, stream=True)
+                break
+            except ConnectionError as e:
+                # a stale keep-alive connection is only noticed when reused, unlike a failure to connect
+                if attempt or not isinstance(e.args[0], ProtocolError):
+                    raise
+                logger.debug('Connection to %s was closed, sending the call again', host)
+
+        if response.status_code != 200:
+            response.close()
+            raise xmlrpc_client.ProtocolError(host + handler, response.status_code, response.reason,
+                                              dict(response.headers))
+
+        # read the whole body, which releases the connection to the pool, and decompress it like xmlrpc.client does
+        body = response.raw.read(decode_content=False)
+        if response.headers.get('Content-Encoding') == 'gzip':
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+
+        self.verbose = verbose
+        parser, unmarshaller = self.getparser()
+        parser.feed(body)
+        parser.close()
+
+        return unmarshaller.close()
+
+    def close(self):
+        self.session.close()
+
+
+def create_transport(backend, **kwargs):
+    """Create a transport of the given `backend`.
+
+    :param str backend: name of the backend, 'requests' or 'curl'.
+    :param \*\*kwargs: additional parameters for the :class:`Transport` constructor.
+    :return: the transport.
+    :rtype: :class:`Transport`
+
+    """
+    if backend == 'requests':
+        return RequestsTransport(**kwargs)
+    if backend == 'curl':
+        # libcurl is only loaded when needed
+        from .curl import CurlTransport
+        return CurlTransport(**kwargs)
+
+    raise ValueError('Unknown transport backend %r' % backend)
+
+
+_default_transports = {}
+_default_transports_lock = threading.Lock()
+
+
+def get_default_transport(backend='requests'):
+    """Get the default transport of the `backend`, shared by the providers and refiners that are not given one.
+
+    :param str backend: name of the backend, 'requests' or 'curl'.
+    :return: the default transport.
+    :rtype: :class:`Transport`
+
+    """
+    with _default_transports_lock:
+        if backend not in _default_transports:
+            logger.debug('Creating default %s transport', backend)
+            _default_transports[backend] = create_transport(backend)
+
+        return _default_transports[backend]
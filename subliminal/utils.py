@@ -185,6 +185,146 @@ def matches_title(actual, title, alternative_titles):
     return actual.startswith(title) and actual[len(title):].strip() in alternative_titles
 
 
+class TitleIndex(object):
+    """Index of titles for fast lookups that are tolerant to punctuation, word order and small differences.
+
+    Titles are looked up, in order, by their sanitized form, by their sorted words and by the similarity of their
+    trigrams.
+
+    :param dict titles: values per title.
+    :param float threshold: minimum similarity of trigrams for a fuzzy match, between 0 and 1.
+
+    """
+    def __init__(self, titles=None, threshold=0.85):
+        #: Minimum similarity of trigrams for a fuzzy match
+        self.threshold = threshold
+
+        #: Values per sanitized title
+        self.titles = {}
+
+        #: Sanitized title per sanitized title with sorted words
+        self.sorted_titles = {}
+
+        #: Sanitized titles per trigram
+        self.trigrams = {}
+
+        #: Number of trigrams per sanitized title
+        self.trigram_counts = {}
+
+        for title, value in (titles or {}).items():
+            self.add(title, value)
+
+    def __len__(self):
+        return len(self.titles)
+
+    @staticmethod
+    def normalize(title):
+        """Normalize a `title` for the index.
+
+        :param str title: the title to normalize.
+        :return: the normalized title.
+        :rtype: str
+
+        """
+        title = re.sub(r'[^\w ]+', '', sanitize(title).replace('&', 'and'))
+
+        # join acronyms, e.g. 's h i e l d'
+        return re.sub(r'\b(\w) (?=\w\b)', r'\1', title)
+
+    @staticmethod
+    def get_trigrams(title):
+        """Get the trigrams of a normalized `title`.
+
+        :param str title: the normalized title.
+        :return: the trigrams.
+        :rtype: set
+
+        """
+        padded = '  %s ' % title
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def add(self, title, value):
+        """Add a `title` with its `value`, the first value of a title is kept.
+
+        :param str title: the title.
+        :param value: the value.
+
+        """
+        title = self.normalize(title)
+        if not title or title in self.titles:
+            return
+
+        self.titles[title] = value
+        self.sorted_titles.setdefault(' '.join(sorted(title.split())), title)
+        trigrams = self.get_trigrams(title)
+        self.trigram_counts[title] = len(trigrams)
+        for trigram in trigrams:
+            self.trigrams.setdefault(trigram, set()).add(title)
+
+    def match(self, title, fuzzy=True):
+        """Get the best matching title of the index.
+
+        :param str title: the title to look up.
+        :param bool fuzzy: whether to fall back on the similarity of trigrams.
+        :return: the sanitized title of the index, if found.
+        :rtype: str
+
+        """
+        title = self.normalize(title)
+        if not title:
+            return None
+
+        # exact match
+        if title in self.titles:
+            return title
+
+        # match regardless of the word order
+        sorted_title = ' '.join(sorted(title.split()))
+        if sorted_title in self.sorted_titles:
+            return self.sorted_titles[sorted_title]
+
+        if not fuzzy:
+            return None
+
+        # count the shared trigrams of the candidates
+        trigrams = self.get_trigrams(title)
+        counts = {}
+        for trigram in trigrams:
+            for candidate in self.trigrams.get(trigram, ()):
+                counts[candidate] = counts.get(candidate, 0) + 1
+
+        # keep the most similar candidates with the dice coefficient
+        best_similarity, best_candidates = 0, {}
+        for candidate, count in counts.items():
+            similarity = 2.0 * count / (len(trigrams) + self.trigram_counts[candidate])
+            if similarity > best_similarity:
+                best_similarity, best_candidates = similarity, {self.titles[candidate]: candidate}
+            elif similarity == best_similarity:
+                best_candidates.setdefault(self.titles[candidate], candidate)
+
+        if best_similarity < self.threshold:
+            return None
+        if len(best_candidates) > 1:
+            logger.debug('Ambiguous title %r', title)
+            return None
+
+        return best_candidates.popitem()[1]
+
+    def get(self, title, fuzzy=True):
+        """Get the value of the best matching title.
+
+        :param str title: the title to look up.
+        :param bool fuzzy: whether to fall back on the similarity of trigrams.
+        :return: the value, if found.
+
+        """
+        title = self.match(title, fuzzy=fuzzy)
+        if title is None:
+            return None
+
+        return self.titles[title]
+
+
 def handle_exception(e, msg):
     """Handle exception, logging the proper error message followed by `msg`.
 
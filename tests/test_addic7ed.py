@@ -216,6 +216,29 @@ def test_get_show_ids_year():
     assert show_ids['dallas 2012'] == 2559
 
 
+def test_get_show_index_refresh(monkeypatch):
+    provider = Addic7edProvider()
+    show_ids = {'dallas': 802}
+    monkeypatch.setattr(provider, '_get_show_ids', lambda: show_ids)
+    show_index = provider.get_show_index()
+    assert show_index.get('Dallas') == 802
+    assert provider.get_show_index() is show_index
+    monkeypatch.setattr(provider, '_get_show_ids', lambda: {'dallas': 803})
+    assert provider.get_show_index().get('Dallas') == 803
+
+
+def test_get_show_id_fuzzy_other_country_or_year(monkeypatch):
+    provider = Addic7edProvider()
+    show_ids = {'the office uk': 1, 'marvels agents of shield 2013': 4010}
+    monkeypatch.setattr(provider, '_get_show_ids', lambda: show_ids)
+    monkeypatch.setattr(provider, '_search_show_id', lambda series: None)
+    assert provider.get_show_id('The Office', country_code='US') is None
+    assert provider.get_show_id('The Office', country_code='UK') == 1
+    assert provider.get_show_id('The Office') == 1
+    assert provider.get_show_id('Marvel\'s Agents of S.H.I.E.L.D.', year=2012) is None
+    assert provider.get_show_id('Marvel\'s Agents of S.H.I.E.L.D.', year=2013) == 4010
+
+
 @pytest.mark.integration
 @vcr.use_cassette('test_get_show_ids')
 def test_get_show_ids_dot():
@@ -1,8 +1,17 @@
 # coding=utf-8
+import dbm
+import os
+import sqlite3
+import stat
+import sys
+import threading
+import time
 
 import pytest
 import six
 from dogpile.cache import make_region
+from dogpile.cache.api import NO_VALUE, CachedValue
+from six.moves import cPickle as pickle
 
 try:
     from unittest.mock import Mock
@@ -10,7 +19,8 @@ except ImportError:
     from mock import Mock
 
 # A Mock version is already provided in conftest.py so no need to configure it again
-from subliminal.cache import region as region_custom
+from subliminal.cache import (MemoryCacheProxy, Serializer, SessionStore, SQLiteBackend, SubliminalCacheRegion,
+                              SubtitleContentCache, compact_dbm, region as region_custom)
 
 # Configure default dogpile cache
 region_dogpile = make_region()
@@ -27,6 +37,11 @@ def fn():
     pass
 
 
+class Value(object):
+    def __init__(self, value):
+        self.value = value
+
+
 def test_dogpile_cache_key_generator_unicode_string():
     if six.PY2:
         with pytest.raises(UnicodeEncodeError):
@@ -64,3 +79,376 @@ def test_custom_cache_key_generator_byte_string():
         assert isinstance(key, six.binary_type)  # In Python 2, the native string type is bytes
     else:
         assert isinstance(key, six.text_type)  # In Python 3, the native string type is unicode
+
+
+def test_sqlite_backend_get_set_delete(tmpdir):
+    backend = SQLiteBackend({'filename': str(tmpdir.join('cache.sqlite'))})
+    assert backend.get('key') is NO_VALUE
+    backend.set('key', {'value': unicode_string})
+    assert backend.get('key') == {'value': unicode_string}
+    backend.set_multi({'key': 1, 'other': 2})
+    assert backend.get_multi(['key', 'other', 'missing']) == [1, 2, NO_VALUE]
+    backend.delete('key')
+    assert backend.get('key') is NO_VALUE
+
+
+def test_sqlite_backend_shared(tmpdir):
+    backend = SQLiteBackend({'filename': str(tmpdir.join('cache.sqlite'))})
+    other_backend = SQLiteBackend({'filename': str(tmpdir.join('cache.sqlite'))})
+    backend.set('key', 'value')
+    assert other_backend.get('key') == 'value'
+
+
+def test_sqlite_backend_expiration(tmpdir):
+    backend = SQLiteBackend({'filename': str(tmpdir.join('cache.sqlite')), 'expiration_time': 0.1})
+    backend.set('key', 'value')
+    assert backend.get('key') == 'value'
+    time.sleep(0.2)
+    assert backend.get('key') is NO_VALUE
+    assert backend.purge_expired() == 1
+
+
+def test_sqlite_backend_close(tmpdir):
+    backend = SQLiteBackend({'filename': str(tmpdir.join('cache.sqlite'))})
+    backend.set('key', 'value')
+    thread = threading.Thread(target=backend.get, args=('key',))
+    thread.start()
+    thread.join()
+    connections = [connection for _, connection in backend._connections]
+    assert len(connections) == 2
+    backend.close()
+    for connection in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            connection.execute('SELECT 1')
+    assert backend.get('key') == 'value'
+
+
+def test_sqlite_backend_lock(tmpdir):
+    backend = SQLiteBackend({'filename': str(tmpdir.join('cache.sqlite'))})
+    other_backend = SQLiteBackend({'filename': str(tmpdir.join('cache.sqlite'))})
+    lock = backend.get_mutex('key')
+    assert lock.acquire(wait=False)
+    assert other_backend.get_mutex('key').locked()
+    assert not other_backend.get_mutex('key').acquire(wait=False)
+    lock.release()
+    assert other_backend.get_mutex('key').acquire(wait=False)
+
+
+def test_sqlite_backend_stale_lock(tmpdir):
+    backend = SQLiteBackend({'filename': str(tmpdir.join('cache.sqlite')), 'lock_timeout': 0.1})
+    assert backend.get_mutex('key').acquire(wait=False)
+    time.sleep(0.2)
+    assert backend.get_mutex('key').acquire(wait=False)
+
+
+def test_sqlite_backend_region(tmpdir):
+    region = make_region()
+    region.configure('subliminal.sqlite', arguments={'filename': str(tmpdir.join('cache.sqlite'))})
+    creator = Mock(return_value='value')
+    assert region.get_or_create('key', creator) == 'value'
+    assert region.get_or_create('key', creator) == 'value'
+    assert creator.call_count == 1
+
+
+def test_memory_cache_proxy(tmpdir):
+    backend = SQLiteBackend({'filename': str(tmpdir.join('cache.sqlite'))})
+    backend.get = Mock(wraps=backend.get)
+    proxy = MemoryCacheProxy().wrap(backend)
+    proxy.set('key', {'value': 1})
+    assert proxy.get('key') is proxy.get('key')
+    assert backend.get.call_count == 0
+    proxy.clear_memory()
+    assert proxy.get_multi(['key', 'missing']) == [{'value': 1}, NO_VALUE]
+    assert proxy.get('key') == {'value': 1}
+    assert backend.get.call_count == 2
+    proxy.delete('key')
+    assert proxy.get('key') is NO_VALUE
+
+
+def test_memory_cache_proxy_serialized(tmpdir):
+    backend = SQLiteBackend({'filename': str(tmpdir.join('cache.sqlite'))})
+    backend.get_serialized = Mock(return_value=b'serialized')
+    proxy = MemoryCacheProxy().wrap(backend)
+    proxy.set('key', {'value': 1})
+    assert proxy.get_serialized('key') == b'serialized'
+    assert proxy.get_serialized('key') == b'serialized'
+    assert backend.get_serialized.call_count == 1
+    assert proxy.get('key') == {'value': 1}
+    proxy.set_serialized('key', b'other')
+    assert proxy.get_serialized('key') == b'other'
+    assert proxy.get('key') == b'other'
+
+
+def test_memory_cache_proxy_max_size(tmpdir):
+    proxy = MemoryCacheProxy(max_size=2).wrap(SQLiteBackend({'filename': str(tmpdir.join('cache.sqlite'))}))
+    proxy.set_multi({'a': 1, 'b': 2})
+    proxy.get('a')
+    proxy.set('c', 3)
+    assert list(proxy.values) == ['a', 'c']
+
+
+def test_memory_cache_proxy_expiration(tmpdir):
+    backend = SQLiteBackend({'filename': str(tmpdir.join('cache.sqlite'))})
+    proxy = MemoryCacheProxy(expiration_time=0.1).wrap(backend)
+    proxy.set('key', 'value')
+    backend.set('key', 'other value')
+    assert proxy.get('key') == 'value'
+    time.sleep(0.2)
+    assert proxy.get('key') == 'other value'
+
+
+def test_sqlite_backend_evict(tmpdir):
+    backend = SQLiteBackend({'filename': str(tmpdir.join('cache.sqlite')), 'access_resolution': 0})
+    backend.set_multi({'a': b'a' * 1000, 'b': b'b' * 1000, 'c': b'c' * 1000})
+    time.sleep(0.01)
+    backend.get('a')
+    size = backend.get_size()
+    assert backend.evict(size - 1) == 1
+    assert backend.get('b') is NO_VALUE
+    assert backend.get_multi(['a', 'c']) == [b'a' * 1000, b'c' * 1000]
+
+
+def test_sqlite_backend_max_size(tmpdir):
+    backend = SQLiteBackend({'filename': str(tmpdir.join('cache.sqlite'))})
+    backend.set_multi({str(i): b'0' * 1000 for i in range(10)})
+    backend = SQLiteBackend({'filename': str(tmpdir.join('cache.sqlite')), 'max_size': 5000})
+    assert backend.get_size() <= 5000
+
+
+def test_sqlite_backend_compact(tmpdir):
+    backend = SQLiteBackend({'filename': str(tmpdir.join('cache.sqlite'))})
+    backend.set_multi({str(i): b'0' * 10000 for i in range(100)})
+    backend.delete_multi([str(i) for i in range(90)])
+    backend.compact()
+    assert len(tmpdir.join('cache.sqlite').read_binary()) < 500000
+    assert backend.get('95') == b'0' * 10000
+
+
+def test_compact_dbm(tmpdir):
+    filename = str(tmpdir.join('cache.dbm'))
+    with dbm.open(filename, 'c') as db:
+        db['key'] = 'value'
+    compact_dbm(filename)
+    with dbm.open(filename, 'r') as db:
+        assert db['key'] == b'value'
+    assert not tmpdir.listdir(lambda p: 'compact' in p.basename)
+
+
+def test_region_stats(tmpdir):
+    region = SubliminalCacheRegion()
+    region.configure('subliminal.sqlite', arguments={'filename': str(tmpdir.join('cache.sqlite'))})
+    creator = Mock(return_value='value')
+    region.get_or_create('namespace|key', creator)
+    region.get_or_create('namespace|key', creator)
+    time.sleep(0.01)
+    region.get_or_create('namespace|key', creator, expiration_time=0.001)
+    region.get_or_create('namespace|other key', creator)
+    region.flush_stats()
+    assert region.stats == {}
+
+    stats = region.get_stats()
+    assert set(stats) == {'namespace'}
+    assert stats['namespace']['hits'] == 1
+    assert stats['namespace']['misses'] == 2
+    assert stats['namespace']['expirations'] == 1
+    assert stats['namespace']['size'] > 0
+
+    other_region = SubliminalCacheRegion()
+    other_region.configure('subliminal.sqlite', arguments={'filename': str(tmpdir.join('cache.sqlite'))})
+    other_region.get_or_create('namespace|key', creator)
+    assert other_region.get_stats()['namespace']['hits'] == 2
+
+
+def test_region_stats_nested(tmpdir):
+    region = SubliminalCacheRegion()
+    region.configure('subliminal.sqlite', arguments={'filename': str(tmpdir.join('cache.sqlite'))})
+    region.get = Mock(wraps=region.get)
+    region.get_or_create('namespace|key', lambda: region.get_or_create('other|key', Mock(return_value='value')))
+    time.sleep(0.01)
+    region.get_or_create('namespace|key', lambda: region.get_or_create('other|key', Mock(return_value='value')),
+                         expiration_time=0.001)
+    assert not region.get.called
+    assert region.stats['namespace']['misses'] == 1
+    assert region.stats['namespace']['expirations'] == 1
+    assert region.stats['other']['misses'] == 1
+    assert region.stats['other']['hits'] == 1
+
+
+def test_region_negative_expiration_time(tmpdir):
+    region = SubliminalCacheRegion(negative_expiration_time=0.001)
+    region.configure('subliminal.sqlite', arguments={'filename': str(tmpdir.join('cache.sqlite'))})
+    creator = Mock(return_value=[])
+    assert region.get_or_create('namespace|key', creator) == []
+    time.sleep(0.01)
+    assert region.get_or_create('namespace|key', creator) == []
+    assert creator.call_count == 2
+
+    creator = Mock(return_value=['value'])
+    assert region.get_or_create('namespace|other key', creator) == ['value']
+    time.sleep(0.01)
+    assert region.get_or_create('namespace|other key', creator) == ['value']
+    assert creator.call_count == 1
+
+
+def test_region_negative_expiration_time_shorter(tmpdir):
+    region = SubliminalCacheRegion(negative_expiration_time=60)
+    region.configure('subliminal.sqlite', arguments={'filename': str(tmpdir.join('cache.sqlite'))})
+    creator = Mock(return_value=None)
+    region.get_or_create('namespace|key', creator, expiration_time=0.001)
+    time.sleep(0.01)
+    region.get_or_create('namespace|key', creator, expiration_time=0.001)
+    assert creator.call_count == 2
+
+
+def test_region_stale_while_revalidate(tmpdir):
+    region = SubliminalCacheRegion(stale_while_revalidate=True)
+    region.configure('subliminal.sqlite', arguments={'filename': str(tmpdir.join('cache.sqlite'))})
+    creator = Mock(side_effect=['value', 'new value'])
+    assert region.get_or_create('namespace|key', creator, expiration_time=0.001) == 'value'
+    time.sleep(0.01)
+    assert region.get_or_create('namespace|key', creator, expiration_time=0.001) == 'value'
+    region.wait_for_refreshes()
+    assert creator.call_count == 2
+    assert region.get('namespace|key') == 'new value'
+    assert not region.backend.get_mutex('namespace|key').locked()
+    assert region.stats['namespace']['hits'] == 0
+    assert region.stats['namespace']['expirations'] == 1
+
+
+def test_region_stale_while_revalidate_dbm(tmpdir):
+    region = SubliminalCacheRegion(stale_while_revalidate=True)
+    region.configure('dogpile.cache.dbm', arguments={'filename': str(tmpdir.join('cache.dbm'))})
+    creator = Mock(side_effect=['value', 'new value', 'newer value'])
+    assert region.get_or_create('namespace|key', creator, expiration_time=0.001) == 'value'
+    for value in ('new value', 'newer value'):
+        time.sleep(0.01)
+        region.get_or_create('namespace|key', creator, expiration_time=0.001)
+        assert not region.refresh_threads
+        assert region.get('namespace|key') == value
+    assert creator.call_count == 3
+    assert region.stats['namespace']['hits'] == 0
+    assert region.stats['namespace']['expirations'] == 2
+
+
+@pytest.mark.parametrize('format', ['pickle', 'marshal'])
+@pytest.mark.parametrize('compression', [None, 'zlib'])
+def test_serializer(format, compression):
+    serializer = Serializer(format, compression, compression_threshold=64)
+    for value in [None, {'value': unicode_string, 'ids': {1: 2}}, [(1, 2.5, True)] * 100, Value(1)]:
+        data = serializer.dumps(value)
+        if isinstance(value, Value):
+            assert data[:1] == b'p'
+            assert serializer.loads(data).value == 1
+        else:
+            assert serializer.loads(data) == value
+    assert len(serializer.dumps([(1, 2.5, True)] * 100)) < 64 or compression is None
+
+
+def test_serializer_loads_pickle():
+    assert Serializer('marshal', 'zlib').loads(pickle.dumps({'value': 1}, pickle.HIGHEST_PROTOCOL)) == {'value': 1}
+
+
+def test_serializer_unsupported():
+    with pytest.raises(ValueError):
+        Serializer('json')
+    with pytest.raises(ValueError):
+        Serializer(compression='bz2')
+
+
+def test_sqlite_backend_serializer(tmpdir):
+    filename = str(tmpdir.join('cache.sqlite'))
+    backend = SQLiteBackend({'filename': filename, 'serializer': 'marshal', 'compression': 'zlib',
+                             'compression_threshold': 64})
+    value = CachedValue({'ids': list(range(100))}, {'ct': time.time(), 'v': 1})
+    backend.set('key', value)
+    assert backend.get('key') == value
+    assert isinstance(backend.get('key'), CachedValue)
+    assert backend.get_sizes()['key'] < len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    # values written with another serializer are still loaded
+    assert SQLiteBackend({'filename': filename}).get('key') == value
+
+
+def test_region_cache_on_arguments_dump_load(tmpdir):
+    region = SubliminalCacheRegion()
+    region.configure('subliminal.sqlite', arguments={'filename': str(tmpdir.join('cache.sqlite')),
+                                                     'serializer': 'marshal'})
+    creator = Mock(side_effect=Value)
+
+    @region.cache_on_arguments(dump=lambda v: (v.value,), load=lambda v: Value(v[0]))
+    def cached_fn(x):
+        return creator(x)
+
+    assert cached_fn(1).value == 1
+    assert cached_fn(1).value == 1
+    assert creator.call_count == 1
+    assert cached_fn.get(1).value == 1
+    assert region.get(cached_fn.__module__ + ':cached_fn|1') == (1,)
+    cached_fn.invalidate(1)
+    assert cached_fn.get(1) is NO_VALUE
+
+
+def test_subtitle_content_cache(tmpdir):
+    content_cache = SubtitleContentCache(str(tmpdir.join('subtitles')))
+    assert content_cache.get('podnapisi', 'EdQo') is None
+    content_cache.set('podnapisi', 'EdQo', b'content')
+    assert content_cache.get('podnapisi', 'EdQo') == b'content'
+    assert content_cache.get('opensubtitles', 'EdQo') is None
+    assert SubtitleContentCache(str(tmpdir.join('subtitles'))).get('podnapisi', 'EdQo') == b'content'
+    assert content_cache.get_size() == len(b'content')
+    content_cache.clear()
+    assert content_cache.get('podnapisi', 'EdQo') is None
+
+
+def test_subtitle_content_cache_expiration(tmpdir):
+    content_cache = SubtitleContentCache(str(tmpdir.join('subtitles')), expiration_time=0.1)
+    content_cache.set('podnapisi', 'EdQo', b'content')
+    assert content_cache.get('podnapisi', 'EdQo') == b'content'
+    time.sleep(0.2)
+    assert content_cache.get('podnapisi', 'EdQo') is None
+    assert content_cache.evict() == 1
+
+
+def test_subtitle_content_cache_evict(tmpdir):
+    content_cache = SubtitleContentCache(str(tmpdir.join('subtitles')))
+    for i in range(3):
+        content_cache.set('podnapisi', i, b'x' * 100)
+        time.sleep(0.01)
+    content_cache.get('podnapisi', 0)
+    assert content_cache.evict(200) == 1
+    assert content_cache.get('podnapisi', 0) is not None
+    assert content_cache.get('podnapisi', 1) is None
+    assert content_cache.get('podnapisi', 2) is not None
+
+
+def test_session_store(tmpdir):
+    session_store = SessionStore(str(tmpdir.join('sessions')))
+    assert session_store.get('opensubtitles', 'user') == (None, None)
+    session_store.set('opensubtitles', 'user', {'token': 'abc'})
+    session, date = session_store.get('opensubtitles', 'user')
+    assert session == {'token': 'abc'}
+    assert time.time() - date < 1
+    assert session_store.get('opensubtitles', 'other') == (None, None)
+    assert session_store.get('legendastv', 'user') == (None, None)
+    session_store.delete('opensubtitles', 'user')
+    assert session_store.get('opensubtitles', 'user') == (None, None)
+    session_store.set('opensubtitles', None, {'token': 'def'})
+    session_store.clear()
+    assert session_store.get('opensubtitles') == (None, None)
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='no POSIX permissions')
+def test_session_store_permissions(tmpdir):
+    session_store = SessionStore(str(tmpdir.join('sessions')))
+    session_store.set('opensubtitles', 'user', {'token': 'abc'})
+    assert stat.S_IMODE(os.stat(session_store.directory).st_mode) == 0o700
+    path = os.path.join(session_store.directory, os.listdir(session_store.directory)[0])
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+def test_session_store_expiration(tmpdir):
+    session_store = SessionStore(str(tmpdir.join('sessions')), expiration_time=0.1)
+    session_store.set('opensubtitles', 'user', {'token': 'abc'})
+    assert session_store.get('opensubtitles', 'user')[0] == {'token': 'abc'}
+    time.sleep(0.2)
+    assert session_store.get('opensubtitles', 'user') == (None, None)
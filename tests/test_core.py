@@ -2,8 +2,10 @@
 from datetime import datetime, timedelta
 import io
 import os
+import threading
+import time
 
-from babelfish import Language
+from babelfish import Country, Language
 import pytest
 
 try:
@@ -12,16 +14,20 @@ except ImportError:
     from mock import Mock
 from vcr import VCR
 
+from subliminal.cache import SubliminalCacheRegion, SubtitleContentCache
 from subliminal.core import (AsyncProviderPool, ProviderPool, check_video, download_best_subtitles, download_subtitles,
-                             list_subtitles, refine, save_subtitles, scan_archive, scan_video, scan_videos,
-                             search_external_subtitles)
+                             get_listing_key, group_videos_by_languages, list_subtitles, refine, save_subtitles,
+                             scan_archive, scan_video, scan_videos, score_subtitles, search_external_subtitles,
+                             create_score_executor, warm_cache)
 from subliminal.extensions import provider_manager
+from subliminal.providers import Provider
+from subliminal.providers.podnapisi import PodnapisiSubtitle
 from subliminal.providers.thesubdb import TheSubDBSubtitle
 from subliminal.providers.tvsubtitles import TVsubtitlesSubtitle
-from subliminal.score import episode_scores
+from subliminal.score import compute_score, episode_scores
 from subliminal.subtitle import Subtitle
 from subliminal.utils import timestamp
-from subliminal.video import Movie
+from subliminal.video import Episode, Movie
 
 
 vcr = VCR(path_transformer=lambda path: path + '.yaml',
@@ -35,7 +41,11 @@ def mock_providers(monkeypatch):
     for provider in provider_manager:
         monkeypatch.setattr(provider.plugin, 'initialize', Mock())
         monkeypatch.setattr(provider.plugin, 'list_subtitles', Mock(return_value=[provider.name]))
+        monkeypatch.setattr(provider.plugin, 'list_subtitles_batch', Provider.list_subtitles_batch)
+        monkeypatch.setattr(provider.plugin, 'warm_cache', Mock())
+        monkeypatch.setattr(provider.plugin, 'warm_up', Mock())
         monkeypatch.setattr(provider.plugin, 'download_subtitle', Mock())
+        monkeypatch.setattr(provider.plugin, 'download_subtitles', Provider.download_subtitles)
         monkeypatch.setattr(provider.plugin, 'terminate', Mock())
 
 
@@ -92,6 +102,201 @@ def test_async_provider_pool_list_subtitles(episodes, mock_providers):
         assert provider_manager[provider].plugin.list_subtitles.called
 
 
+def test_provider_pool_list_subtitles_provider_cache_listings(episodes, mock_providers, monkeypatch):
+    region = SubliminalCacheRegion()
+    region.configure('dogpile.cache.memory')
+    monkeypatch.setattr('subliminal.core.region', region)
+    languages = {Language('eng')}
+
+    with ProviderPool(cache_listings=True) as pool:
+        pool.list_subtitles_provider('tvsubtitles', episodes['bbt_s07e05'], languages)
+    with ProviderPool(cache_listings=True) as pool:
+        subtitles = pool.list_subtitles_provider('tvsubtitles', episodes['bbt_s07e05'], languages)
+
+    assert subtitles == ['tvsubtitles']
+    assert provider_manager['tvsubtitles'].plugin.list_subtitles.call_count == 1
+
+
+def test_provider_pool_list_subtitles_provider_batch(episodes, movies, mock_providers):
+    pool = ProviderPool()
+    videos = [episodes['bbt_s07e05'], movies['man_of_steel']]
+    subtitles = pool.list_subtitles_provider_batch('tvsubtitles', videos, {Language('eng')})
+    assert subtitles == {episodes['bbt_s07e05']: ['tvsubtitles'], movies['man_of_steel']: []}
+    assert provider_manager['tvsubtitles'].plugin.list_subtitles.call_count == 1
+
+
+def test_provider_pool_list_subtitles_provider_batch_cache_listings(episodes, mock_providers, monkeypatch):
+    region = SubliminalCacheRegion()
+    region.configure('dogpile.cache.memory')
+    monkeypatch.setattr('subliminal.core.region', region)
+    languages = {Language('eng')}
+
+    with ProviderPool(cache_listings=True) as pool:
+        pool.list_subtitles_provider('tvsubtitles', episodes['bbt_s07e05'], languages)
+    with ProviderPool(cache_listings=True) as pool:
+        subtitles = pool.list_subtitles_provider_batch('tvsubtitles', [episodes['bbt_s07e05'], episodes['got_s03e10']],
+                                                       languages)
+
+    assert subtitles == {episodes['bbt_s07e05']: ['tvsubtitles'], episodes['got_s03e10']: ['tvsubtitles']}
+    assert provider_manager['tvsubtitles'].plugin.list_subtitles.call_count == 2
+
+
+def test_provider_pool_list_subtitles_batch(episodes, mock_providers):
+    videos = [episodes['bbt_s07e05'], episodes['got_s03e10']]
+    with ProviderPool(providers=['argenteam', 'podnapisi', 'tvsubtitles']) as pool:
+        subtitles = pool.list_subtitles_batch(videos, {Language('eng')})
+    assert subtitles == {video: ['podnapisi', 'tvsubtitles'] for video in videos}
+
+
+def test_async_provider_pool_list_subtitles_batch(episodes, mock_providers):
+    videos = [episodes['bbt_s07e05'], episodes['got_s03e10']]
+    with AsyncProviderPool(providers=['argenteam', 'podnapisi', 'tvsubtitles']) as pool:
+        subtitles = pool.list_subtitles_batch(videos, {Language('eng')})
+    assert subtitles == {video: ['podnapisi', 'tvsubtitles'] for video in videos}
+
+
+def test_group_videos_by_languages(episodes, movies):
+    videos = [episodes['bbt_s07e05'], movies['man_of_steel'], episodes['got_s03e10']]
+    movies['man_of_steel'].subtitle_languages = {Language('fra')}
+    groups = group_videos_by_languages(videos, {Language('eng'), Language('fra')})
+    assert groups == [({Language('eng'), Language('fra')}, [episodes['bbt_s07e05'], episodes['got_s03e10']]),
+                      ({Language('eng')}, [movies['man_of_steel']])]
+
+
+def test_get_listing_key(episodes, movies):
+    languages = {Language('eng'), Language('fra')}
+    episode = episodes['bbt_s07e05']
+    assert get_listing_key('tvsubtitles', episode, languages) == ('subliminal.core:list_subtitles|tvsubtitles|'
+                                                                  'episode:the big bang theory:2007:7:5|en,fr')
+    assert (get_listing_key('opensubtitles', episode, languages) ==
+            'subliminal.core:list_subtitles|opensubtitles|hash:%s:%d|en,fr' % (episode.hashes['opensubtitles'],
+                                                                               episode.size))
+    assert get_listing_key('podnapisi', movies['man_of_steel'], {Language('eng')}) == (
+        'subliminal.core:list_subtitles|podnapisi|movie:man of steel:2013|en')
+
+
+def test_provider_pool_warm_cache(episodes, mock_providers):
+    videos = [episodes['bbt_s07e05'], episodes['got_s03e10']]
+    pool = ProviderPool(providers=['argenteam', 'podnapisi', 'tvsubtitles'])
+    pool.warm_cache(videos)
+    for provider in pool.providers:
+        plugin = provider_manager[provider].plugin
+        assert plugin.warm_cache.call_count == len([v for v in videos if plugin.check(v)])
+
+
+def test_async_provider_pool_warm_cache(episodes, mock_providers):
+    videos = [episodes['bbt_s07e05'], episodes['got_s03e10']]
+    pool = AsyncProviderPool(providers=['argenteam', 'podnapisi', 'tvsubtitles'])
+    pool.warm_cache(videos)
+    for provider in pool.providers:
+        plugin = provider_manager[provider].plugin
+        assert plugin.warm_cache.call_count == len([v for v in videos if plugin.check(v)])
+
+
+def test_provider_pool_warm_cache_discard(episodes, mock_providers):
+    provider_manager['tvsubtitles'].plugin.warm_cache.side_effect = Exception('Boom')
+    pool = ProviderPool(providers=['podnapisi', 'tvsubtitles'])
+    pool.warm_cache([episodes['bbt_s07e05']])
+    assert pool.discarded_providers == {'tvsubtitles'}
+
+
+def test_provider_pool_prewarm(mock_providers):
+    providers = ['argenteam', 'podnapisi', 'tvsubtitles']
+    for provider in providers:
+        provider_manager[provider].plugin.initialize.side_effect = lambda: time.sleep(0.2)
+    pool = ProviderPool(providers=providers)
+    start = time.time()
+    pool.prewarm()
+    assert time.time() - start < 0.2 * len(providers)
+    assert set(pool.initialized_providers) == set(providers)
+    for provider in providers:
+        assert provider_manager[provider].plugin.warm_up.call_count == 1
+
+
+def test_provider_pool_prewarm_error(mock_providers):
+    provider_manager['tvsubtitles'].plugin.initialize.side_effect = Exception('Boom')
+    pool = ProviderPool(providers=['podnapisi', 'tvsubtitles'])
+    pool.prewarm()
+    assert set(pool.initialized_providers) == {'podnapisi'}
+    assert pool.discarded_providers == set()
+
+
+def test_provider_pool_terminate_timeout(mock_providers):
+    provider_manager['podnapisi'].plugin.terminate.side_effect = lambda: time.sleep(0.3)
+    provider_manager['tvsubtitles'].plugin.terminate.side_effect = lambda: time.sleep(2)
+    pool = ProviderPool(providers=['argenteam', 'podnapisi', 'tvsubtitles'], terminate_timeout=0.5)
+    pool.prewarm()
+    start = time.time()
+    pool.terminate()
+    assert time.time() - start < 1
+    assert pool.initialized_providers == {}
+    assert provider_manager['podnapisi'].plugin.terminate.call_count == 1
+
+
+def test_provider_pool_terminate_timeout_transports(mock_providers, monkeypatch):
+    provider_manager['tvsubtitles'].plugin.terminate.side_effect = lambda: time.sleep(0.5)
+    pool = ProviderPool(providers=['podnapisi', 'tvsubtitles'], terminate_timeout=0.1, transport_options={})
+    pool.prewarm()
+    transport = pool.get_transport('requests')
+    monkeypatch.setattr(transport, 'close', Mock())
+    pool.terminate()
+    assert pool.transports == {}
+    assert not transport.close.called
+    time.sleep(0.6)
+    assert transport.close.call_count == 1
+
+
+def test_provider_pool_initialize_once(mock_providers):
+    provider_manager['tvsubtitles'].plugin.initialize.side_effect = lambda: time.sleep(0.2)
+    pool = ProviderPool(providers=['tvsubtitles'])
+    thread = threading.Thread(target=pool.prewarm)
+    thread.start()
+    provider = pool['tvsubtitles']
+    thread.join()
+    assert pool['tvsubtitles'] is provider
+    assert provider_manager['tvsubtitles'].plugin.initialize.call_count == 1
+
+
+def test_warm_cache(episodes, mock_providers, monkeypatch):
+    mock_refine = Mock()
+    monkeypatch.setattr('subliminal.core.refine', mock_refine)
+    video = episodes['got_s03e10']
+    same_season_video = Episode(video.name.replace('E10', 'E09'), video.series, video.season, 9)
+    videos = [video, same_season_video, episodes['bbt_s07e05']]
+
+    warm_cache(videos, providers=['tvsubtitles'])
+
+    assert [c[0][0] for c in mock_refine.call_args_list] == [video, episodes['bbt_s07e05']]
+    assert provider_manager['tvsubtitles'].plugin.warm_cache.call_count == 3
+
+
+def test_warm_cache_transport(episodes, mock_providers, monkeypatch):
+    mock_refine = Mock()
+    monkeypatch.setattr('subliminal.core.refine', mock_refine)
+
+    warm_cache([episodes['bbt_s07e05']], pool_class=ProviderPool, providers=['tvsubtitles'],
+               transport_options={'timeout': 42})
+
+    assert mock_refine.call_args[1]['transport'].timeout == 42
+
+
+def test_warm_cache_refine_error(episodes, mock_providers, monkeypatch, caplog):
+    def refine(video, **kwargs):
+        if video.series == 'The Big Bang Theory':
+            raise ValueError('refiner error')
+        video.country = Country('US')
+
+    monkeypatch.setattr('subliminal.core.refine', refine)
+    video = episodes['got_s03e10']
+    same_season_video = Episode(video.name.replace('E10', 'E09'), video.series, video.season, 9)
+
+    warm_cache([video, same_season_video, episodes['bbt_s07e05']], providers=['tvsubtitles'])
+
+    assert same_season_video.country == Country('US')
+    assert 'refiner error' in caplog.text
+    assert provider_manager['tvsubtitles'].plugin.warm_cache.call_count == 3
+
+
 def test_check_video_languages(movies):
     video = movies['man_of_steel']
     languages = {Language('fra'), Language('eng')}
@@ -485,6 +690,225 @@ def test_download_subtitles(mock_providers):
         assert provider_manager[name].plugin.download_subtitle.called
 
 
+def test_provider_pool_download_subtitle_content_cache(mock_providers, tmpdir):
+    content = b'1\n00:00:01,000 --> 00:00:02,000\nOl\xc3\xa1\n'
+
+    def download_subtitle(subtitle):
+        subtitle.content = content
+
+    provider_manager['tvsubtitles'].plugin.download_subtitle.side_effect = download_subtitle
+    content_cache = SubtitleContentCache(str(tmpdir.join('subtitles')))
+    subtitle = TVsubtitlesSubtitle(Language('por'), None, 261077, 'Game of Thrones', 3, 10, None, '1080p.BluRay',
+                                   'DEMAND')
+    with ProviderPool(providers=['tvsubtitles'], content_cache=content_cache) as pool:
+        assert pool.download_subtitle(subtitle)
+    assert content_cache.get('tvsubtitles', 261077) == content
+
+    cached_subtitle = TVsubtitlesSubtitle(Language('por'), None, 261077, 'Game of Thrones', 3, 10, None,
+                                          '1080p.BluRay', 'DEMAND')
+    with ProviderPool(providers=['tvsubtitles'], content_cache=content_cache) as pool:
+        assert pool.download_subtitle(cached_subtitle)
+    assert cached_subtitle.content == content
+    assert provider_manager['tvsubtitles'].plugin.download_subtitle.call_count == 1
+
+
+def test_provider_pool_download_subtitles(mock_providers, monkeypatch, tmpdir):
+    content = b'1\n00:00:01,000 --> 00:00:02,000\nOl\xc3\xa1\n'
+
+    def download_subtitle(subtitle):
+        if subtitle.subtitle_id != 261078:
+            subtitle.content = content
+
+    batches = []
+
+    def download_subtitles(provider, subtitles):
+        batches.append(subtitles)
+        Provider.download_subtitles(provider, subtitles)
+
+    provider_manager['tvsubtitles'].plugin.download_subtitle.side_effect = download_subtitle
+    monkeypatch.setattr(provider_manager['tvsubtitles'].plugin, 'download_subtitles', download_subtitles)
+    content_cache = SubtitleContentCache(str(tmpdir.join('subtitles')))
+    content_cache.set('tvsubtitles', 261079, content)
+    subtitles = [TVsubtitlesSubtitle(Language('por'), None, subtitle_id, 'Game of Thrones', 3, 10, None, None, None)
+                 for subtitle_id in (261077, 261078, 261079)]
+    subtitles.append(PodnapisiSubtitle(Language('eng'), True, None, 'EdNu', [], 'Game of Thrones', 3, 10, 2011))
+    with ProviderPool(providers=['tvsubtitles', 'podnapisi'], content_cache=content_cache) as pool:
+        pool.discarded_providers.add('podnapisi')
+        assert pool.download_subtitles(subtitles) == [True, False, True, False]
+
+    # a single call for the subtitles that are not cached, none for the discarded provider
+    assert batches == [subtitles[:2]]
+    assert not provider_manager['podnapisi'].plugin.download_subtitle.called
+    assert content_cache.get('tvsubtitles', 261077) == content
+    assert content_cache.get('tvsubtitles', 261078) is None
+
+
+def test_provider_pool_download_best_subtitles_batch(episodes, monkeypatch):
+    got, bbt = episodes['got_s03e10'], episodes['bbt_s07e05']
+    got_subtitles = [
+        TVsubtitlesSubtitle(Language('eng'), None, 261076, 'Game of Thrones', 3, 10, None, None, None),
+        TVsubtitlesSubtitle(Language('eng'), None, 261080, 'Game of Thrones', 3, 10, None, '720p.WEB-DL', 'NTb')
+    ]
+    bbt_subtitles = [
+        TVsubtitlesSubtitle(Language('eng'), None, 261081, 'The Big Bang Theory', 7, 5, None, None, None),
+        TVsubtitlesSubtitle(Language('fra'), None, 261082, 'The Big Bang Theory', 7, 5, None, None, None)
+    ]
+    batches = []
+
+    def download_subtitles(subtitles):
+        batches.append(subtitles)
+        return [subtitle.subtitle_id != 261080 for subtitle in subtitles]
+
+    pool = ProviderPool()
+    monkeypatch.setattr(pool, 'download_subtitles', download_subtitles)
+    downloaded_subtitles = pool.download_best_subtitles_batch({got: got_subtitles, bbt: bbt_subtitles},
+                                                              {Language('eng'), Language('fra')}, only_one=True)
+
+    assert batches == [[got_subtitles[1], bbt_subtitles[0]], [got_subtitles[0]]]
+    assert downloaded_subtitles == {got: [got_subtitles[0]], bbt: [bbt_subtitles[0]]}
+
+
+def test_score_subtitles(episodes):
+    video = episodes['got_s03e10']
+    subtitles = [
+        TVsubtitlesSubtitle(Language('por'), None, 261077, 'Game of Thrones', 3, 10, None, '1080p.BluRay', 'DEMAND'),
+        TVsubtitlesSubtitle(Language('por'), None, 261078, 'Game of Thrones', 3, 9, None, None, None),
+        TVsubtitlesSubtitle(Language('eng'), None, 261079, 'The Big Bang Theory', 7, 5, None, None, 'DIMENSION')
+    ]
+    expected_scores = [compute_score(s, video, hearing_impaired=True) for s in subtitles]
+
+    assert score_subtitles(subtitles, video, hearing_impaired=True, threshold=None) == expected_scores
+
+
+def test_score_subtitles_processes(episodes):
+    video = episodes['got_s03e10']
+    subtitles = [
+        TVsubtitlesSubtitle(Language('por'), None, 261077, 'Game of Thrones', 3, 10, None, '1080p.BluRay', 'DEMAND'),
+        TVsubtitlesSubtitle(Language('por'), None, 261078, 'Game of Thrones', 3, 9, None, None, None),
+        TVsubtitlesSubtitle(Language('eng'), None, 261079, 'The Big Bang Theory', 7, 5, None, None, 'DIMENSION')
+    ]
+    expected_scores = [compute_score(s, video, hearing_impaired=False) for s in subtitles]
+
+    assert score_subtitles(subtitles, video, threshold=2, max_workers=2) == expected_scores
+
+
+def test_score_subtitles_executor(episodes):
+    video = episodes['got_s03e10']
+    subtitles = [
+        TVsubtitlesSubtitle(Language('por'), None, 261077, 'Game of Thrones', 3, 10, None, '1080p.BluRay', 'DEMAND'),
+        TVsubtitlesSubtitle(Language('por'), None, 261078, 'Game of Thrones', 3, 9, None, None, None),
+        TVsubtitlesSubtitle(Language('eng'), None, 261079, 'The Big Bang Theory', 7, 5, None, None, 'DIMENSION')
+    ]
+    expected_scores = [compute_score(s, video, hearing_impaired=False) for s in subtitles]
+
+    with create_score_executor(2) as executor:
+        assert score_subtitles(subtitles, video, threshold=2, max_workers=2, executor=executor) == expected_scores
+        assert score_subtitles(subtitles[:2], video, threshold=2, max_workers=2, executor=executor) == \
+            expected_scores[:2]
+
+
+def test_provider_pool_score_executor(episodes):
+    video = episodes['got_s03e10']
+    subtitles = [
+        TVsubtitlesSubtitle(Language('por'), None, 261077, 'Game of Thrones', 3, 10, None, '1080p.BluRay', 'DEMAND'),
+        TVsubtitlesSubtitle(Language('eng'), None, 261078, 'Game of Thrones', 3, 10, None, '1080p.BluRay', 'DEMAND'),
+        TVsubtitlesSubtitle(Language('eng'), None, 261079, 'The Big Bang Theory', 7, 5, None, None, 'DIMENSION')
+    ]
+
+    pool = ProviderPool(score_threshold=2, score_workers=2)
+    assert len(list(pool.iter_scored_subtitles(subtitles[1:], video))) == 2
+    assert pool.score_executor is None
+    scored_subtitles = list(pool.iter_scored_subtitles(subtitles, video))
+    executor = pool.score_executor
+    assert executor is not None
+    assert list(pool.iter_scored_subtitles(subtitles, video)) == scored_subtitles
+    assert pool.score_executor is executor
+    pool.terminate()
+    assert pool.score_executor is None
+    with pytest.raises(RuntimeError):
+        executor.submit(int)
+
+
+def test_provider_pool_iter_scored_subtitles(episodes):
+    video = episodes['got_s03e10']
+    subtitles = [
+        TVsubtitlesSubtitle(Language('eng'), None, 261079, 'The Big Bang Theory', 7, 5, None, None, 'DIMENSION'),
+        TVsubtitlesSubtitle(Language('por'), None, 261078, 'Game of Thrones', 3, 9, None, None, None),
+        TVsubtitlesSubtitle(Language('por'), None, 261077, 'Game of Thrones', 3, 10, None, '1080p.BluRay', 'DEMAND')
+    ]
+    expected = sorted([(s, compute_score(s, video, hearing_impaired=False)) for s in subtitles],
+                      key=lambda x: x[1], reverse=True)
+
+    assert list(ProviderPool().iter_scored_subtitles(subtitles, video)) == expected
+
+
+def test_provider_pool_iter_scored_subtitles_min_score(episodes, monkeypatch):
+    video = episodes['got_s03e10']
+    subtitles = [
+        TVsubtitlesSubtitle(Language('por'), None, 261077, 'Game of Thrones', 3, 10, None, '1080p.BluRay', 'DEMAND'),
+        TVsubtitlesSubtitle(Language('por'), None, 261078, 'Game of Thrones', 2, 9, None, None, None)
+    ]
+    matched_subtitles = []
+    get_matches = TVsubtitlesSubtitle.get_matches
+    monkeypatch.setattr(TVsubtitlesSubtitle, 'get_matches',
+                        lambda self, video: matched_subtitles.append(self) or get_matches(self, video))
+    min_score = (episode_scores['hash'] - episode_scores['season'] - episode_scores['episode'] +
+                 episode_scores['hearing_impaired'] + 1)
+
+    scored_subtitles = list(ProviderPool().iter_scored_subtitles(subtitles, video, min_score=min_score))
+
+    assert [s for s, _ in scored_subtitles] == subtitles[:1]
+    assert matched_subtitles == subtitles[:1]
+
+
+def test_provider_pool_iter_scored_subtitles_skips_wrong_episode(episodes, monkeypatch):
+    video = episodes['bbt_s07e05']
+    subtitles = [
+        PodnapisiSubtitle(Language('eng'), True, None, 1,
+                          ['The.Big.Bang.Theory.S07E04.The.Raiders.Minimization.720p.HDTV.x264-DIMENSION.mkv'],
+                          'The Big Bang Theory', 7, 4, None),
+        PodnapisiSubtitle(Language('eng'), True, None, 2, ['Friends.S01E01.720p.HDTV.x264-DIMENSION.mkv'], 'Friends', 1,
+                          1, None),
+        PodnapisiSubtitle(Language('eng'), True, None, 3,
+                          ['The.Big.Bang.Theory.S07E05.The.Workplace.Proximity.720p.HDTV.x264-DIMENSION.mkv'],
+                          'The Big Bang Theory', 7, 5, None)
+    ]
+    expected_score = compute_score(subtitles[2], video)
+    matched_subtitles = []
+    get_matches = PodnapisiSubtitle.get_matches
+    monkeypatch.setattr(PodnapisiSubtitle, 'get_matches',
+                        lambda self, video: matched_subtitles.append(self) or get_matches(self, video))
+
+    subtitle, score = next(ProviderPool().iter_scored_subtitles(subtitles, video))
+
+    assert subtitle is subtitles[2]
+    assert score == expected_score
+    assert matched_subtitles == subtitles[2:]
+
+
+def test_provider_pool_download_best_subtitles_per_language(episodes, monkeypatch):
+    video = episodes['got_s03e10']
+    subtitles = [
+        TVsubtitlesSubtitle(Language('eng'), None, 261076, 'Game of Thrones', 3, 10, None, None, None),
+        TVsubtitlesSubtitle(Language('por'), None, 261077, 'Game of Thrones', 3, 10, None, '1080p.BluRay', 'DEMAND'),
+        TVsubtitlesSubtitle(Language('por'), None, 261078, 'Game of Thrones', 3, 10, None, None, None),
+        TVsubtitlesSubtitle(Language('fra'), None, 261079, 'Game of Thrones', 3, 10, None, None, None),
+        TVsubtitlesSubtitle(Language('eng'), None, 261080, 'Game of Thrones', 3, 10, None, '720p.WEB-DL', 'NTb')
+    ]
+    attempted_subtitles = []
+
+    def download_subtitle(subtitle):
+        attempted_subtitles.append(subtitle)
+        return subtitle.subtitle_id != 261080
+
+    pool = ProviderPool()
+    monkeypatch.setattr(pool, 'download_subtitle', download_subtitle)
+    downloaded_subtitles = pool.download_best_subtitles(subtitles, video, {Language('eng'), Language('por')})
+
+    assert attempted_subtitles == [subtitles[4], subtitles[0], subtitles[1]]
+    assert downloaded_subtitles == [subtitles[0], subtitles[1]]
+
+
 @pytest.mark.integration
 @vcr.use_cassette
 def test_download_best_subtitles(episodes):
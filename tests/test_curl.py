@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+import ctypes as ct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+
+lcurl = pytest.importorskip('libcurl')
+
+from subliminal.curl import (CurlBuffer, CurlTransport, basic_resp_header_parser, curl_easy_impersonate,
+                             curl_get_resp_code, curl_init, curl_write_function)
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path.startswith('/large'):
+            body = b'0123456789abcdef' * 65536
+        else:
+            time.sleep(0.5)
+            body = self.path.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SlowHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield 'http://127.0.0.1:%d/' % server.server_port
+    server.shutdown()
+
+
+@pytest.fixture
+def transport():
+    curl_init(None)
+    transport = CurlTransport(timeout=5)
+    yield transport
+    transport.close()
+
+
+def make_handle(transport, url):
+    handle = transport.easy_handle()
+    buffer = CurlBuffer()
+    lcurl.easy_setopt(handle, lcurl.CURLOPT_URL, url.encode('utf-8'))
+    lcurl.easy_setopt(handle, lcurl.CURLOPT_WRITEFUNCTION, curl_write_function)
+    lcurl.easy_setopt(handle, lcurl.CURLOPT_WRITEDATA, id(buffer))
+
+    return handle, buffer
+
+
+def test_curl_multi_perform(transport, server_url):
+    handle, buffer = make_handle(transport, server_url + 'single')
+    try:
+        assert transport.multi().perform(handle) == lcurl.CURLE_OK
+        assert curl_get_resp_code(handle) == 200
+        assert bytes(buffer) == b'/single'
+        assert buffer.getbuffer() == b'/single'
+    finally:
+        lcurl.easy_cleanup(handle)
+
+
+def test_curl_multi_perform_all_concurrently(transport, server_url):
+    handles, buffers = zip(*[make_handle(transport, server_url + str(i)) for i in range(6)])
+    try:
+        start = time.time()
+        assert transport.multi().perform_all(handles) == [lcurl.CURLE_OK] * 6
+        assert time.time() - start < 6 * 0.5
+        assert [bytes(b) for b in buffers] == [('/%d' % i).encode('utf-8') for i in range(6)]
+    finally:
+        for handle in handles:
+            lcurl.easy_cleanup(handle)
+
+
+def test_curl_multi_closed(transport, server_url):
+    multi = transport.multi()
+    transport.close()
+    handle, _ = make_handle(transport, server_url)
+    try:
+        with pytest.raises(RuntimeError):
+            multi.submit(handle)
+    finally:
+        lcurl.easy_cleanup(handle)
+
+
+def test_curl_easy_impersonate_not_built_in(transport):
+    handle = transport.easy_handle()
+    try:
+        assert curl_easy_impersonate(handle, 'ff98', 1) in (lcurl.CURLE_OK, lcurl.CURLE_NOT_BUILT_IN)
+    finally:
+        lcurl.easy_cleanup(handle)
+
+
+def test_curl_buffer_write():
+    buffer = CurlBuffer(4)
+    data = (ct.c_char * 6).from_buffer_copy(b'abcdef')
+    buffer.write(data, 3)
+    buffer.write(data, 6)
+    assert len(buffer) == 9
+    assert bytes(buffer) == b'abcabcdef'
+    assert len(buffer.data) == 9
+
+
+def test_curl_buffer_large_response(transport, server_url):
+    handle = transport.easy_handle()
+    buffer = CurlBuffer()
+    header_buffer = CurlBuffer(4096)
+    lcurl.easy_setopt(handle, lcurl.CURLOPT_URL, (server_url + 'large').encode('utf-8'))
+    lcurl.easy_setopt(handle, lcurl.CURLOPT_WRITEFUNCTION, curl_write_function)
+    lcurl.easy_setopt(handle, lcurl.CURLOPT_WRITEDATA, id(buffer))
+    lcurl.easy_setopt(handle, lcurl.CURLOPT_HEADERFUNCTION, curl_write_function)
+    lcurl.easy_setopt(handle, lcurl.CURLOPT_HEADERDATA, id(header_buffer))
+    try:
+        assert transport.multi().perform(handle) == lcurl.CURLE_OK
+        assert buffer.getbuffer() == b'0123456789abcdef' * 65536
+        details = basic_resp_header_parser(header_buffer)
+        assert details.request_line == b'HTTP/1.1 200 OK'
+        assert details.headers['Content-Length'] == str(16 * 65536)
+    finally:
+        lcurl.easy_cleanup(handle)
@@ -1,12 +1,24 @@
 # -*- coding: utf-8 -*-
+from datetime import datetime
 import os
 
 from babelfish import Language, language_converters
 import pytest
+import pytz
 import rarfile
+from requests import Session
 from vcr import VCR
+
+try:
+    from unittest.mock import Mock
+except ImportError:
+    from mock import Mock
+
+from subliminal.cache import SessionStore
 from subliminal.exceptions import ConfigurationError, AuthenticationError
-from subliminal.providers.legendastv import LegendasTVSubtitle, LegendasTVProvider, LegendasTVArchive
+from subliminal.providers import ParserBeautifulSoup
+from subliminal.providers.legendastv import (LegendasTVSubtitle, LegendasTVProvider, LegendasTVArchive,
+                                             dump_archives, load_archives)
 
 USERNAME = 'python-subliminal'
 PASSWORD = 'subliminal'
@@ -39,6 +51,14 @@ def test_get_archives_logged_in_as_not_donor():
                             'x264_DTS_RARBG_eng')
 
 
+def test_dump_load_archives():
+    archive = LegendasTVArchive('5515d27a72921', 'Interstellar.2014.1080p.BluRay.x264.DTS-RARBG.eng', False, True,
+                                'http://legendas.tv/download/5515d27a72921/Interstellar', 123, 8,
+                                pytz.timezone('America/Sao_Paulo').localize(datetime(2015, 3, 27, 17, 46)))
+    loaded_archive = load_archives(dump_archives([archive]))[0]
+    assert loaded_archive.__dict__ == archive.__dict__
+
+
 @pytest.mark.converter
 def test_converter_convert_alpha3_country():
     assert language_converters['legendastv'].convert('por', 'BR') == 1
@@ -120,6 +140,37 @@ def test_logout():
     assert provider.logged_in is False
 
 
+def test_resume_session(tmpdir, monkeypatch):
+    session_store = SessionStore(str(tmpdir))
+    session_store.set('legendastv', USERNAME, {'cookies': [{'name': 'au', 'value': 'token', 'domain': 'legendas.tv',
+                                                            'path': '/', 'expires': None}]})
+    monkeypatch.setattr(Session, 'get', Mock(return_value=Mock(status_code=200, text=u'',
+                                                               content=b'<a href="/users/logout">Sair</a>')))
+    provider = LegendasTVProvider(USERNAME, PASSWORD)
+    provider.session_store = session_store
+    monkeypatch.setattr(provider, 'login', Mock())
+    provider.initialize()
+    assert provider.logged_in is True
+    assert provider.session.cookies['au'] == 'token'
+    assert not provider.login.called
+
+
+def test_resume_session_revoked(tmpdir, monkeypatch):
+    session_store = SessionStore(str(tmpdir))
+    session_store.set('legendastv', USERNAME, {'cookies': [{'name': 'au', 'value': 'token', 'domain': 'legendas.tv',
+                                                            'path': '/', 'expires': None}]})
+    monkeypatch.setattr(Session, 'get', Mock(return_value=Mock(status_code=200, text=u'',
+                                                               content=b'<a href="/login">Entrar</a>')))
+    provider = LegendasTVProvider(USERNAME, PASSWORD)
+    provider.session_store = session_store
+    monkeypatch.setattr(provider, 'login', Mock())
+    provider.initialize()
+    assert provider.logged_in is False
+    assert 'au' not in provider.session.cookies
+    assert session_store.get('legendastv', USERNAME) == (None, None)
+    provider.login.assert_called_once_with()
+
+
 @pytest.mark.integration
 @vcr.use_cassette
 def test_search_titles_episode(episodes):
@@ -198,6 +249,21 @@ def test_get_archives_no_result():
     assert len(archives) == 0
 
 
+def test_get_archives_short_page(monkeypatch):
+    html = u'<div class="list_element">%s</div>%s'
+    pages = {0: html % (u'<article></article>' * 2, u'<a class="load_more">carregar mais</a>'),
+             1: html % (u'<article></article>' * 2, u'<a class="load_more">carregar mais</a>'),
+             2: html % (u'<article></article>', u'<a class="load_more">carregar mais</a>')}
+    requested_pages = []
+    provider = LegendasTVProvider()
+    provider.page_workers = 2
+    monkeypatch.setattr(provider, 'parse_archives', Mock(return_value=[]))
+    monkeypatch.setattr(provider, 'get_archives_page', lambda title_id, language_code, page: requested_pages.append(
+        page) or ParserBeautifulSoup(pages.get(page, html % (u'', u'')), ['html.parser']))
+    assert provider.get_archives.original(provider, 1, 1, 'movie', None, None) == []
+    assert sorted(requested_pages) == [0, 1, 2]
+
+
 @pytest.mark.integration
 @vcr.use_cassette
 def test_download_archive():
@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from subliminal.matches import guess_matches
+from subliminal.matches import guess_matches, release_group_matches, upper_bound_matches
 
 
 def test_guess_matches_movie(movies):
@@ -61,3 +61,47 @@ def test_guess_matches_episode_no_year(episodes):
     guess = {'title': video.series, 'season': video.season, 'episode': video.episode}
     expected = {'series', 'season', 'episode', 'year', 'country'}
     assert guess_matches(video, guess) == expected
+
+
+def test_upper_bound_matches_episode(episodes):
+    video = episodes['bbt_s07e05']
+    assert upper_bound_matches(video, type='episode', season=7, episode=5) == {
+        'series', 'title', 'season', 'episode', 'year', 'country', 'release_group', 'streaming_service', 'resolution',
+        'source', 'video_codec', 'audio_codec'}
+
+
+def test_upper_bound_matches_episode_wrong_episode(episodes):
+    video = episodes['bbt_s07e05']
+    matches = upper_bound_matches(video, type='episode', season=6, episode=4)
+    assert 'season' not in matches
+    assert 'episode' not in matches
+    assert 'series' in matches
+
+
+def test_upper_bound_matches_episode_series(episodes):
+    video = episodes['bbt_s07e05']
+    assert 'series' in upper_bound_matches(video, type='episode', series='The Big Bang Theory (2007)')
+    assert 'series' not in upper_bound_matches(video, type='episode', series='Friends')
+
+
+def test_upper_bound_matches_episode_movie_type(episodes):
+    video = episodes['bbt_s07e05']
+    matches = upper_bound_matches(video, type='movie')
+    assert not matches & {'series', 'season', 'episode'}
+
+
+def test_upper_bound_matches_movie_episode_type(movies):
+    video = movies['man_of_steel']
+    assert 'title' not in upper_bound_matches(video, type='episode', season=1, episode=1)
+
+
+def test_release_group_matches_equivalent(episodes):
+    video = episodes['bbt_s07e05']
+    assert release_group_matches(video, 'HDTV.x264-LOL')
+    assert release_group_matches(video, 'lol-dimension')
+
+
+def test_release_group_matches_token(episodes):
+    video = episodes['bbt_s07e05']
+    assert not release_group_matches(video, 'DIMENSIONAL')
+    assert not release_group_matches(video, None)
@@ -7,6 +7,7 @@ from vcr import VCR
 
 from subliminal.video import Episode, Movie
 from subliminal.refiners.omdb import OMDBClient, refine
+from subliminal.transport import RequestsTransport
 
 
 APIKEY = '00000000'
@@ -36,6 +37,14 @@ def test_headers():
     assert client.session.headers['X-Test'] == 'Value'
 
 
+def test_use_transport(client):
+    transport = RequestsTransport(timeout=42)
+    client.use_transport(transport)
+    assert client.transport is transport
+    assert client.session.timeout == 42
+    assert client.session.params['apikey'] == APIKEY
+
+
 @pytest.mark.integration
 @vcr.use_cassette
 def test_get_id(client):
@@ -1,13 +1,20 @@
 # -*- coding: utf-8 -*-
+import base64
 import os
+import zlib
 
 from babelfish import Language
 import pytest
+try:
+    from unittest.mock import Mock
+except ImportError:
+    from mock import Mock
 from vcr import VCR
 
+from subliminal.cache import SessionStore
 from subliminal.exceptions import ConfigurationError
 from subliminal.providers.opensubtitles import (
-    OpenSubtitlesProvider, OpenSubtitlesVipProvider, OpenSubtitlesSubtitle, Unauthorized
+    OpenSubtitlesProvider, OpenSubtitlesVipProvider, OpenSubtitlesSubtitle, Unauthorized, decode_content
 )
 
 USERNAME = 'python-subliminal'
@@ -355,3 +362,161 @@ def test_tag_match(episodes):
     assert unwanted_subtitle_id in {subtitle.id for subtitle in subtitles}
     # Assert is not a tag match: {'series', 'year', 'season', 'episode'}
     assert matches == {'episode', 'year', 'country', 'season'}
+
+
+def search_item(subtitle_id, matched_by, query_number=None, query_parameters=None, hash='', imdb_id='0'):
+    item = {'SubLanguageID': 'eng', 'SubHearingImpaired': '0', 'SubtitlesLink': 'http://www.opensubtitles.org',
+            'IDSubtitleFile': str(subtitle_id), 'MatchedBy': matched_by, 'MovieKind': 'movie', 'MovieHash': hash,
+            'MovieName': 'Movie', 'MovieReleaseName': 'Movie', 'MovieYear': '2013', 'IDMovieImdb': imdb_id,
+            'SeriesSeason': '0', 'SeriesEpisode': '0', 'SubFileName': 'movie.srt',
+            'QueryParameters': query_parameters or {}}
+    if query_number is not None:
+        item['QueryNumber'] = str(query_number)
+
+    return item
+
+
+def test_list_subtitles_batch(movies):
+    videos = [movies['man_of_steel'], movies['enders_game']]
+    provider = OpenSubtitlesProvider()
+    provider.token = 'token'
+    provider.server = Mock()
+    provider.server.SearchSubtitles.return_value = {'status': '200 OK', 'data': [
+        search_item(1, 'moviehash', query_number=0), search_item(2, 'tag', query_number=4),
+        search_item(3, 'fulltext', query_number=5)
+    ]}
+    subtitles = provider.list_subtitles_batch(videos, {Language('eng')})
+    assert provider.server.SearchSubtitles.call_count == 1
+    criteria = provider.server.SearchSubtitles.call_args[0][1]
+    assert criteria == (provider.get_criteria({Language('eng')}, **provider.get_query_params(videos[0])) +
+                        provider.get_criteria({Language('eng')}, **provider.get_query_params(videos[1])))
+    assert [s.subtitle_id for s in subtitles[videos[0]]] == [1]
+    assert [s.subtitle_id for s in subtitles[videos[1]]] == [2, 3]
+
+
+def test_list_subtitles_batch_criteria_limit(movies):
+    videos = [movies['man_of_steel'], movies['enders_game'], movies['interstellar']]
+    provider = OpenSubtitlesProvider()
+    provider.token = 'token'
+    provider.search_criteria_limit = 3
+    provider.server = Mock()
+    provider.server.SearchSubtitles.return_value = {'status': '200 OK', 'data': False}
+    subtitles = provider.list_subtitles_batch(videos, {Language('eng')})
+    assert [len(c[0][1]) for c in provider.server.SearchSubtitles.call_args_list] == [4, 2, 2]
+    assert subtitles == {video: [] for video in videos}
+
+
+def test_list_subtitles_batch_results_limit(movies):
+    videos = [movies['man_of_steel'], movies['enders_game']]
+    provider = OpenSubtitlesProvider()
+    provider.token = 'token'
+    provider.search_results_limit = 2
+    provider.server = Mock()
+    provider.server.SearchSubtitles.side_effect = [
+        {'status': '200 OK', 'data': [search_item(1, 'tag', query_number=0), search_item(2, 'tag', query_number=4)]},
+        {'status': '200 OK', 'data': [search_item(1, 'tag', query_number=0)]},
+        {'status': '200 OK', 'data': [search_item(2, 'tag', query_number=0), search_item(3, 'tag', query_number=1)]}
+    ]
+    subtitles = provider.list_subtitles_batch(videos, {Language('eng')})
+    assert provider.server.SearchSubtitles.call_count == 3
+    assert [s.subtitle_id for s in subtitles[videos[0]]] == [1]
+    assert [s.subtitle_id for s in subtitles[videos[1]]] == [2, 3]
+
+
+def test_route_subtitle_without_query_number(movies):
+    man_of_steel, enders_game = movies['man_of_steel'], movies['enders_game']
+    batch = [(video, OpenSubtitlesProvider.get_criteria({Language('eng')},
+                                                        **OpenSubtitlesProvider.get_query_params(video)))
+             for video in (man_of_steel, enders_game)]
+    route = OpenSubtitlesProvider.route_subtitle
+    assert route(search_item(1, 'moviehash', hash=man_of_steel.hashes['opensubtitles']), batch, []) is man_of_steel
+    assert route(search_item(2, 'imdbid', imdb_id=man_of_steel.imdb_id[2:].lstrip('0')), batch, []) is man_of_steel
+    assert route(search_item(3, 'fulltext', query_parameters={'query': enders_game.title.replace('\'', '').lower(),
+                                                              'sublanguageid': 'eng'}), batch, []) is enders_game
+    assert route(search_item(4, 'fulltext', query_parameters={'query': 'unknown'}), batch, []) is None
+
+
+def download_item(subtitle_id, content):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+    data = compressor.compress(content) + compressor.flush()
+
+    return {'idsubtitlefile': str(subtitle_id), 'data': base64.b64encode(data).decode('ascii')}
+
+
+def test_download_subtitles(movies):
+    subtitles = [OpenSubtitlesSubtitle(Language('eng'), False, None, subtitle_id, 'tag', 'movie', None, 'Movie', None,
+                                       2013, None, 0, 0, 'movie.srt', None) for subtitle_id in ('1', '2', '3', '1')]
+    provider = OpenSubtitlesProvider()
+    provider.token = 'token'
+    provider.download_ids_limit = 2
+    provider.server = Mock()
+    provider.server.DownloadSubtitles.side_effect = [
+        {'status': '200 OK', 'data': [download_item(2, b'2\r\n'), download_item(1, b'1\r\n')]},
+        {'status': '200 OK', 'data': [download_item(3, b'3\r\n')]}
+    ]
+    provider.download_subtitles(subtitles)
+    assert [c[0][1] for c in provider.server.DownloadSubtitles.call_args_list] == [['1', '2'], ['3']]
+    assert [s.content for s in subtitles] == [b'1\n', b'2\n', b'3\n', b'1\n']
+
+
+def test_download_subtitles_invalid(movies):
+    subtitles = [OpenSubtitlesSubtitle(Language('eng'), False, None, subtitle_id, 'tag', 'movie', None, 'Movie', None,
+                                       2013, None, 0, 0, 'movie.srt', None) for subtitle_id in ('1', '2', '3')]
+    provider = OpenSubtitlesProvider()
+    provider.token = 'token'
+    provider.server = Mock()
+    provider.server.DownloadSubtitles.return_value = {'status': '200 OK', 'data': [
+        download_item(1, b'1\r\n'),
+        {'idsubtitlefile': '2', 'data': base64.b64encode(b'not gzip').decode('ascii')},
+        {'idsubtitlefile': '3', 'data': u'\xe9'}
+    ]}
+    provider.download_subtitles(subtitles)
+    assert [s.content for s in subtitles] == [b'1\n', None, None]
+
+
+def test_download_subtitles_missing(movies):
+    subtitle = OpenSubtitlesSubtitle(Language('eng'), False, None, '1', 'tag', 'movie', None, 'Movie', None, 2013, None,
+                                     0, 0, 'movie.srt', None)
+    provider = OpenSubtitlesProvider()
+    provider.token = 'token'
+    provider.server = Mock()
+    provider.server.DownloadSubtitles.return_value = {'status': '200 OK', 'data': False}
+    provider.download_subtitles([subtitle])
+    assert subtitle.content is None
+
+
+def test_decode_content():
+    content = b'\r\n'.join(str(i).encode('ascii') for i in range(20000))
+    data = download_item(1, content)['data']
+    assert decode_content(data) == content.replace(b'\r\n', b'\n')
+    assert decode_content(data[:100] + '\n' + data[100:]) == content.replace(b'\r\n', b'\n')
+
+
+def test_initialize_resume_session(tmpdir, monkeypatch):
+    session_store = SessionStore(str(tmpdir.join('sessions')))
+    server = Mock()
+    server.LogIn.return_value = {'status': '200 OK', 'token': 'token'}
+    server.NoOperation.return_value = {'status': '200 OK'}
+    monkeypatch.setattr('subliminal.providers.opensubtitles.ServerProxy', Mock(return_value=server))
+
+    # log in and keep the session
+    provider = OpenSubtitlesProvider(USERNAME, PASSWORD)
+    provider.session_store = session_store
+    with provider:
+        assert provider.token == 'token'
+    assert server.LogIn.call_count == 1
+    assert not server.LogOut.called
+
+    # resume the session
+    with provider:
+        assert provider.token == 'token'
+    assert server.LogIn.call_count == 1
+    assert server.NoOperation.call_args[0] == ('token',)
+
+    # log in again when the session expired
+    server.NoOperation.return_value = {'status': '406 No session'}
+    server.LogIn.return_value = {'status': '200 OK', 'token': 'new token'}
+    with provider:
+        assert provider.token == 'new token'
+    assert server.LogIn.call_count == 2
+    assert session_store.get('opensubtitles', USERNAME)[0] == {'token': 'new token'}
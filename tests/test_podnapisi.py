@@ -1,8 +1,14 @@
 # -*- coding: utf-8 -*-
+import json
 import os
+import time
 
 from babelfish import Language
 import pytest
+try:
+    from unittest.mock import Mock
+except ImportError:
+    from mock import Mock
 from vcr import VCR
 
 from subliminal.providers.podnapisi import PodnapisiProvider, PodnapisiSubtitle
@@ -156,3 +162,25 @@ def test_subtitles_with_title_unicode(movies):
     assert matches == {'title', 'year', 'country'}
     assert wanted_subtitle.content is not None
     assert wanted_subtitle.is_valid() is True
+
+
+def test_query_pages_concurrently(movies):
+    def search_item(pid):
+        return {'id': pid, 'language': 'en', 'flags': [], 'url': 'https://www.podnapisi.net/subtitles/' + pid,
+                'releases': [], 'custom_releases': [], 'movie': {'title': 'Man of Steel', 'year': 2013}}
+
+    pages = {1: ['a', 'b'], 2: ['c', 'a'], 3: ['d'], 4: ['e', 'd']}
+
+    def get(url, params):
+        page = params.get('page', 1)
+        # later pages answer first
+        time.sleep(0.05 * (len(pages) - page))
+        data = {'page': page, 'all_pages': len(pages), 'data': [search_item(pid) for pid in pages[page]]}
+        return Mock(text=json.dumps(data))
+
+    provider = PodnapisiProvider()
+    provider.session = Mock()
+    provider.session.get.side_effect = get
+    subtitles = provider.query(Language('eng'), 'Man of Steel', year=2013)
+    assert [subtitle.pid for subtitle in subtitles] == ['a', 'b', 'c', 'd', 'e']
+    assert sorted(c[1]['params'].get('page', 1) for c in provider.session.get.call_args_list) == [1, 2, 3, 4]
@@ -1,6 +1,14 @@
 # -*- coding: utf-8 -*-
 from bs4 import FeatureNotFound
+import threading
+import time
+
 import pytest
+from requests import ConnectionError, Session
+try:
+    from unittest.mock import Mock
+except ImportError:
+    from mock import Mock
 
 from subliminal.providers import ParserBeautifulSoup, Provider
 from subliminal.video import Episode, Movie
@@ -49,3 +57,53 @@ def test_check_required_hash(episodes, movies):
     Provider.required_hash = 'opensubtitles'
     assert Provider.check(movies['man_of_steel']) is True
     assert Provider.check(episodes['dallas_s01e03']) is False
+
+
+def test_warm_up():
+    provider = Provider()
+    provider.server_url = 'https://www.example.com/api/search'
+    provider.session = Session()
+    head = Mock()
+    provider.session.head = head
+    provider.warm_up()
+    assert head.call_args[0][0] == 'https://www.example.com/'
+
+
+def test_warm_up_error():
+    provider = Provider()
+    provider.server_url = 'https://www.example.com/api/search'
+    provider.session = Session()
+    provider.session.head = Mock(side_effect=ConnectionError)
+    provider.warm_up()
+
+
+def test_warm_up_no_session():
+    Provider().warm_up()
+
+
+def test_fetch_pages():
+    provider = Provider()
+    provider.page_workers = 2
+    assert list(provider.fetch_pages(lambda page: page * 2, [0, 1, 2, 3])) == [0, 2, 4, 6]
+
+
+def test_fetch_pages_closed():
+    fetched_pages = []
+    released = threading.Event()
+
+    def fetch_page(page):
+        if page:
+            released.wait(1)
+        fetched_pages.append(page)
+        return page
+
+    provider = Provider()
+    provider.page_workers = 2
+    results = provider.fetch_pages(fetch_page, list(range(6)))
+    assert next(results) == 0
+    start = time.time()
+    results.close()
+    assert time.time() - start < 0.5
+    released.set()
+    time.sleep(0.1)
+    assert set(fetched_pages) <= {0, 1, 2}
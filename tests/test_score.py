@@ -4,9 +4,13 @@ from __future__ import division
 from babelfish import Language
 
 from subliminal.providers.addic7ed import Addic7edSubtitle
+from subliminal.providers.argenteam import ArgenteamSubtitle
 from subliminal.providers.opensubtitles import OpenSubtitlesSubtitle
 from subliminal.providers.podnapisi import PodnapisiSubtitle
-from subliminal.score import compute_score, episode_scores, movie_scores, solve_episode_equations, solve_movie_equations
+from subliminal.providers.tvsubtitles import TVsubtitlesSubtitle
+from subliminal.score import (ReleaseGroupIndex, compute_max_score, compute_score, episode_scores,
+                              equivalent_release_groups, get_equivalent_release_groups, movie_scores,
+                              solve_episode_equations, solve_movie_equations)
 
 
 def test_episode_equations():
@@ -67,3 +71,118 @@ def test_compute_score_hash_hearing_impaired(movies):
                                      None, None, '', 'utf-8')
     assert compute_score(subtitle, video, hearing_impaired=True) == (movie_scores['hash'] +
                                                                      movie_scores['hearing_impaired'])
+
+
+def test_compute_max_score_hash(movies):
+    video = movies['man_of_steel']
+    subtitle = OpenSubtitlesSubtitle(Language('eng'), True, None, 1, 'hash', 'movie', '5b8f8f4e41ccb21e',
+                                     'Man of Steel', 'man.of.steel.2013.720p.bluray.x264-felony.mkv', 2013, 770828,
+                                     None, None, '', 'utf-8')
+    assert compute_max_score(subtitle, video, hearing_impaired=True) == (movie_scores['hash'] +
+                                                                         movie_scores['hearing_impaired'])
+
+
+def test_compute_max_score_wrong_movie_kind(movies):
+    video = movies['man_of_steel']
+    subtitle = OpenSubtitlesSubtitle(Language('eng'), False, None, 1, 'hash', 'episode', '5b8f8f4e41ccb21e',
+                                     'Man of Steel', 'man.of.steel.2013.720p.bluray.x264-felony.mkv', 2013, 770828,
+                                     None, None, '', 'utf-8')
+    assert compute_max_score(subtitle, video) == 0
+
+
+def test_compute_max_score_wrong_episode(episodes):
+    video = episodes['bbt_s07e05']
+    subtitle = PodnapisiSubtitle(Language('eng'), True, None, 1, [], None, 7, 4, None)
+    max_score = compute_max_score(subtitle, video)
+    assert max_score == episode_scores['hash'] - episode_scores['episode']
+    assert compute_score(subtitle, video) <= max_score
+
+
+def test_compute_max_score_wrong_episode_release(episodes):
+    video = episodes['bbt_s07e05']
+    subtitle = PodnapisiSubtitle(Language('eng'), True, None, 1,
+                                 ['The.Big.Bang.Theory.S07E05.The.Workplace.Proximity.720p.HDTV.x264-DIMENSION.mkv'],
+                                 None, 7, 4, None)
+    assert 'episode' not in subtitle.get_matches(video)
+    assert compute_score(subtitle, video) <= compute_max_score(subtitle, video)
+
+
+def test_compute_max_score_bounds_compute_score(episodes, movies):
+    release = 'The.Big.Bang.Theory.S07E05.The.Workplace.Proximity.720p.HDTV.x264-DIMENSION.mkv'
+    subtitles = [
+        PodnapisiSubtitle(Language('eng'), True, None, 1, [release], None, 7, 5, None),
+        PodnapisiSubtitle(Language('eng'), True, None, 1, [release], None, None, None, None),
+        PodnapisiSubtitle(Language('eng'), True, None, 1, [release], None, 7, 4, None),
+        PodnapisiSubtitle(Language('eng'), True, None, 1, ['man.of.steel.2013.720p.bluray.x264-felony.mkv'],
+                          'Man of Steel', None, None, 2013),
+        TVsubtitlesSubtitle(Language('eng'), None, 1, 'The Big Bang Theory', 7, 4, None, None, release),
+        TVsubtitlesSubtitle(Language('eng'), None, 1, 'The Big Bang Theory', 7, 5, None, '720p.HDTV', 'DIMENSION'),
+        ArgenteamSubtitle(Language('eng'), None, 'The Big Bang Theory', 7, 4, None, release),
+        Addic7edSubtitle(Language('eng'), True, None, 'The Big Bang Theory', 7, 4, None, None, release, None),
+        OpenSubtitlesSubtitle(Language('eng'), False, None, 1, 'fulltext', 'episode', None,
+                              '"The Big Bang Theory" The Workplace Proximity', release, 2007, 3229392, 7, 4, '',
+                              'utf-8'),
+        OpenSubtitlesSubtitle(Language('eng'), True, None, 1, 'hash', 'movie', '5b8f8f4e41ccb21e', 'Man of Steel',
+                              'man.of.steel.2013.720p.bluray.x264-felony.mkv', 2013, 770828, None, None, '', 'utf-8')
+    ]
+    for video in list(episodes.values()) + list(movies.values()):
+        for subtitle in subtitles:
+            for hearing_impaired in (None, True, False):
+                assert (compute_score(subtitle, video, hearing_impaired=hearing_impaired) <=
+                        compute_max_score(subtitle, video, hearing_impaired=hearing_impaired))
+
+
+def test_compute_max_score_episode_title(episodes):
+    video = episodes['bbt_s07e05']
+    subtitle = PodnapisiSubtitle(Language('eng'), True, None, 1,
+                                 ['The.Big.Bang.Theory.S07E05.The.Workplace.Proximity.720p.HDTV.x264-DIMENSION.mkv'],
+                                 None, 7, 5, None)
+    assert compute_score(subtitle, video) <= compute_max_score(subtitle, video)
+
+
+def test_get_equivalent_release_groups():
+    assert get_equivalent_release_groups('LOL') == {'LOL', 'DIMENSION'}
+    assert get_equivalent_release_groups('dimension') == {'LOL', 'DIMENSION'}
+    assert get_equivalent_release_groups('NTb') == {'NTb'}
+
+
+def test_release_group_index_merge():
+    index = ReleaseGroupIndex([{'A', 'B'}, {'C', 'D'}])
+    assert index.canonical('A') != index.canonical('C')
+    index.add(['B', 'C'])
+    assert index.canonical('A') == index.canonical('D')
+    assert index.equivalents('d') == {'A', 'B', 'C', 'D'}
+
+
+def test_release_group_index_load(tmpdir):
+    path = tmpdir.join('release_groups.txt')
+    path.write('# comment\n\nWEB-DL.GRP grp2\n')
+    index = ReleaseGroupIndex()
+    index.load(str(path))
+    assert index.canonical('webdlgrp') == index.canonical('GRP2')
+
+
+def test_release_group_index_canonical_ids():
+    index = ReleaseGroupIndex([{'LOL', 'DIMENSION'}])
+    assert index.canonical('DIMENSION') in index.canonical_ids('HDTV.x264-LOL')
+    assert index.canonical('LOL') in index.canonical_ids('720PDIMENSION')
+    assert index.canonical('LOL') not in index.canonical_ids('DIMENSIONAL')
+    assert index.canonical_ids('HDTV.x264-LOL') is index.canonical_ids('HDTV.x264-LOL')
+
+
+def test_release_group_index_canonical_ids_bounded():
+    index = ReleaseGroupIndex([{'LOL', 'DIMENSION'}], max_ids=2)
+    ids = index.canonical_ids('HDTV.x264-LOL')
+    index.canonical_ids('HDTV.x264-DIMENSION')
+    assert index.canonical_ids('HDTV.x264-LOL') is ids
+    index.canonical_ids('720p.WEB-DL')
+    assert list(index.ids) == ['HDTV.x264-LOL', '720p.WEB-DL']
+    index.add({'DIMENSION', 'SVA'})
+    assert not index.ids
+
+
+def test_equivalent_release_groups():
+    assert {'LOL', 'DIMENSION'} in equivalent_release_groups
+    for release_groups in equivalent_release_groups:
+        for release_group in release_groups:
+            assert get_equivalent_release_groups(release_group) == release_groups
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+import pickle
+import ssl
+import threading
+
+import pytest
+from requests import ConnectionError, Request
+from six.moves.socketserver import ThreadingMixIn
+from six.moves.xmlrpc_client import ServerProxy
+from six.moves.xmlrpc_server import SimpleXMLRPCRequestHandler, SimpleXMLRPCServer
+from urllib3.exceptions import ProtocolError
+
+try:
+    from unittest.mock import Mock
+except ImportError:
+    from mock import Mock
+
+from subliminal.core import ProviderPool
+from subliminal.extensions import provider_manager
+from subliminal.providers import SecLevelOneTLSAdapter
+from subliminal.transport import (RequestsTransport, ResumingSSLContext, TLSAdapter, XMLRPCTransport,
+                                  create_ssl_context, create_transport, get_default_transport)
+
+
+def test_requests_transport_session():
+    transport = RequestsTransport(timeout=5, pool_maxsize=20)
+    session = transport.session(headers={'User-Agent': 'Subliminal'})
+    other_session = transport.session()
+    assert session.headers['User-Agent'] == 'Subliminal'
+    assert other_session.headers['User-Agent'] != 'Subliminal'
+    assert session.get_adapter('https://www.example.com') is transport.adapter
+    assert other_session.get_adapter('http://www.example.com') is transport.adapter
+    assert transport.adapter._pool_maxsize == 20
+    assert session.timeout == 5
+
+
+def test_requests_transport_session_timeout(monkeypatch):
+    transport = RequestsTransport(timeout=5)
+    send = Mock(side_effect=ConnectionError)
+    monkeypatch.setattr(transport.adapter, 'send', send)
+    session = transport.session()
+    with pytest.raises(ConnectionError):
+        session.get('https://www.example.com')
+    assert send.call_args[1]['timeout'] == 5
+    with pytest.raises(ConnectionError):
+        session.get('https://www.example.com', timeout=1)
+    assert send.call_args[1]['timeout'] == 1
+
+
+def test_requests_transport_session_close(monkeypatch):
+    transport = RequestsTransport()
+    close = Mock()
+    monkeypatch.setattr(transport.adapter, 'close', close)
+    transport.session().close()
+    assert not close.called
+    transport.close()
+    assert close.called
+
+
+def test_create_ssl_context():
+    context = create_ssl_context()
+    assert isinstance(context, ResumingSSLContext)
+    assert context.verify_mode == ssl.CERT_REQUIRED
+    assert context.check_hostname
+    assert context.cert_store_stats()['x509_ca'] > 0
+    assert create_ssl_context() is not context
+
+
+def test_create_ssl_context_no_verify():
+    context = create_ssl_context(verify=False)
+    assert context.verify_mode == ssl.CERT_NONE
+    assert not context.check_hostname
+    assert context.cert_store_stats()['x509_ca'] == 0
+
+
+def test_tls_adapter_ssl_context():
+    adapter = TLSAdapter()
+    assert adapter.poolmanager.connection_pool_kw['ssl_context'] is adapter.get_ssl_context()
+    assert adapter.get_ssl_context(True) is adapter.get_ssl_context()
+    assert adapter.get_ssl_context(False) is not adapter.get_ssl_context()
+    assert TLSAdapter().get_ssl_context() is not adapter.get_ssl_context()
+    assert SecLevelOneTLSAdapter().security_level == 1
+    transport = RequestsTransport()
+    assert transport.adapter.poolmanager.connection_pool_kw['ssl_context'] is transport.adapter.get_ssl_context()
+
+
+def test_tls_adapter_connection_pool_key_attributes():
+    adapter = TLSAdapter()
+    request = Request('GET', 'https://www.example.com/').prepare()
+    _, pool_kwargs = adapter.build_connection_pool_key_attributes(request, True)
+    assert pool_kwargs['ssl_context'] is adapter.get_ssl_context()
+    assert 'ca_certs' not in pool_kwargs
+    _, pool_kwargs = adapter.build_connection_pool_key_attributes(request, False)
+    assert pool_kwargs['ssl_context'] is adapter.get_ssl_context(False)
+    assert pool_kwargs['cert_reqs'] == 'CERT_NONE'
+
+
+def test_tls_adapter_cert_verify():
+    conn = Mock()
+    TLSAdapter().cert_verify(conn, 'https://www.example.com/', True, None)
+    assert conn.cert_reqs == 'CERT_REQUIRED'
+    assert conn.ca_certs is None
+    assert conn.ca_cert_dir is None
+
+
+def test_tls_adapter_pickle():
+    adapter = pickle.loads(pickle.dumps(SecLevelOneTLSAdapter()))
+    assert adapter.security_level == 1
+    assert adapter.poolmanager.connection_pool_kw['ssl_context'] is adapter.get_ssl_context()
+
+
+def test_resuming_ssl_context_save_session():
+    context = create_ssl_context()
+    session = Mock()
+    context.save_session(Mock(server_side=False, server_hostname='www.example.com', session=session))
+    context.save_session(Mock(server_side=False, server_hostname='www.example.org', session=None))
+    context.save_session(Mock(server_side=True, server_hostname=None, session=Mock()))
+    assert context.sessions['www.example.com'] is session
+    assert 'www.example.org' not in context.sessions
+    assert None not in context.sessions
+
+
+def test_create_transport_unknown_backend():
+    with pytest.raises(ValueError):
+        create_transport('urllib')
+
+
+def test_get_default_transport():
+    assert get_default_transport() is get_default_transport('requests')
+    assert isinstance(get_default_transport(), RequestsTransport)
+
+
+def test_provider_pool_transport(monkeypatch):
+    monkeypatch.setattr(provider_manager['tvsubtitles'].plugin, 'initialize', Mock())
+    monkeypatch.setattr(provider_manager['tvsubtitles'].plugin, 'terminate', Mock())
+    with ProviderPool(providers=['tvsubtitles'], transport_options={'timeout': 5}) as pool:
+        transport = pool['tvsubtitles'].transport
+        assert transport.timeout == 5
+        assert pool['tvsubtitles'].get_transport() is transport
+        assert pool.get_transport('requests') is transport
+    assert pool.transports == {}
+
+
+def test_provider_pool_default_transport(monkeypatch):
+    monkeypatch.setattr(provider_manager['tvsubtitles'].plugin, 'initialize', Mock())
+    monkeypatch.setattr(provider_manager['tvsubtitles'].plugin, 'terminate', Mock())
+    with ProviderPool(providers=['tvsubtitles']) as pool:
+        assert pool['tvsubtitles'].get_transport() is get_default_transport()
+
+
+class XMLRPCRequestHandler(SimpleXMLRPCRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        SimpleXMLRPCRequestHandler.setup(self)
+        self.server.connections += 1
+
+
+class XMLRPCServer(ThreadingMixIn, SimpleXMLRPCServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def xmlrpc_server():
+    server = XMLRPCServer(('127.0.0.1', 0), requestHandler=XMLRPCRequestHandler, logRequests=False)
+    server.connections = 0
+    server.register_function(lambda value: value, 'echo')
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_xmlrpc_transport(xmlrpc_server):
+    transport = RequestsTransport()
+    server = ServerProxy('http://127.0.0.1:%d' % xmlrpc_server.server_address[1],
+                         XMLRPCTransport(transport.session(), scheme='http'))
+    # large responses are gzip-compressed by the server
+    assert server.echo('subliminal' * 1000) == 'subliminal' * 1000
+    assert server.echo('subliminal') == 'subliminal'
+    assert xmlrpc_server.connections == 1
+    server('close')()
+    transport.close()
+
+
+def test_xmlrpc_transport_stale_connection(xmlrpc_server, monkeypatch):
+    session = RequestsTransport().session()
+    post = session.post
+    calls = []
+
+    def stale_post(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise ConnectionError(ProtocolError('Connection aborted.'))
+        return post(*args, **kwargs)
+
+    monkeypatch.setattr(session, 'post', stale_post)
+    server = ServerProxy('http://127.0.0.1:%d' % xmlrpc_server.server_address[1],
+                         XMLRPCTransport(session, scheme='http'))
+    assert server.echo('subliminal') == 'subliminal'
+    assert len(calls) == 2
+
+
+def test_xmlrpc_transport_connection_error(monkeypatch):
+    session = RequestsTransport().session()
+    post = Mock(side_effect=ConnectionError(ValueError('Connection refused')))
+    monkeypatch.setattr(session, 'post', post)
+    server = ServerProxy('http://127.0.0.1:1', XMLRPCTransport(session, scheme='http'))
+    with pytest.raises(ConnectionError):
+        server.echo('subliminal')
+    assert post.call_count == 1
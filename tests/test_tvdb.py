@@ -5,11 +5,17 @@ import time
 
 import pytest
 import requests
+try:
+    from unittest.mock import Mock
+except ImportError:
+    from mock import Mock
 from vcr import VCR
 
 from subliminal import __short_version__
+from subliminal.cache import SessionStore
 from subliminal.video import Episode
 from subliminal.refiners.tvdb import TVDBClient, refine, series_re
+from subliminal.transport import RequestsTransport
 
 vcr = VCR(path_transformer=lambda path: path + '.yaml',
           record_mode=os.environ.get('VCR_RECORD_MODE', 'once'),
@@ -77,6 +83,17 @@ def test_headers():
     assert client.session.headers['X-Test'] == 'Value'
 
 
+def test_use_transport():
+    client = TVDBClient(headers={'X-Test': 'Value'})
+    client.session.headers['Authorization'] = 'Bearer token'
+    transport = RequestsTransport(timeout=42)
+    client.use_transport(transport)
+    assert client.transport is transport
+    assert client.session.timeout == 42
+    assert client.session.headers['X-Test'] == 'Value'
+    assert client.token == 'token'
+
+
 @pytest.mark.integration
 @vcr.use_cassette
 def test_login_error():
@@ -118,6 +135,36 @@ def test_refresh_token(client):
     assert client.token != old_token
 
 
+def test_login_resume_token(client, tmpdir, monkeypatch):
+    session_store = SessionStore(str(tmpdir.join('sessions')))
+    session_store.set('tvdb', None, {'token': 'stored token'})
+    client.session_store = session_store
+    get = Mock(return_value=Mock(json=Mock(return_value={'token': 'refreshed token'})))
+    post = Mock()
+    monkeypatch.setattr(client.session, 'get', get)
+    monkeypatch.setattr(client.session, 'post', post)
+    client.login()
+    assert not post.called
+    assert get.call_args[0][0] == client.base_url + '/refresh_token'
+    assert client.token == 'refreshed token'
+    assert not client.token_expired
+    assert session_store.get('tvdb')[0] == {'token': 'refreshed token'}
+
+
+def test_login_resume_token_expired(client, tmpdir, monkeypatch):
+    session_store = SessionStore(str(tmpdir.join('sessions')))
+    session_store.set('tvdb', None, {'token': 'stored token'})
+    client.session_store = session_store
+    get = Mock(return_value=Mock(raise_for_status=Mock(side_effect=requests.HTTPError)))
+    post = Mock(return_value=Mock(json=Mock(return_value={'token': 'new token'})))
+    monkeypatch.setattr(client.session, 'get', get)
+    monkeypatch.setattr(client.session, 'post', post)
+    client.login()
+    assert post.called
+    assert client.token == 'new token'
+    assert session_store.get('tvdb')[0] == {'token': 'new token'}
+
+
 @pytest.mark.integration
 @vcr.use_cassette
 def test_search_series(client):
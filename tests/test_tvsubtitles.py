@@ -82,6 +82,14 @@ def test_search_show_id():
     assert show_id == 154
 
 
+@pytest.mark.integration
+@vcr.use_cassette('test_search_show_id')
+def test_search_show_id_wrong_year():
+    with TVsubtitlesProvider() as provider:
+        show_id = provider.search_show_id('The Big Bang Theory', 2008)
+    assert show_id is None
+
+
 @pytest.mark.integration
 @vcr.use_cassette
 def test_search_show_id_incomplete():
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 from six import text_type as str
 
-from subliminal.utils import hash_opensubtitles, hash_thesubdb, sanitize
+from subliminal.utils import TitleIndex, hash_opensubtitles, hash_thesubdb, sanitize
 
 
 def test_hash_opensubtitles(mkv):
@@ -24,3 +24,26 @@ def test_hash_thesubdb_too_small(tmpdir):
 
 def test_sanitize():
     assert sanitize('Marvel\'s Agents of S.H.I.E.L.D.') == 'marvels agents of s h i e l d'
+
+
+def test_title_index():
+    index = TitleIndex({'The Big Bang Theory': 126, 'Marvel\'s Agents of S.H.I.E.L.D.': 4010, 'Law & Order: SVU': 1043})
+    assert index.get('the big bang theory') == 126
+    assert index.get('Marvels Agents of SHIELD') == 4010
+    assert index.get('Law and Order SVU', fuzzy=False) == 1043
+    assert index.get('Agents of S.H.I.E.L.D. Marvel\'s', fuzzy=False) == 4010
+
+
+def test_title_index_fuzzy():
+    index = TitleIndex({'The Big Bang Theory': 126, 'How I Met Your Mother': 1})
+    assert index.get('Big Bang Theory') == 126
+    assert index.get('Big Bang Theory', fuzzy=False) is None
+    assert index.get('The Big Bang') is None
+
+
+def test_title_index_match():
+    index = TitleIndex({'The Big Bang Theory': 126, 'The Office (UK)': 1})
+    assert index.match('Big Bang Theory') == 'the big bang theory'
+    assert index.match('Theory The Big Bang', fuzzy=False) == 'the big bang theory'
+    assert index.match('The Office') == 'the office uk'
+    assert index.match('The Office', fuzzy=False) is None